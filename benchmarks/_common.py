@@ -0,0 +1,89 @@
+"""
+Helpers shared by the benchmark scripts in this folder.
+
+Every benchmark module provides a function ``run(quick=False)`` returning a
+JSON-serializable `dict` and can be executed as a script to print that `dict`.
+"""
+
+import json
+import resource
+import sys
+import time
+
+
+def cpu_time():
+    """
+    Returns the CPU time (user + system) consumed by this process and all of
+    its threads so far.
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def percentile(values, percent):
+    """
+    Returns the *percent* percentile of given *values* using the nearest-rank
+    method.
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    index = max(0, int(round(percent / 100 * len(values))) - 1)
+    return values[min(index, len(values) - 1)]
+
+
+def latency_summary(values):
+    """
+    Summarizes a list of durations in seconds.
+    """
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values),
+        'p50': percentile(values, 50),
+        'p99': percentile(values, 99),
+        'max': max(values),
+    }
+
+
+def wait_for(service, state, timeout=60):
+    """
+    Blocks until given *service* has reached *state*. Raises a
+    :class:`RuntimeError`, if the service ends up in the ``EXCEPTION`` state
+    or the *timeout* expires.
+    """
+    deadline = time.monotonic() + timeout
+    while service.state != state:
+        if service.state == service.State.EXCEPTION:
+            raise RuntimeError('Service %s failed: %r' %
+                               (service.name, service.exception))
+        if time.monotonic() > deadline:
+            raise RuntimeError('Service %s did not reach state %s' %
+                               (service.name, state.value))
+        time.sleep(0.01)
+
+
+class Stopwatch:
+    """
+    Context manager measuring wall clock and CPU time of its body.
+    """
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = cpu_time()
+        return self
+
+    def __exit__(self, *args):
+        self.wall = time.perf_counter() - self.wall
+        self.cpu = cpu_time() - self.cpu
+
+
+def main(run):
+    """
+    Entry point for benchmark scripts: invokes *run* and prints the result as
+    JSON. Pass ``--quick`` for a shorter run.
+    """
+    quick = '--quick' in sys.argv[1:]
+    json.dump(run(quick=quick), sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write('\n')
@@ -0,0 +1,126 @@
+"""
+Measures the :class:`ChangeDetector` of the autoreload feature with a large
+number of observed files: the time needed to register them, the latency of
+detecting a single modification and the time needed to report an event storm,
+in which every observed file is modified at once.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from _common import Stopwatch, main, latency_summary
+
+from score.serve._changedetect import ChangeDetector
+from score.serve._watch import backends
+
+
+def _make_tree(root, dirs, files_per_dir):
+    paths = []
+    for i in range(dirs):
+        dir = os.path.join(root, 'pkg%03d' % i)
+        os.makedirs(dir)
+        for j in range(files_per_dir):
+            path = os.path.join(dir, 'mod%04d.py' % j)
+            with open(path, 'w') as file:
+                file.write('#')
+            paths.append(path)
+    return paths
+
+
+def _touch(path):
+    with open(path, 'a') as file:
+        file.write('#')
+
+
+class _Collector:
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.changed = set()
+        self.callbacks = 0
+
+    def __call__(self, file, modules):
+        with self.condition:
+            self.callbacks += 1
+            self.changed.add(file)
+            self.condition.notify_all()
+
+    def reset(self):
+        with self.condition:
+            self.changed.clear()
+            self.callbacks = 0
+
+    def wait(self, paths, timeout):
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: paths <= self.changed, timeout)
+
+
+def bench_backend(name, paths, samples, timeout):
+    detector = ChangeDetector(backend=name)
+    collector = _Collector()
+    detector.add_callback(collector)
+    try:
+        with Stopwatch() as observe:
+            for path in paths:
+                detector.observe(path)
+        # give the backends time to settle, especially the polling backend,
+        # which needs a first scan for detecting modifications
+        time.sleep(1)
+        latencies = []
+        for path in paths[:samples]:
+            collector.reset()
+            start = time.perf_counter()
+            _touch(path)
+            if collector.wait({path}, timeout):
+                latencies.append(time.perf_counter() - start)
+        time.sleep(0.5)
+        collector.reset()
+        expected = set(paths)
+        with Stopwatch() as storm:
+            for path in paths:
+                _touch(path)
+            complete = collector.wait(expected, timeout)
+        time.sleep(0.5)
+        with collector.condition:
+            detected = len(expected & collector.changed)
+            callbacks = collector.callbacks
+    finally:
+        detector.stop()
+    return {
+        'files': len(paths),
+        'observe_seconds': observe.wall,
+        'watched_dirs': len(detector.observed_dirs),
+        'single_change': latency_summary(latencies),
+        'storm': {
+            'complete': complete,
+            'detected': detected,
+            'callbacks': callbacks,
+            'seconds': storm.wall,
+            'cpu_seconds': storm.cpu,
+        },
+    }
+
+
+def run(quick=False):
+    dirs, files_per_dir = (10, 100) if quick else (100, 100)
+    samples = 5 if quick else 20
+    result = {}
+    for name, cls in backends.items():
+        if not cls.available():
+            result[name] = {'skipped': 'not available'}
+            continue
+        root = tempfile.mkdtemp(prefix='score-serve-bench-')
+        try:
+            paths = _make_tree(root, dirs, files_per_dir)
+            result[name] = bench_backend(name, paths, samples, timeout=60)
+        finally:
+            shutil.rmtree(root)
+    return result
+
+
+if __name__ == '__main__':
+    main(run)
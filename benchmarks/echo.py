@@ -0,0 +1,93 @@
+"""
+Compares the throughput and latency of echo servers implemented as a
+:class:`SocketServerWorker` (with a thread per connection and with a thread
+pool) and as an :class:`AsyncioWorker`.
+
+The clients are the same as in :mod:`loop_echo` and run in a separate process,
+each of them sending a small payload and waiting for the echo before sending
+the next one.
+"""
+
+import asyncio
+import multiprocessing
+import socketserver
+
+from _common import main, latency_summary, Stopwatch, wait_for
+
+from loop_echo import EchoWorker, _client_process
+from score.serve import Service, SocketServerWorker
+
+
+class _EchoHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        while True:
+            data = self.request.recv(65536)
+            if not data:
+                return
+            self.request.sendall(data)
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+    allow_reuse_address = True
+
+
+class SocketServerEchoWorker(SocketServerWorker):
+
+    def _mkserver(self):
+        server = _Server(('127.0.0.1', 0), _EchoHandler)
+        self.address = server.server_address
+        return server
+
+
+class PooledEchoWorker(SocketServerEchoWorker):
+
+    pool_size = 64
+
+
+class AsyncioEchoWorker(EchoWorker):
+
+    loop_factory = staticmethod(asyncio.new_event_loop)
+
+
+def bench_worker(cls, clients, duration, payload=b'x' * 64):
+    worker = cls()
+    service = Service(cls.__name__, worker)
+    service.start()
+    wait_for(service, Service.State.RUNNING)
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    process = context.Process(
+        target=_client_process,
+        args=(worker.address, clients, duration, payload, queue))
+    with Stopwatch() as watch:
+        process.start()
+        latencies = queue.get()
+        process.join()
+    service.stop()
+    wait_for(service, Service.State.STOPPED)
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'requests_per_second': len(latencies) / watch.wall,
+        'server_cpu_seconds': watch.cpu,
+        'latency': latency_summary(latencies),
+    }
+
+
+def run(quick=False):
+    duration = 1 if quick else 5
+    clients = 32
+    workers = (
+        ('socketserver', SocketServerEchoWorker),
+        ('socketserver_pool', PooledEchoWorker),
+        ('asyncio', AsyncioEchoWorker),
+    )
+    return {name: bench_worker(cls, clients, duration)
+            for name, cls in workers}
+
+
+if __name__ == '__main__':
+    main(run)
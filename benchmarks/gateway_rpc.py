@@ -0,0 +1,103 @@
+"""
+Measures the pipe-based RPC between a :class:`Gateway` and an object hosted in
+a forked process: the latency of sequential round trips, the throughput of
+concurrent calls and how fast events triggered by the child are delivered to
+a growing number of subscribers.
+"""
+
+import asyncio
+import time
+
+from _common import main, latency_summary, Stopwatch
+
+from score.serve._forked import fork, Backgrounded
+
+
+class Echo(Backgrounded):
+
+    def ping(self, value):
+        return value
+
+    def emit(self, count):
+        for i in range(count):
+            self.trigger('tick', i)
+        return count
+
+
+async def _round_trips(gateway, count, payload):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        await gateway.ping(payload)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def _concurrent_calls(gateway, count, payload):
+    await asyncio.gather(*(gateway.ping(payload) for _ in range(count)))
+
+
+async def _fan_out(loop, gateway, events, subscribers):
+    done = asyncio.Event()
+    received = 0
+
+    def callback(i):
+        nonlocal received
+        received += 1
+        if received == events * subscribers:
+            done.set()
+
+    for _ in range(subscribers):
+        gateway.on('tick', callback)
+    try:
+        start = time.perf_counter()
+        await gateway.emit(events)
+        await asyncio.wait_for(done.wait(), 60)
+        return time.perf_counter() - start
+    finally:
+        for _ in range(subscribers):
+            gateway.off('tick', callback)
+
+
+def run(quick=False):
+    calls = 1000 if quick else 10000
+    concurrent = 100 if quick else 1000
+    events = 1000 if quick else 10000
+    loop = asyncio.new_event_loop()
+    gateway = fork(loop, Echo)
+    result = {}
+    try:
+        for name, payload in (('small', 1), ('large', b'x' * 65536)):
+            with Stopwatch() as watch:
+                latencies = loop.run_until_complete(
+                    _round_trips(gateway, calls, payload))
+            result['round_trip_%s' % name] = {
+                'calls_per_second': calls / watch.wall,
+                'latency': latency_summary(latencies),
+            }
+        with Stopwatch() as watch:
+            loop.run_until_complete(
+                _concurrent_calls(gateway, concurrent, 1))
+        result['concurrent'] = {
+            'calls': concurrent,
+            'seconds': watch.wall,
+            'calls_per_second': concurrent / watch.wall,
+        }
+        for subscribers in (1, 10):
+            seconds = loop.run_until_complete(
+                _fan_out(loop, gateway, events, subscribers))
+            result['fan_out_%d' % subscribers] = {
+                'events': events,
+                'seconds': seconds,
+                'events_per_second': events / seconds,
+                'deliveries_per_second': events * subscribers / seconds,
+            }
+    finally:
+        loop.run_until_complete(gateway.kill())
+        gateway.cleanup()
+        loop.close()
+    return result
+
+
+if __name__ == '__main__':
+    main(run)
@@ -0,0 +1,132 @@
+"""
+Guards the import time of :mod:`score.serve` against regressions.
+
+The modules are imported in fresh interpreters started with ``python -X
+importtime``, which reports the cumulative time spent importing each module.
+The check fails, if importing the package, its initializer or its command
+line interface exceeds its startup budget, or if any of the modules, that
+should only be loaded on demand, show up in the import log.
+
+Run as ``python benchmarks/importtime.py [--quick] [--budget-scale=F]``; the
+budgets are multiplied by *F* on slower machines. The exit status is non-zero
+if the check fails.
+"""
+
+import re
+import subprocess
+import sys
+
+from _common import main, percentile
+
+
+#: Maximum cumulative import time of each measured module in milliseconds,
+#: excluding the time spent importing its :data:`DEPENDENCIES`.
+BUDGET_MS = {
+    'score.serve': 30,
+    'score.serve._init': 10,
+    'score.serve.cli': 10,
+}
+
+#: Modules, that are always required by a measured module and whose import
+#: time is thus not counted towards its budget.
+DEPENDENCIES = {
+    'score.serve._init': ['asyncio', 'score.init'],
+    'score.serve.cli': ['click', 'score.init'],
+}
+
+#: Modules, that may not be imported by each of the measured statements.
+FORBIDDEN = {
+    'import score.serve': [
+        'asyncio', 'multiprocessing', 'tblib', 'watchdog', 'uvloop',
+        'score.serve._init', 'score.serve._forked', 'score.serve.worker',
+    ],
+    'import score.serve._init': [
+        'multiprocessing', 'tblib', 'watchdog', 'uvloop',
+        'score.serve._changedetect', 'score.serve._watch',
+        'score.serve._placement', 'score.serve.worker.asyncio',
+        'score.serve.worker.process', 'score.serve._reactor',
+        'score.serve._recycle', 'score.serve._resolver',
+        'score.serve._startup', 'score.serve._supervisor',
+        'score.serve._tasks',
+    ],
+    'import score.serve.cli': [
+        'asyncio', 'multiprocessing', 'tblib', 'watchdog', 'uvloop',
+        'score.serve._init', 'score.serve.worker',
+    ],
+}
+
+_line = re.compile(r'^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|( *)(\S+)\s*$')
+
+
+def importtime(statement):
+    """
+    Executes *statement* in a fresh interpreter and returns a `dict` mapping
+    the names of all imported modules to their cumulative import time in
+    microseconds.
+    """
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        universal_newlines=True, check=True)
+    modules = {}
+    for line in process.stderr.splitlines():
+        match = _line.match(line)
+        if match:
+            modules[match.group(4)] = int(match.group(2))
+    return modules
+
+
+def check(statement, module, forbidden, repeat):
+    """
+    Measures the import of *module* via *statement* *repeat* times and reports
+    the median cumulative time, excluding its :data:`DEPENDENCIES`, along with
+    any *forbidden* modules that were imported.
+    """
+    times = []
+    imported = set()
+    for _ in range(repeat):
+        modules = importtime(statement)
+        excluded = sum(modules.get(name, 0)
+                       for name in DEPENDENCIES.get(module, ()))
+        times.append((modules.get(module, 0) - excluded) / 1000)
+        imported.update(name for name in forbidden
+                        if any(m == name or m.startswith(name + '.')
+                               for m in modules))
+    return {
+        'median_ms': percentile(times, 50),
+        'min_ms': min(times),
+        'forbidden': sorted(imported),
+    }
+
+
+def run(quick=False, budget_scale=1):
+    repeat = 3 if quick else 11
+    result = {'failures': []}
+    for statement, forbidden in FORBIDDEN.items():
+        module = statement.split()[-1]
+        measured = check(statement, module, forbidden, repeat)
+        measured['budget_ms'] = BUDGET_MS[module] * budget_scale
+        result[module] = measured
+        for name in measured['forbidden']:
+            result['failures'].append(
+                '%s imports %s' % (module, name))
+        if measured['median_ms'] > measured['budget_ms']:
+            result['failures'].append(
+                '%s took %.1fms, budget is %.0fms' %
+                (statement, measured['median_ms'], measured['budget_ms']))
+    return result
+
+
+if __name__ == '__main__':
+    budget_scale = 1
+    for arg in sys.argv[1:]:
+        if arg.startswith('--budget-scale='):
+            budget_scale = float(arg.split('=', 1)[1])
+    results = []
+
+    def measure(quick):
+        results.append(run(quick=quick, budget_scale=budget_scale))
+        return results[-1]
+
+    main(measure)
+    sys.exit(1 if results[0]['failures'] else 0)
@@ -0,0 +1,104 @@
+"""
+Measures the overhead of the :class:`Service` state machine by moving a number
+of services with trivial workers through their full lifecycle.
+
+Every phase (prepare, start, pause, stop) is timed from issuing the
+transitions until all services have reached the target state.
+"""
+
+import threading
+
+from _common import main, Stopwatch
+
+from score.serve import Service, Worker
+
+
+class NoopWorker(Worker):
+
+    def prepare(self):
+        pass
+
+    def start(self):
+        pass
+
+    def pause(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def cleanup(self, exception):
+        pass
+
+
+class _StateCounter:
+    """
+    Counts the services, that have reached a state, via state change
+    listeners instead of polling, so that waiting does not compete with the
+    transition threads.
+    """
+
+    def __init__(self, services):
+        self.condition = threading.Condition()
+        self.counts = {}
+        for service in services:
+            service.register_state_change_listener(self._changed)
+
+    def _changed(self, service, old, new):
+        with self.condition:
+            self.counts[new] = self.counts.get(new, 0) + 1
+            self.condition.notify_all()
+
+    def reset(self):
+        with self.condition:
+            self.counts.clear()
+
+    def wait(self, state, count, timeout=300):
+        def reached():
+            if self.counts.get(Service.State.EXCEPTION):
+                raise RuntimeError('A service failed')
+            return self.counts.get(state, 0) >= count
+        with self.condition:
+            if not self.condition.wait_for(reached, timeout):
+                raise RuntimeError('Timeout waiting for state %s' % state)
+
+
+def bench_lifecycle(count):
+    with Stopwatch() as create:
+        services = [Service('service/%d' % i, NoopWorker())
+                    for i in range(count)]
+    counter = _StateCounter(services)
+    result = {
+        'services': count,
+        'create_seconds': create.wall,
+    }
+    phases = (
+        ('prepare', Service.State.PAUSED),
+        ('start', Service.State.RUNNING),
+        ('pause', Service.State.PAUSED),
+        ('stop', Service.State.STOPPED),
+    )
+    total = 0
+    for method, state in phases:
+        counter.reset()
+        with Stopwatch() as watch:
+            for service in services:
+                getattr(service, method)()
+            counter.wait(state, count)
+        total += watch.wall
+        result[method] = {
+            'seconds': watch.wall,
+            'cpu_seconds': watch.cpu,
+            'per_service_us': watch.wall / count * 1e6,
+        }
+    result['total_seconds'] = total
+    return result
+
+
+def run(quick=False):
+    counts = (1, 100, 1000) if quick else (1, 100, 5000)
+    return {str(count): bench_lifecycle(count) for count in counts}
+
+
+if __name__ == '__main__':
+    main(run)
@@ -0,0 +1,125 @@
+"""
+Compares the throughput and latency of an echo server implemented as an
+:class:`AsyncioWorker` across the available event loop implementations.
+
+The clients run in a separate process with the default loop, so only the
+server's loop varies between the runs.
+"""
+
+import asyncio
+import multiprocessing
+import time
+
+from _common import main, latency_summary, Stopwatch
+
+from score.serve import Service, AsyncioWorker
+
+
+class _EchoProtocol(asyncio.Protocol):
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.transport.write(data)
+
+
+class EchoWorker(AsyncioWorker):
+
+    lag_interval = None
+
+    async def _prepare(self):
+        self.server = await self.create_server(
+            _EchoProtocol, '127.0.0.1', 0)
+        self.address = self.server.sockets[0].getsockname()
+
+    def _start(self):
+        pass
+
+    def _pause(self):
+        pass
+
+    async def _stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def _cleanup(self, exception):
+        pass
+
+
+def _client_process(address, clients, duration, payload, queue):
+
+    async def client(deadline, latencies):
+        reader, writer = await asyncio.open_connection(*address)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            writer.write(payload)
+            await reader.readexactly(len(payload))
+            latencies.append(time.perf_counter() - start)
+        writer.close()
+
+    async def run_clients():
+        deadline = time.perf_counter() + duration
+        latencies = []
+        await asyncio.gather(*(client(deadline, latencies)
+                               for _ in range(clients)))
+        return latencies
+
+    queue.put(asyncio.new_event_loop().run_until_complete(run_clients()))
+
+
+def _wait_for(service, state):
+    while service.state != state:
+        time.sleep(0.01)
+
+
+def bench_loop(factory, clients, duration, payload=b'x' * 64):
+    worker = EchoWorker()
+    worker.loop_factory = factory
+    service = Service('echo', worker)
+    service.start()
+    _wait_for(service, Service.State.RUNNING)
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    process = context.Process(
+        target=_client_process,
+        args=(worker.address, clients, duration, payload, queue))
+    with Stopwatch() as watch:
+        process.start()
+        latencies = queue.get()
+        process.join()
+    service.stop()
+    _wait_for(service, Service.State.STOPPED)
+    return {
+        'requests': len(latencies),
+        'requests_per_second': len(latencies) / watch.wall,
+        'server_cpu_seconds': watch.cpu,
+        'latency': latency_summary(latencies),
+    }
+
+
+def loops():
+    result = {'default': asyncio.new_event_loop}
+    try:
+        import uvloop
+    except ImportError:
+        result['uvloop'] = None
+    else:
+        result['uvloop'] = uvloop.new_event_loop
+    return result
+
+
+def run(quick=False):
+    duration = 1 if quick else 5
+    clients = 32
+    result = {}
+    for name, factory in loops().items():
+        if factory is None:
+            result[name] = {'skipped': 'not installed'}
+            continue
+        result[name] = bench_loop(factory, clients, duration)
+    return result
+
+
+if __name__ == '__main__':
+    main(run)
@@ -0,0 +1,141 @@
+"""
+Compares a process hosting many services with dedicated threads and loops per
+worker to one hosting them on a shared :class:`Reactor
+<score.serve._reactor.Reactor>`.
+
+Half of the services are :class:`SocketServerWorker` instances answering a
+single request per connection, the other half are :class:`AsyncioWorker`
+echo servers. The clients run in a separate process and keep all services
+busy at once.
+"""
+
+import asyncio
+import multiprocessing
+import socketserver
+import threading
+import time
+
+from _common import main, latency_summary, Stopwatch, wait_for
+
+from loop_echo import EchoWorker
+from score.serve import Service, SocketServerWorker
+from score.serve._reactor import Reactor
+
+
+class _Handler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        self.request.sendall(self.request.recv(65536))
+
+
+class _Server(socketserver.TCPServer):
+    request_queue_size = 1024
+    allow_reuse_address = True
+
+
+class SocketServerEchoWorker(SocketServerWorker):
+
+    def _mkserver(self):
+        server = _Server(('127.0.0.1', 0), _Handler)
+        self.address = server.server_address
+        return server
+
+
+class AsyncioEchoWorker(EchoWorker):
+
+    loop_factory = staticmethod(asyncio.new_event_loop)
+
+
+def _client_process(streams, connects, duration, payload, queue):
+
+    async def stream(address, deadline, latencies):
+        reader, writer = await asyncio.open_connection(*address)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            writer.write(payload)
+            await reader.readexactly(len(payload))
+            latencies.append(time.perf_counter() - start)
+        writer.close()
+
+    async def connect(address, deadline, latencies):
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            reader, writer = await asyncio.open_connection(*address)
+            writer.write(payload)
+            await reader.readexactly(len(payload))
+            writer.close()
+            latencies.append(time.perf_counter() - start)
+
+    async def run_clients():
+        deadline = time.perf_counter() + duration
+        results = ([], [])
+        await asyncio.gather(
+            *[stream(address, deadline, results[0]) for address in streams],
+            *[connect(address, deadline, results[1]) for address in connects])
+        return results
+
+    queue.put(asyncio.new_event_loop().run_until_complete(run_clients()))
+
+
+def bench_mode(reactor, services, duration, payload=b'x' * 64):
+    baseline = threading.active_count()
+    workers = []
+    for index in range(services // 2):
+        for cls in (SocketServerEchoWorker, AsyncioEchoWorker):
+            worker = cls()
+            worker.reactor = reactor
+            workers.append(Service('%s#%d' % (cls.__name__, index), worker))
+    with Stopwatch() as startup:
+        for service in workers:
+            service.start()
+        for service in workers:
+            wait_for(service, Service.State.RUNNING)
+    idle_threads = threading.active_count() - baseline
+    streams = [s.worker.address for s in workers
+               if isinstance(s.worker, AsyncioEchoWorker)]
+    connects = [s.worker.address for s in workers
+                if isinstance(s.worker, SocketServerEchoWorker)]
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    process = context.Process(
+        target=_client_process,
+        args=(streams, connects, duration, payload, queue))
+    with Stopwatch() as watch:
+        process.start()
+        stream_latencies, connect_latencies = queue.get()
+        process.join()
+    busy_threads = threading.active_count() - baseline
+    with Stopwatch() as shutdown:
+        for service in workers:
+            service.stop()
+        for service in workers:
+            wait_for(service, Service.State.STOPPED)
+    return {
+        'services': len(workers),
+        'threads_idle': idle_threads,
+        'threads_busy': busy_threads,
+        'startup_seconds': startup.wall,
+        'shutdown_seconds': shutdown.wall,
+        'server_cpu_seconds': watch.cpu,
+        'asyncio': {
+            'requests_per_second': len(stream_latencies) / watch.wall,
+            'latency': latency_summary(stream_latencies),
+        },
+        'socketserver': {
+            'requests_per_second': len(connect_latencies) / watch.wall,
+            'latency': latency_summary(connect_latencies),
+        },
+    }
+
+
+def run(quick=False):
+    duration = 1 if quick else 5
+    services = 30
+    return {
+        'dedicated': bench_mode(None, services, duration),
+        'shared': bench_mode(Reactor(), services, duration),
+    }
+
+
+if __name__ == '__main__':
+    main(run)
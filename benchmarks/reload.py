@@ -0,0 +1,149 @@
+"""
+Measures how long the autoreload feature takes to bring a server back after a
+source file was modified, from writing the file until the first request is
+answered by the reloaded services.
+
+A small application is generated in a temporary folder and served in a
+separate process. Its only service answers every connection with the pid of
+the process hosting it, which changes with every reload.
+"""
+
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+
+from _common import main, latency_summary
+
+
+_module = '''
+import os
+import socketserver
+
+from score.init import ConfiguredModule
+from score.serve import SocketServerWorker
+
+
+class _Handler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        self.request.sendall(str(os.getpid()).encode('ascii'))
+
+
+class _Server(socketserver.TCPServer):
+    allow_reuse_address = True
+
+
+class PidWorker(SocketServerWorker):
+
+    def _mkserver(self):
+        return _Server(('127.0.0.1', %(port)d), _Handler)
+
+
+def init(confdict):
+    return ConfiguredReloadBenchModule()
+
+
+class ConfiguredReloadBenchModule(ConfiguredModule):
+
+    def __init__(self):
+        import reloadbench
+        super().__init__(reloadbench)
+
+    def score_serve_workers(self):
+        return PidWorker()
+'''
+
+_conf = '''
+[score.init]
+modules =
+    reloadbench
+    score.serve
+
+[serve]
+modules = reloadbench
+autoreload = true
+conf = %(conf)s
+'''
+
+_server = '''
+import sys
+from score.init import init_from_file
+init_from_file(sys.argv[1]).serve.start()
+'''
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _request(port):
+    try:
+        with socket.create_connection(('127.0.0.1', port), timeout=1) as sock:
+            return sock.recv(64).decode('ascii') or None
+    except OSError:
+        return None
+
+
+def _wait_for_new_pid(port, old_pid, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        pid = _request(port)
+        if pid is not None and pid != old_pid:
+            return pid
+        time.sleep(0.001)
+    raise RuntimeError('Server did not come back within %ds' % timeout)
+
+
+def run(quick=False):
+    reloads = 3 if quick else 10
+    root = tempfile.mkdtemp(prefix='score-serve-bench-')
+    port = _free_port()
+    module = os.path.join(root, 'reloadbench.py')
+    conf = os.path.join(root, 'app.conf')
+    with open(module, 'w') as file:
+        file.write(_module % {'port': port})
+    with open(conf, 'w') as file:
+        file.write(textwrap.dedent(_conf % {'conf': conf}))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, (root, env.get('PYTHONPATH'))))
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-c', _server, conf], env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        pid = _wait_for_new_pid(port, None, 30)
+        cold_start = time.perf_counter() - start
+        latencies = []
+        for i in range(reloads):
+            # wait for the change detector to pick up all modules
+            time.sleep(1)
+            start = time.perf_counter()
+            with open(module, 'a') as file:
+                file.write('# reload %d\n' % i)
+            pid = _wait_for_new_pid(port, pid, 30)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        shutil.rmtree(root)
+    return {
+        'cold_start_seconds': cold_start,
+        'reload_to_first_request': latency_summary(latencies),
+    }
+
+
+if __name__ == '__main__':
+    main(run)
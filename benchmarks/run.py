@@ -0,0 +1,120 @@
+"""
+Runs the benchmarks in this folder and prints a single JSON document, that
+can be stored and compared with the results of other commits::
+
+    python benchmarks/run.py [--quick] [--output=FILE] [NAME ...]
+
+Every benchmark is executed in a fresh interpreter, so that threads and child
+processes of one benchmark cannot influence the next one. Without any *NAME*
+arguments, all benchmarks are executed. The exit status is non-zero if any of
+them failed.
+"""
+
+import datetime
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def available():
+    """
+    Returns the names of all benchmarks in this folder.
+    """
+    names = []
+    for path in sorted(glob.glob(os.path.join(HERE, '*.py'))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if not name.startswith('_') and name != 'run':
+            names.append(name)
+    return names
+
+
+def _git_revision():
+    try:
+        revision = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=HERE, check=True,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            universal_newlines=True).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=HERE, check=True, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, universal_newlines=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision + ('-dirty' if dirty else '')
+
+
+def run_benchmark(name, quick=False, timeout=1800):
+    """
+    Executes the benchmark called *name* in a new interpreter and returns a
+    `dict` containing its result, its duration and whether it succeeded.
+    """
+    command = [sys.executable, os.path.join(HERE, name + '.py')]
+    if quick:
+        command.append('--quick')
+    start = time.perf_counter()
+    try:
+        process = subprocess.run(
+            command, cwd=HERE, timeout=timeout, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE, universal_newlines=True)
+    except subprocess.TimeoutExpired:
+        return {'ok': False, 'error': 'timeout after %ds' % timeout}
+    entry = {
+        'ok': process.returncode == 0,
+        'seconds': time.perf_counter() - start,
+    }
+    try:
+        entry['result'] = json.loads(process.stdout)
+    except ValueError:
+        entry['ok'] = False
+    if not entry['ok']:
+        entry['error'] = process.stderr.strip().splitlines()[-20:]
+    return entry
+
+
+def run(names=None, quick=False):
+    names = names or available()
+    return {
+        'meta': {
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'quick': quick,
+            'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        },
+        'benchmarks': {name: run_benchmark(name, quick) for name in names},
+    }
+
+
+if __name__ == '__main__':
+    quick = False
+    output = None
+    names = []
+    for arg in sys.argv[1:]:
+        if arg == '--quick':
+            quick = True
+        elif arg.startswith('--output='):
+            output = arg.split('=', 1)[1]
+        elif arg in available():
+            names.append(arg)
+        else:
+            sys.exit('Unknown benchmark "%s", available: %s' %
+                     (arg, ', '.join(available())))
+    result = run(names, quick)
+    if output:
+        with open(output, 'w') as file:
+            json.dump(result, file, indent=2, sort_keys=True)
+            file.write('\n')
+    else:
+        json.dump(result, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+    if not all(entry['ok'] for entry in result['benchmarks'].values()):
+        sys.exit(1)
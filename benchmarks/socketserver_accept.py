@@ -0,0 +1,114 @@
+"""
+Compares the connections per second of the :class:`SocketServerWorker` accept
+loop with the previous implementation, which called :func:`select.select` on
+every iteration and accepted a single connection per wakeup.
+"""
+
+import select
+import socket
+import socketserver
+import threading
+import time
+
+from _common import main
+
+from score.serve import Service, SocketServerWorker
+
+
+class _Handler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        self.request.sendall(b'x')
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+    allow_reuse_address = True
+
+
+class Worker(SocketServerWorker):
+
+    def _mkserver(self):
+        return _Server(('127.0.0.1', 0), _Handler)
+
+
+class LegacyWorker(Worker):
+    """
+    The select()-based loop as it was implemented before the switch to
+    :mod:`selectors`.
+    """
+
+    def _loop(self):
+        if not self._SocketServerWorker__intr_pair:
+            return
+        intr_pair = self._SocketServerWorker__intr_pair
+        lock = self._SocketServerWorker__request_lock
+        while self.state not in self.final_states:
+            server = self._SocketServerWorker__server
+            try:
+                with lock:
+                    if self.state in self.running_states:
+                        sockets = (server.socket, intr_pair[0],)
+                    else:
+                        sockets = (intr_pair[0],)
+                r, w, e = select.select(sockets, [], [])
+                if intr_pair[0] in r:
+                    intr_pair[0].recv(2**10)
+                    continue
+            except InterruptedError:
+                continue
+            if server.socket in r:
+                self._process_request()
+        self._SocketServerWorker__server.server_close()
+        self._SocketServerWorker__server = None
+
+
+def _wait_for(service, state):
+    while service.state != state:
+        time.sleep(0.01)
+
+
+def bench_worker(cls, clients, duration):
+    worker = cls()
+    service = Service(cls.__name__, worker)
+    service.start()
+    _wait_for(service, Service.State.RUNNING)
+    address = worker._SocketServerWorker__server.server_address
+    deadline = time.perf_counter() + duration
+    counts = [0] * clients
+
+    def client(index):
+        while time.perf_counter() < deadline:
+            with socket.create_connection(address) as sock:
+                sock.recv(1)
+            counts[index] += 1
+
+    threads = [threading.Thread(target=client, args=(i,))
+               for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    service.stop()
+    _wait_for(service, Service.State.STOPPED)
+    return {
+        'connections': sum(counts),
+        'seconds': elapsed,
+        'connections_per_second': sum(counts) / elapsed,
+    }
+
+
+def run(quick=False):
+    duration = 1 if quick else 5
+    clients = 16
+    return {
+        'legacy': bench_worker(LegacyWorker, clients, duration),
+        'selectors': bench_worker(Worker, clients, duration),
+    }
+
+
+if __name__ == '__main__':
+    main(run)
@@ -0,0 +1,94 @@
+"""
+Measures how fast each file watching backend reports changes and how much CPU
+time it consumes while doing so.
+
+A tree of files is created in a temporary folder, every file is modified once
+and the time until all modifications were reported is recorded.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from _common import Stopwatch, cpu_time, main
+
+from score.serve._watch import backends, create_backend
+
+
+def _make_tree(root, dirs, files_per_dir):
+    paths = []
+    for i in range(dirs):
+        dir = os.path.join(root, 'dir%03d' % i)
+        os.makedirs(dir)
+        for j in range(files_per_dir):
+            path = os.path.join(dir, 'file%04d.py' % j)
+            with open(path, 'w') as file:
+                file.write('#')
+            paths.append(path)
+    return paths
+
+
+def _touch_all(paths):
+    for path in paths:
+        with open(path, 'a') as file:
+            file.write('#')
+
+
+def bench_backend(name, paths, root, generator_cpu, timeout):
+    expected = set(paths)
+    seen = set()
+    done = threading.Event()
+    num_events = 0
+
+    def callback(events):
+        nonlocal num_events
+        num_events += len(events)
+        seen.update(event.path for event in events)
+        if expected <= seen:
+            done.set()
+
+    backend = create_backend(name, callback, interval=0.05)
+    backend.schedule(root, recursive=True)
+    backend.start()
+    time.sleep(0.2)
+    with Stopwatch() as watch:
+        _touch_all(paths)
+        done.wait(timeout)
+    backend.stop()
+    backend.join()
+    detected = len(expected & seen)
+    return {
+        'changes': len(expected),
+        'detected': detected,
+        'events': num_events,
+        'seconds': watch.wall,
+        'changes_per_second': detected / watch.wall if watch.wall else None,
+        # the cpu time of generating the changes is not the backend's fault
+        'cpu_seconds': max(0.0, watch.cpu - generator_cpu),
+    }
+
+
+def run(quick=False):
+    dirs, files_per_dir = (10, 100) if quick else (50, 200)
+    result = {}
+    for name, cls in backends.items():
+        if not cls.available():
+            result[name] = None
+            continue
+        root = tempfile.mkdtemp(prefix='score-serve-bench-')
+        try:
+            paths = _make_tree(root, dirs, files_per_dir)
+            generator_cpu = cpu_time()
+            _touch_all(paths)
+            generator_cpu = cpu_time() - generator_cpu
+            result[name] = bench_backend(
+                name, paths, root, generator_cpu, timeout=60)
+        finally:
+            shutil.rmtree(root)
+    return result
+
+
+if __name__ == '__main__':
+    main(run)
@@ -26,14 +26,55 @@
 # the Licensee has his registered seat, an establishment or assets.
 
 
-from ._init import init, ConfiguredServeModule
-from .worker import (
-    Worker, SocketServerWorker, SimpleWorker, AsyncioWorker, FileWatcherWorker,
-    transitions)
-from .service import Service, ServiceState
+import importlib
+import sys
 
 __version__ = '0.1.28'
 
 __all__ = ('init', 'ConfiguredServeModule', 'Worker', 'SocketServerWorker',
-           'SimpleWorker', 'AsyncioWorker', 'FileWatcherWorker', 'transitions',
-           'Service', 'ServiceState')
+           'SimpleWorker', 'AsyncioWorker', 'ShardedAsyncioWorker',
+           'FileWatcherWorker', 'PeriodicWorker', 'ProcessWorker',
+           'ProcessGroup', 'transitions', 'Service', 'ServiceState',
+           'TransitionTimeout')
+
+# The members of this package are imported on first access, since most of
+# them are not needed for every invocation and some pull in heavy
+# dependencies.
+_lazy_members = {
+    'init': '._init',
+    'ConfiguredServeModule': '._init',
+    'Worker': '.worker',
+    'SocketServerWorker': '.worker',
+    'SimpleWorker': '.worker',
+    'AsyncioWorker': '.worker',
+    'ShardedAsyncioWorker': '.worker',
+    'FileWatcherWorker': '.worker',
+    'PeriodicWorker': '.worker',
+    'ProcessWorker': '.worker',
+    'ProcessGroup': '.worker',
+    'transitions': '.worker',
+    'Service': '.service',
+    'ServiceState': '.service',
+    'TransitionTimeout': '.service',
+}
+
+
+def __getattr__(name):
+    try:
+        module = _lazy_members[name]
+    except KeyError:
+        raise AttributeError(
+            'module %r has no attribute %r' % (__name__, name)) from None
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_members))
+
+
+if sys.version_info < (3, 7):
+    # module-level __getattr__ is not supported
+    for _name in _lazy_members:
+        __getattr__(_name)
@@ -25,60 +25,26 @@
 # the discretion of STRG.AT GmbH also the competent court, in whose district
 # the Licensee has his registered seat, an establishment or assets.
 
-import watchdog.events
-import watchdog.observers
-import watchdog.utils
 import os
 import sys
 import logging
 import threading
 import time
+from ._watch import create_backend, CREATED, MODIFIED
 
 log = logging.getLogger('score.serve.changedetector')
 
 
-Observer = watchdog.observers.Observer
+class ChangeDetector:
 
-if Observer.__name__ == 'InotifyObserver':
-    import watchdog.observers.inotify
-
-    # The inotify original observer has a small delay for pairing IN_MOVED_FROM
-    # and IN_MOVE_TO events. Since we do not care whether something was moved
-    # *into* or *out of* our watches, we will override this behaviour to
-    # achieve the fastest possible reload times.
-
-    class InotifyBuffer(watchdog.observers.inotify.InotifyBuffer):
-
-        def __init__(self, *args, **kwargs):
-            self.delay = 0
-            super().__init__(*args, **kwargs)
-
-        def close(self):
-            self.stop()
-
-    class InotifyEmitter(watchdog.observers.inotify.InotifyEmitter):
-
-        def on_thread_start(self):
-            path = watchdog.utils.unicode_paths.encode(self.watch.path)
-            self._inotify = InotifyBuffer(path, self.watch.is_recursive)
-
-    class InotifyObserver(watchdog.observers.inotify.InotifyObserver):
-
-        def __init__(self, *args, **kwargs):
-            watchdog.observers.api.BaseObserver.__init__(
-                self, *args, emitter_class=InotifyEmitter, **kwargs)
-
-    Observer = InotifyObserver
-
-
-class ChangeDetector(watchdog.events.FileSystemEventHandler):
-
-    def __init__(self, *, autostart=True):
+    def __init__(self, *, autostart=True, backend='auto', loop=None):
         self.callbacks = []
-        self.observer = Observer()
-        # set thread name
-        self.observer.name = 'ChangeDetector'
-        self.gatherer = threading.Thread(target=self._gather_modules)
+        self.loop = loop
+        self.observer = create_backend(
+            backend, self._events, name='ChangeDetector', loop=loop)
+        self.gatherer = None
+        if loop is None:
+            self.gatherer = threading.Thread(target=self._gather_modules)
         self.running = False
         self._observer_lock = threading.Lock()
         if autostart:
@@ -92,13 +58,23 @@ class ChangeDetector(watchdog.events.FileSystemEventHandler):
                     return
             time.sleep(0.5)
 
+    def _gather_modules_in_loop(self):
+        if not self.running:
+            return
+        for module in list(sys.modules.values()):
+            self.observe_module(module)
+        self.loop.call_later(0.5, self._gather_modules_in_loop)
+
     def start(self):
         self.observed_files = set()
         self.observed_dirs = {}
         self.observed_modules = set()
         self.file2modules = {}
         self.running = True
-        self.gatherer.start()
+        if self.gatherer:
+            self.gatherer.start()
+        else:
+            self.loop.call_soon_threadsafe(self._gather_modules_in_loop)
         with self._observer_lock:
             self.observer.start()
 
@@ -108,9 +84,9 @@ class ChangeDetector(watchdog.events.FileSystemEventHandler):
         self.running = False
         self.observer.stop()
         if wait:
-            if threading.current_thread() != self.observer:
-                self.observer.join()
-            self.gatherer.join()
+            self.observer.join()
+            if self.gatherer:
+                self.gatherer.join()
 
     def observe_module(self, module):
         if module in self.observed_modules:
@@ -163,7 +139,7 @@ class ChangeDetector(watchdog.events.FileSystemEventHandler):
                         del self.observed_dirs[other]
                 log.debug('scheduling %s' % (dir))
                 self.observed_dirs[dir] = \
-                    self.observer.schedule(self, dir, recursive=True)
+                    self.observer.schedule(dir, recursive=True)
 
     def add_callback(self, callback):
         self.callbacks.append(callback)
@@ -176,23 +152,24 @@ class ChangeDetector(watchdog.events.FileSystemEventHandler):
     def clear_callbacks(self):
         self.callbacks = []
 
-    def on_any_event(self, event):
-        if isinstance(event, watchdog.events.DirCreatedEvent):
-            return
-        if isinstance(event, watchdog.events.DirModifiedEvent):
-            return
-        FileCreatedEvent = watchdog.events.FileCreatedEvent
-        file = event.src_path
-        if file in self.observed_files:
-            try:
-                modules = self.file2modules[file]
-            except KeyError:
+    def _events(self, events):
+        for event in events:
+            if event.is_dir and event.kind in (CREATED, MODIFIED):
+                continue
+            file = event.path
+            if file in self.observed_files:
+                try:
+                    modules = self.file2modules[file]
+                except KeyError:
+                    modules = []
+                log.debug('file changed: %s' % file)
+            elif event.kind == CREATED and file.endswith('.py'):
+                log.debug('new file: %s' % file)
                 modules = []
-            log.debug('file changed: %s' % file)
-        elif isinstance(event, FileCreatedEvent) and file.endswith('.py'):
-            log.debug('new file: %s' % file)
-            modules = []
-        else:
-            return
-        for callback in self.callbacks:
-            callback(file, modules)
+            else:
+                continue
+            for callback in self.callbacks:
+                callback(file, modules)
+            if not self.running:
+                # one of the callbacks stopped us
+                return
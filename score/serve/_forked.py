@@ -26,13 +26,14 @@
 # the Licensee has his registered seat, an establishment or assets.
 
 import asyncio
-import multiprocessing
 import threading
 import os
 import functools
 import signal
 import sys
-from tblib import pickling_support
+import logging
+import weakref
+from collections import OrderedDict
 
 try:
     from types import coroutine
@@ -40,10 +41,34 @@ except ImportError:
     from asyncio import coroutine
 
 
-pickling_support.install()
+log = logging.getLogger(__name__)
 
+_pickling_support_installed = False
 
-def fork(loop, cls, *args, **kwargs):
+# all gateways of the current process, whose pipes must not leak into
+# processes forked later on
+_gateways = weakref.WeakSet()
+
+
+def _install_pickling_support():
+    # allows passing tracebacks of exceptions between processes
+    global _pickling_support_installed
+    if not _pickling_support_installed:
+        from tblib import pickling_support
+        pickling_support.install()
+        _pickling_support_installed = True
+
+
+def fork(loop, cls, *args, placement=None, **kwargs):
+    """
+    Forks a child process, that creates an instance of *cls* with given
+    arguments, and returns a :class:`Gateway` for communicating with that
+    instance via the given *loop*. An optional
+    :class:`score.serve._placement.Placement` is applied to the child right
+    after forking.
+    """
+    import multiprocessing
+    _install_pickling_support()
     parent_pipe, child_pipe = multiprocessing.Pipe()
     if threading.active_count() > 1:
         # Cannot use os.fork() on linux when using threads, so we will try
@@ -60,10 +85,25 @@ def fork(loop, cls, *args, **kwargs):
                 'Cannot fork using start_method "fork" when using threads')
     childpid = os.fork()
     if childpid:
+        child_pipe.close()
         return Gateway(loop, cls, childpid, parent_pipe)
+    # only the parent may hold the other end of our pipe, or we would never
+    # notice its death
+    parent_pipe.close()
+    for gateway in list(_gateways):
+        gateway.pipe.close()
+    _gateways.clear()
     signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # the parent may have installed a handler of its own
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if placement is not None:
+        try:
+            placement.apply()
+        except Exception as e:
+            log.exception('Could not apply %r: %s' % (placement, e))
     obj = cls(*args, **kwargs)
     obj.pipe = child_pipe
+    obj._send_lock = threading.Lock()
     loop = asyncio.get_event_loop()
     if loop.is_running():
         loop.stop()
@@ -78,14 +118,23 @@ def _handle_call(obj):
     def done(future):
         exc = future.exception()
         if exc:
-            obj.pipe.send((id, False, (type(exc), exc, exc.__traceback__)))
+            obj._send((id, False, (type(exc), exc, exc.__traceback__)))
         else:
-            obj.pipe.send((id, True, future.result()))
-    command = obj.pipe.recv()
+            obj._send((id, True, future.result()))
+    try:
+        command = obj.pipe.recv()
+    except EOFError:
+        # the parent is gone, there is nobody left to serve
+        loop = asyncio.get_event_loop()
+        loop.remove_reader(obj.pipe.fileno())
+        loop.stop()
+        return
     id, funcname, args, kwargs = command
     try:
         if funcname == '_get_attribute':
             result = getattr(obj, args[0])
+        elif funcname == '_ping':
+            result = None
         else:
             callback = getattr(obj, funcname)
             result = callback(*args, **kwargs)
@@ -93,37 +142,60 @@ def _handle_call(obj):
                 loop = asyncio.get_event_loop()
                 loop.create_task(result).add_done_callback(done)
                 return
-        obj.pipe.send((id, True, result))
+        obj._send((id, True, result))
     except:
-        obj.pipe.send((id, False, sys.exc_info()))
+        obj._send((id, False, sys.exc_info()))
 
 
 class Backgrounded:
 
     def trigger(self, event, *args):
-        self.pipe.send((event, args))
+        """
+        Sends an event to the parent process. May be called from any thread.
+        """
+        self._send((event, args))
+
+    def _send(self, message):
+        with self._send_lock:
+            self.pipe.send(message)
 
     def kill(self):
         loop = asyncio.get_event_loop()
         loop.stop()
 
 
+class ChildDiedError(ConnectionError):
+    """
+    Raised for the commands of a :class:`Gateway`, whose child process died
+    or closed its end of the pipe before answering.
+    """
+
+
 class Gateway:
+    """
+    Sends commands to an object hosted in a child process created by
+    :func:`fork` and dispatches the events it triggers to the callbacks
+    registered via :meth:`on`.
+
+    The gateway watches its child process: as soon as it exits, all pending
+    commands fail with a :class:`ChildDiedError` and the callbacks of the
+    ``exit`` event receive the exit code of the process.
+    """
 
     def __init__(self, loop, cls, childpid, pipe):
         self.cls = cls
         self.childpid = childpid
+        self.exitcode = None
         self.pipe = pipe
         self.last_command_id = 0
-        self.responses = {}
+        self.pending = {}
         self.loop = loop
         self.loop.add_reader(self.pipe.fileno(), self._message_received)
-        if sys.version_info.major == 3 and sys.version_info.minor < 10:
-            self.event = asyncio.Event(loop=loop)
-        else:
-            # The loop kwarg was removed in Python 3.10
-            self.event = asyncio.Event()
+        _gateways.add(self)
         self.callbacks = {}
+        self.__closed = None
+        self.__heartbeat = None
+        self.__watcher = loop.create_task(self.__watch(childpid))
 
     def on(self, event, callback):
         if event not in self.callbacks:
@@ -135,41 +207,91 @@ class Gateway:
         if not self.callbacks[event]:
             del self.callbacks[event]
 
+    def call(self, command, args=(), kwargs={}, *, timeout=None):
+        """
+        Calls the method *command* of the hosted object with given
+        arguments, just like accessing the method on this gateway would. The
+        returned coroutine raises :class:`asyncio.TimeoutError`, if there was
+        no response within *timeout* seconds.
+        """
+        return self._send_command_timeout(command, args, kwargs, timeout)
+
+    def start_heartbeat(self, interval, timeout):
+        """
+        Pings the child process every *interval* seconds. If it does not
+        answer within *timeout* seconds, the callbacks of the
+        ``unresponsive`` event are invoked with the number of seconds the
+        child has been silent and the heartbeat ends.
+        """
+        if self.__heartbeat is None:
+            self.__heartbeat = self.loop.create_task(
+                self.__beat(interval, timeout))
+
+    def stop_heartbeat(self):
+        heartbeat, self.__heartbeat = self.__heartbeat, None
+        if heartbeat is not None:
+            heartbeat.cancel()
+
     def _message_received(self):
         try:
             message = self.pipe.recv()
-        except EOFError:
+        except (EOFError, OSError):
+            self.__close('child process closed the pipe')
             return
         if len(message) == 2:
-            event, args = message
-            if event not in self.callbacks:
-                return
-            for callback in self.callbacks[event]:
-                result = callback(*args)
-                if asyncio.iscoroutine(result):
-                    self.loop.create_task(result)
+            self._dispatch(*message)
         else:
             id, success, result = message
-            self.responses[id] = (success, result)
-            self.event.set()
+            future = self.pending.pop(id, None)
+            if future is not None and not future.done():
+                future.set_result((success, result))
+
+    def _dispatch(self, event, args):
+        for callback in list(self.callbacks.get(event, ())):
+            result = callback(*args)
+            if asyncio.iscoroutine(result):
+                self.loop.create_task(result)
 
     @coroutine
     def kill(self):
+        """
+        Asks the child process to exit and waits until it did.
+        """
         if not self.childpid:
             return
         try:
             yield from self._send_command('kill')
-        except BrokenPipeError:
+        except ConnectionError:
             pass
+        yield from self.wait_exited()
+
+    def send_signal(self, signum):
+        """
+        Sends the signal *signum* to the child process, if it is still
+        running.
+        """
         if not self.childpid:
             return
-        os.waitpid(self.childpid, 0)
-        self.childpid = None
+        try:
+            os.kill(self.childpid, signum)
+        except ProcessLookupError:
+            pass
+
+    @coroutine
+    def wait_exited(self, timeout=None):
+        """
+        Waits until the child process has terminated and was reaped. Raises
+        :class:`asyncio.TimeoutError`, if it is still running after *timeout*
+        seconds.
+        """
+        if self.__watcher.done():
+            return
+        yield from asyncio.wait_for(asyncio.shield(self.__watcher), timeout)
 
     def cleanup(self):
-        self.loop.remove_reader(self.pipe.fileno())
-        if self.childpid:
-            os.kill(self.childpid, signal.SIGTERM)
+        self.__close('gateway was cleaned up')
+        self.stop_heartbeat()
+        self.send_signal(signal.SIGTERM)
 
     def __getattr__(self, name):
         if name.startswith('_'):
@@ -185,17 +307,251 @@ class Gateway:
         setattr(self, name, callback)
         return callback
 
-    @coroutine
     def _send_command(self, command, *args, **kwargs):
+        return self._send_command_timeout(command, args, kwargs, None)
+
+    @coroutine
+    def _send_command_timeout(self, command, args, kwargs, timeout):
+        if self.__closed:
+            raise ChildDiedError(self.__closed)
         command_id = self.last_command_id + 1
         self.last_command_id += 1
-        self.pipe.send((command_id, command, args, kwargs))
-        while True:
-            yield from self.event.wait()
-            self.event.clear()
-            if command_id in self.responses:
-                success, result = self.responses[command_id]
-                break
+        future = self.loop.create_future()
+        self.pending[command_id] = future
+        try:
+            self.pipe.send((command_id, command, args, kwargs))
+            if timeout is None:
+                success, result = yield from future
+            else:
+                success, result = yield from asyncio.wait_for(
+                    future, timeout)
+        finally:
+            self.pending.pop(command_id, None)
         if success:
             return result
         raise result[1].with_traceback(result[2])
+
+    def __close(self, reason):
+        """
+        Stops listening to the child process and fails all pending commands.
+        """
+        if self.__closed:
+            return
+        self.__closed = reason
+        self.loop.remove_reader(self.pipe.fileno())
+        pending, self.pending = self.pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(ChildDiedError(reason))
+
+    @coroutine
+    def __watch(self, pid):
+        exitcode = yield from wait_for_exit(self.loop, pid)
+        self.childpid = None
+        self.exitcode = exitcode
+        self.__close('child process %d exited with code %s' % (pid, exitcode))
+        self._dispatch('exit', (exitcode,))
+
+    @coroutine
+    def __beat(self, interval, timeout):
+        while not self.__closed:
+            yield from asyncio.sleep(interval)
+            started = self.loop.time()
+            try:
+                yield from self._send_command_timeout(
+                    '_ping', (), {}, timeout)
+            except asyncio.TimeoutError:
+                self._dispatch('unresponsive', (self.loop.time() - started,))
+                return
+            except ConnectionError:
+                return
+
+
+class WorkerHost(Backgrounded):
+    """
+    Hosts one or more :class:`workers <score.serve.Worker>` in a forked
+    process.
+
+    Each of the given *workers*, a `dict` mapping names to workers, is wrapped
+    in a :class:`Service <score.serve.Service>` inside the child process.
+    State changes of these services are forwarded to the parent as
+    ``state-change`` events, passing the name of the service, the old and the
+    new state and the exception, if the new state is ``EXCEPTION``.
+    """
+
+    def __init__(self, workers):
+        from .service import Service
+        self.services = OrderedDict()
+        for name, worker in workers.items():
+            service = Service(name, worker)
+            service.register_state_change_listener(self._state_changed)
+            self.services[name] = service
+
+    def _state_changed(self, service, old, new):
+        exception = service.exception if new == service.State.EXCEPTION \
+            else None
+        try:
+            self.trigger('state-change', service.name, old.value, new.value,
+                         exception)
+        except Exception:
+            # the exception could not be pickled
+            exception = RuntimeError(repr(exception))
+            self.trigger('state-change', service.name, old.value, new.value,
+                         exception)
+
+    @coroutine
+    def transition(self, name, state):
+        """
+        Transitions the hosted service called *name* to given *state* and
+        returns as soon as the state was reached. Raises the exception of the
+        worker, if the service ended up in the ``EXCEPTION`` state instead.
+        """
+        service = self.services[name]
+        state = service.State(state)
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+
+        def listener(service, old, new):
+            if new in (state, service.State.EXCEPTION):
+                loop.call_soon_threadsafe(resolve)
+
+        def resolve():
+            if not future.done():
+                future.set_result(None)
+
+        service.register_state_change_listener(listener)
+        try:
+            service._transition_to(state)
+            if service.state not in (state, service.State.EXCEPTION):
+                yield from future
+        finally:
+            service.unregister_state_change_listener(listener)
+        if service.state == service.State.EXCEPTION:
+            raise service.exception
+
+    def reset(self, name):
+        """
+        Moves the hosted service called *name* out of the ``EXCEPTION``
+        state, so that it can be transitioned again.
+        """
+        self.services[name].reset()
+
+    def requests_handled(self, name):
+        """
+        Returns the :attr:`requests_handled
+        <score.serve.Worker.requests_handled>` of the hosted service called
+        *name*.
+        """
+        return self.services[name].worker.requests_handled
+
+    def info(self, name):
+        from ._placement import current
+        info = self.services[name].info()
+        info['pid'] = os.getpid()
+        info['placement'] = current()
+        return info
+
+
+def _reap(pid):
+    try:
+        reaped, status = os.waitpid(pid, os.WNOHANG)
+    except ChildProcessError:
+        # somebody else reaped it already
+        return True, None
+    if not reaped:
+        return False, None
+    if hasattr(os, 'waitstatus_to_exitcode'):
+        return True, os.waitstatus_to_exitcode(status)
+    return True, status
+
+
+@coroutine
+def wait_for_exit(loop, pid, timeout=None):
+    """
+    Waits until the child process *pid* has terminated without blocking the
+    *loop* and reaps it. Returns the exit code, which is negative if the
+    process was killed by a signal, or `None` if the code is unknown. Raises
+    :class:`asyncio.TimeoutError`, if the process is still running after
+    *timeout* seconds.
+
+    The process is observed via a pidfd, where available, and polled
+    otherwise.
+    """
+    deadline = None if timeout is None else loop.time() + timeout
+    pidfd = None
+    if hasattr(os, 'pidfd_open'):
+        try:
+            pidfd = os.pidfd_open(pid)
+        except OSError:
+            pass
+    try:
+        while True:
+            exited, code = _reap(pid)
+            if exited:
+                return code
+            delay = None if pidfd is not None else 0.05
+            if deadline is not None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError(
+                        'Process %d still running after %ss' % (pid, timeout))
+                delay = remaining if delay is None else min(delay, remaining)
+            future = loop.create_future()
+
+            def wakeup():
+                if not future.done():
+                    future.set_result(None)
+
+            handle = None
+            if delay is not None:
+                handle = loop.call_later(delay, wakeup)
+            if pidfd is not None:
+                loop.add_reader(pidfd, wakeup)
+            try:
+                yield from future
+            finally:
+                if handle is not None:
+                    handle.cancel()
+                if pidfd is not None:
+                    loop.remove_reader(pidfd)
+    finally:
+        if pidfd is not None:
+            os.close(pidfd)
+
+
+_gateway_loop = None
+_gateway_loop_lock = threading.Lock()
+
+
+def gateway_loop():
+    """
+    Returns an event loop running in a background thread of the current
+    process, which can be used for :class:`Gateway` objects of processes
+    forked by threads, that do not have an event loop of their own.
+    """
+    global _gateway_loop
+    with _gateway_loop_lock:
+        if _gateway_loop is not None and _gateway_loop[0] == os.getpid():
+            return _gateway_loop[1]
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, name='Gateway')
+        thread.daemon = True
+        thread.start()
+        _gateway_loop = (os.getpid(), loop)
+        return loop
+
+
+def call_in_loop(loop, func, *args):
+    """
+    Invokes *func* inside the given running *loop* and blocks the current
+    thread until it has finished. If *func* returns a coroutine, its result
+    will be awaited. Returns the result or raises the exception of the
+    call.
+    """
+    @coroutine
+    def wrapper():
+        result = func(*args)
+        if asyncio.iscoroutine(result):
+            result = yield from result
+        return result
+    return asyncio.run_coroutine_threadsafe(wrapper(), loop).result()
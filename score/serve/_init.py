@@ -25,28 +25,24 @@
 # the discretion of STRG.AT GmbH also the competent court, in whose district
 # the Licensee has his registered seat, an establishment or assets.
 
-import socket
 import asyncio
+import importlib.util
 import sys
+import time
 from score.init import (
-    ConfiguredModule, parse_list, parse_bool, parse_host_port, init_from_file,
+    ConfiguredModule, parse_list, parse_bool, parse_host_port,
+    parse_dotted_path, parse_time_interval, parse_config_file,
     InitializationError)
-from .service import Service
+from .service import Service, TransitionTimeout
 from ._forked import fork, Backgrounded
-from ._changedetect import ChangeDetector
 from collections import OrderedDict
 from contextlib import contextmanager
 import traceback
 import signal
 import logging
-from .worker import Worker
-
-try:
-    import uvloop
-except ImportError:
-    pass
-else:
-    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+import os
+import threading
+from .worker.worker import Worker
 
 try:
     from types import coroutine
@@ -58,8 +54,31 @@ log = logging.getLogger('score.serve')
 
 defaults = {
     'autoreload': False,
+    'autoreload.backend': 'auto',
+    'dns.ttl': '5m',
+    'dns.negative_ttl': '10s',
+    'dns.cache_size': 1024,
+    'heartbeat': '10s',
+    'heartbeat.timeout': '60s',
+    'loop': 'auto',
     'modules': [],
     'monitor': None,
+    'prepare_concurrency': None,
+    'process_groups': [],
+    'reactor': 'dedicated',
+    'reactor.threads': 16,
+    'recycle.max_rss': None,
+    'recycle.max_requests': None,
+    'recycle.max_age': None,
+    'recycle.interval': '10s',
+    'restart': False,
+    'restart.delay': '100ms',
+    'restart.max_delay': '30s',
+    'restart.budget': 10,
+    'restart.window': '5m',
+    'shutdown.grace': '30s',
+    'shutdown.timeout': '60s',
+    'timeline.file': None,
 }
 
 
@@ -73,12 +92,198 @@ def init(confdict):
         automatically reload whenever it detects a change in one of the python
         files, that are in use.
 
+    :confkey:`autoreload.backend` :confdefault:`auto`
+        The file system watching backend to use for detecting changes. Valid
+        values are ``inotify`` (linux only), ``watchdog`` and ``polling``. The
+        default value ``auto`` will pick the first one available. The polling
+        backend is the only one capable of detecting changes on network file
+        systems.
+
+    :confkey:`dns.ttl` :confdefault:`5m`
+        Hostnames are resolved in a thread pool, so that the event loops are
+        never blocked by DNS lookups. Results are cached for this :func:`time
+        interval <score.init.parse_time_interval>`.
+
+    :confkey:`dns.negative_ttl` :confdefault:`10s`
+        The :func:`time interval <score.init.parse_time_interval>` for caching
+        failed lookups.
+
+    :confkey:`dns.cache_size` :confdefault:`1024`
+        The maximum number of cached lookups. A value of ``0`` disables the
+        cache.
+
+    :confkey:`heartbeat` :confdefault:`10s`
+        The server process pings the process controlling the services at
+        this :func:`time interval <score.init.parse_time_interval>`. The
+        value ``none`` disables the heartbeat.
+
+    :confkey:`heartbeat.timeout` :confdefault:`60s`
+        A controller process, that does not answer a ping within this
+        :func:`time interval <score.init.parse_time_interval>`, is considered
+        hung and killed. The server restarts all services in a fresh process
+        afterwards, just like it does when the controller process dies.
+
+    :confkey:`loop` :confdefault:`auto`
+        The event loop implementation to use for :class:`AsyncioWorker`
+        services, that do not define a ``loop_factory`` of their own. Valid
+        values are ``default`` (the loop of the current :mod:`asyncio` event
+        loop policy), ``uvloop`` and the :func:`dotted path
+        <score.init.parse_dotted_path>` to a callable returning a new event
+        loop. The value ``auto`` uses ``uvloop``, if it is installed.
+
+        It is also possible to configure the loop of a single service by
+        appending the service name to the key, for example
+        ``loop.http/public = uvloop``. Such values take precedence over the
+        ``loop_factory`` of the worker.
+
     :confkey:`modules`
         The :func:`list <score.init.parse_list>` of modules to serve. This need
         to be a list of module aliases, i.e. the same name, with which you
         configured the module with ("score.http" becomes "http" if not
         specified otherwise.)
 
+    :confkey:`prepare_concurrency` :confdefault:`None`
+        The maximum number of services, that may prepare at the same time.
+        Further services wait until one of the preparing services is done.
+        All services prepare at once by default.
+
+    :confkey:`priority.<name>` :confdefault:`0`
+        The priority of a service or of all services of a module, selected
+        by *name* just like in ``process_groups``. Services with higher
+        priorities are prepared and started first, which matters most in
+        combination with ``prepare_concurrency``.
+
+    :confkey:`process_groups`
+        A :func:`list <score.init.parse_list>` of services, that should run
+        in processes of their own. Every entry is either the name of a
+        service or the name of a module, which selects all services of that
+        module. Several services can share a process by joining them with a
+        ``+``, entries on the same line can also be separated by commas::
+
+            process_groups =
+                http
+                consumers/mail + consumers/sms
+
+    :confkey:`placement.<name>.<setting>`
+        Scheduling settings for the process of a service or a module, which
+        is selected by *name* just like in ``process_groups``. Services with
+        placement settings always run in a process of their own, or in the
+        process of their group. Valid settings are:
+
+        * ``cpus``: the CPUs the process may run on, like ``2-3,6``,
+        * ``nice``: the nice level,
+        * ``ionice``: the I/O scheduling class ``realtime``,
+          ``best-effort`` or ``idle``, optionally followed by a colon and
+          the level, like ``best-effort:7``,
+        * ``policy``: the scheduling policy ``other``, ``batch`` or
+          ``idle``.
+
+        Example::
+
+            placement.http.cpus = 2-3
+            placement.consumers.policy = batch
+            placement.watcher.nice = 10
+
+    :confkey:`reactor` :confdefault:`dedicated`
+        Every :class:`AsyncioWorker` runs its own event loop in a thread of
+        its own by default, as does the accept loop of every
+        :class:`SocketServerWorker`. The value ``shared`` runs all of them on
+        a single event loop per process instead, so that the number of
+        threads no longer grows with the number of services. The loop uses
+        the implementation configured as ``loop``, and also watches the files
+        for ``autoreload``, if the inotify backend is used.
+
+        Services sharing the loop must never block it. The mode of a service
+        or of all services of a module can be configured by appending its
+        name, like ``reactor.legacy = dedicated``. Such values take
+        precedence over the ``reactor`` of the worker. A
+        :class:`ShardedAsyncioWorker` always runs its shards on loops of
+        their own.
+
+    :confkey:`reactor.threads` :confdefault:`16`
+        The maximum number of threads handling the requests of all socket
+        servers on the shared loop, that do not have a ``pool_size`` of
+        their own.
+
+    :confkey:`shutdown.grace` :confdefault:`30s`
+        All services are stopped in parallel, when the server shuts down or
+        reloads. If some of them are still stopping after this :func:`time
+        interval <score.init.parse_time_interval>`, they are reported and the
+        process running them receives a ``SIGTERM``, which also terminates
+        all of its process groups.
+
+    :confkey:`shutdown.timeout` :confdefault:`60s`
+        The hard deadline for the whole shutdown, measured from its start.
+        Processes still alive at this point receive a ``SIGKILL``.
+
+    :confkey:`timeout.<transition>` :confdefault:`None`
+        The maximum :func:`time interval <score.init.parse_time_interval>`
+        a worker may spend in a transition, where *transition* is the name of
+        the worker method, like ``prepare`` or ``stop``. Services exceeding
+        it end up in the ``EXCEPTION`` state. The stack of the stuck thread
+        is logged and included in the ``info`` command of the monitor. This
+        value applies to all workers, that do not define
+        :attr:`transition_timeouts <score.serve.Worker.transition_timeouts>`
+        of their own.
+
+        The timeouts of a service or of all services of a module can be
+        configured by inserting its name, like
+        ``timeout.db/pool.prepare = 2m``. These take precedence over the
+        worker's own values. The value ``none`` disables a timeout.
+
+    :confkey:`timeline.file` :confdefault:`None`
+        The services record when each of their transitions was requested,
+        started and finished. This timeline can be requested via the
+        ``timeline`` command of the monitor and will also be written to this
+        file, whenever all transitions are complete. The file contains JSON
+        in the Trace Event Format, which can be loaded into
+        ``chrome://tracing`` or Perfetto for finding the services delaying
+        the startup.
+
+    :confkey:`recycle.max_rss` :confdefault:`None`
+        Replaces processes, whose resident memory exceeds this size, like
+        ``2G``, with a fresh fork. This applies to every process group as
+        well as the controller process hosting all other services. Process
+        groups are recycled individually, while recycling the controller
+        restarts all services running in it.
+
+    :confkey:`recycle.max_requests` :confdefault:`None`
+        Recycles processes, whose services have handled more than this number
+        of requests. See :attr:`Worker.requests_handled
+        <score.serve.Worker.requests_handled>`.
+
+    :confkey:`recycle.max_age` :confdefault:`None`
+        Recycles processes older than this :func:`time interval
+        <score.init.parse_time_interval>`.
+
+    :confkey:`recycle.interval` :confdefault:`10s`
+        How often the above limits are checked.
+
+    :confkey:`restart` :confdefault:`False`
+        Whether failed services should be restarted automatically. Only the
+        failed service is restarted, all others keep running. Its worker is
+        reused, unless it failed due to a transition timeout, in which case
+        a new one is requested from its module's ``score_serve_workers()``.
+
+    :confkey:`restart.delay` :confdefault:`100ms`
+        The :func:`time interval <score.init.parse_time_interval>` before
+        the first restart of a failed service. Every further restart waits
+        twice as long as the previous one, randomized by up to 50% to spread
+        the restarts of services failing at the same time.
+
+    :confkey:`restart.max_delay` :confdefault:`30s`
+        The upper limit for the delay between restarts.
+
+    :confkey:`restart.budget` :confdefault:`10`
+        The maximum number of restarts of a service within the
+        ``restart.window``. A service failing once more is left in the
+        ``EXCEPTION`` state. The server shuts down, as soon as no services
+        are left running.
+
+    :confkey:`restart.window` :confdefault:`5m`
+        The :func:`time interval <score.init.parse_time_interval>` in which
+        the restarts of a service count towards its ``restart.budget``.
+
     """
     conf = defaults.copy()
     conf.update(confdict)
@@ -87,11 +292,179 @@ def init(confdict):
         import score.serve
         raise InitializationError(score.serve, 'No modules configured')
     autoreload = parse_bool(conf['autoreload'])
+    autoreload_backend = conf['autoreload.backend'].strip()
+    if autoreload and autoreload_backend != 'auto':
+        from ._watch import backends
+        if autoreload_backend not in backends:
+            import score.serve
+            raise InitializationError(
+                score.serve,
+                'Invalid autoreload.backend "%s"' % autoreload_backend)
+    loop_factories = {}
+    for key in conf:
+        if key != 'loop' and not key.startswith('loop.'):
+            continue
+        service = key[len('loop.'):] or None
+        loop_factories[service] = _parse_loop_factory(conf[key].strip())
+    from ._resolver import CachingResolver
+    resolver = CachingResolver(
+        ttl=parse_time_interval(conf['dns.ttl']),
+        negative_ttl=parse_time_interval(conf['dns.negative_ttl']),
+        cache_size=int(conf['dns.cache_size']))
+    process_groups = []
+    for line in parse_list(conf['process_groups']):
+        for group in line.split(','):
+            members = tuple(filter(None, map(str.strip, group.split('+'))))
+            if members:
+                process_groups.append(members)
+    placements = OrderedDict()
+    for key in conf:
+        if not key.startswith('placement.'):
+            continue
+        name, _, setting = key[len('placement.'):].rpartition('.')
+        if not name or setting not in ('cpus', 'nice', 'ionice', 'policy'):
+            import score.serve
+            raise InitializationError(
+                score.serve, 'Invalid placement key "%s"' % key)
+        placements.setdefault(name, {})[setting] = conf[key]
+    for name, settings in placements.items():
+        from ._placement import Placement
+        try:
+            placements[name] = Placement.parse(**settings)
+        except ValueError as e:
+            import score.serve
+            raise InitializationError(
+                score.serve, 'Invalid placement of "%s": %s' % (name, e))
+    try:
+        recycle_policy = None
+        if conf['recycle.max_rss'] or conf['recycle.max_requests'] or \
+                conf['recycle.max_age']:
+            from ._recycle import RecyclePolicy, parse_size
+            recycle_policy = RecyclePolicy(
+                max_rss=(parse_size(conf['recycle.max_rss'])
+                         if conf['recycle.max_rss'] else None),
+                max_requests=(int(conf['recycle.max_requests'])
+                              if conf['recycle.max_requests'] else None),
+                max_age=(parse_time_interval(conf['recycle.max_age'])
+                         if conf['recycle.max_age'] else None))
+        recycle_interval = parse_time_interval(conf['recycle.interval'])
+        shutdown_grace = parse_time_interval(conf['shutdown.grace'])
+        heartbeat = None
+        if conf['heartbeat'] and conf['heartbeat'].strip().lower() != 'none':
+            heartbeat = (parse_time_interval(conf['heartbeat']),
+                         parse_time_interval(conf['heartbeat.timeout']))
+        shutdown_timeout = max(shutdown_grace,
+                               parse_time_interval(conf['shutdown.timeout']))
+        restart_policy = None
+        if parse_bool(conf['restart']):
+            from ._supervisor import RestartPolicy
+            restart_policy = RestartPolicy(
+                delay=parse_time_interval(conf['restart.delay']),
+                max_delay=parse_time_interval(conf['restart.max_delay']),
+                budget=int(conf['restart.budget']),
+                window=parse_time_interval(conf['restart.window']))
+        transition_timeouts = OrderedDict()
+        for key in conf:
+            if not key.startswith('timeout.'):
+                continue
+            name, _, transition = key[len('timeout.'):].rpartition('.')
+            value = conf[key].strip()
+            transition_timeouts.setdefault(name or None, {})[transition] = (
+                None if value.lower() == 'none'
+                else parse_time_interval(value))
+    except ValueError as e:
+        import score.serve
+        raise InitializationError(score.serve, str(e))
+    reactor_modes = OrderedDict()
+    for key in conf:
+        if key != 'reactor' and not key.startswith('reactor.') or \
+                key == 'reactor.threads':
+            continue
+        mode = conf[key].strip()
+        if mode not in ('dedicated', 'shared'):
+            import score.serve
+            raise InitializationError(
+                score.serve, 'Invalid reactor "%s"' % mode)
+        reactor_modes[key[len('reactor.'):] or None] = mode
+    reactor = None
+    if 'shared' in reactor_modes.values():
+        from ._reactor import Reactor
+        try:
+            threads = int(conf['reactor.threads'])
+        except ValueError as e:
+            import score.serve
+            raise InitializationError(score.serve, str(e))
+        reactor = Reactor(loop_factories.get(None), resolver, threads)
+    prepare_concurrency = None
+    priorities = OrderedDict()
+    try:
+        if conf['prepare_concurrency']:
+            prepare_concurrency = int(conf['prepare_concurrency']) or None
+        for key in conf:
+            if key.startswith('priority.'):
+                priorities[key[len('priority.'):]] = int(conf[key])
+    except ValueError as e:
+        import score.serve
+        raise InitializationError(score.serve, str(e))
     monitor_host_port = None
     if conf['monitor']:
         monitor_host_port = parse_host_port(conf['monitor'])
     return ConfiguredServeModule(conf['conf'], modules, autoreload,
-                                 monitor_host_port)
+                                 monitor_host_port,
+                                 autoreload_backend=autoreload_backend,
+                                 loop_factories=loop_factories,
+                                 resolver=resolver,
+                                 process_groups=process_groups,
+                                 placements=placements,
+                                 recycle_policy=recycle_policy,
+                                 recycle_interval=recycle_interval,
+                                 prepare_concurrency=prepare_concurrency,
+                                 priorities=priorities,
+                                 timeline_file=conf['timeline.file'],
+                                 shutdown_grace=shutdown_grace,
+                                 shutdown_timeout=shutdown_timeout,
+                                 transition_timeouts=transition_timeouts,
+                                 restart_policy=restart_policy,
+                                 heartbeat=heartbeat,
+                                 reactor=reactor,
+                                 reactor_modes=reactor_modes)
+
+
+def _new_uvloop():
+    import uvloop
+    return uvloop.new_event_loop()
+
+
+def _new_auto_loop():
+    try:
+        import uvloop
+    except ImportError:
+        return asyncio.new_event_loop()
+    return uvloop.new_event_loop()
+
+
+def _parse_loop_factory(value):
+    if value == 'default':
+        return asyncio.new_event_loop
+    if value == 'auto':
+        return _new_auto_loop
+    if value == 'uvloop':
+        if importlib.util.find_spec('uvloop') is None:
+            import score.serve
+            raise InitializationError(
+                score.serve, 'Loop "uvloop" configured, but not installed')
+        return _new_uvloop
+    try:
+        factory = parse_dotted_path(value)
+    except (ValueError, ImportError, AttributeError) as e:
+        import score.serve
+        raise InitializationError(
+            score.serve, 'Invalid loop "%s": %s' % (value, e))
+    if not callable(factory):
+        import score.serve
+        raise InitializationError(
+            score.serve, 'Invalid loop "%s": not callable' % value)
+    return factory
 
 
 class ConfiguredServeModule(ConfiguredModule):
@@ -99,33 +472,48 @@ class ConfiguredServeModule(ConfiguredModule):
     This module's :class:`configuration class`
     """
 
-    def __init__(self, conf, modules, autoreload, monitor_host_port):
+    def __init__(self, conf, modules, autoreload, monitor_host_port, *,
+                 autoreload_backend='auto', loop_factories={},
+                 resolver=None, process_groups=(), placements={},
+                 recycle_policy=None, recycle_interval=10,
+                 prepare_concurrency=None, priorities={},
+                 timeline_file=None, shutdown_grace=30,
+                 shutdown_timeout=60, transition_timeouts={},
+                 restart_policy=None, heartbeat=None, reactor=None,
+                 reactor_modes={}):
         import score.serve
         ConfiguredModule.__init__(self, score.serve)
         self.conf = conf
         self.modules = modules
         self.autoreload = autoreload
+        self.autoreload_backend = autoreload_backend
+        self.loop_factories = loop_factories
+        if resolver is None:
+            from ._resolver import CachingResolver
+            resolver = CachingResolver()
+        self.resolver = resolver
+        self.process_groups = process_groups
+        self.placements = placements
+        self.recycle_policy = recycle_policy
+        self.recycle_interval = recycle_interval
+        self.prepare_concurrency = prepare_concurrency
+        self.priorities = priorities
+        self.timeline_file = timeline_file
+        self.shutdown_grace = shutdown_grace
+        self.shutdown_timeout = shutdown_timeout
+        self.transition_timeouts = transition_timeouts
+        self.restart_policy = restart_policy
+        self.heartbeat = heartbeat
+        self.reactor = reactor
+        self.reactor_modes = reactor_modes
         self.monitor_connections = []
         self.monitor_host_port = monitor_host_port
         self.loop = asyncio.new_event_loop()
-        self.loop.getaddrinfo = self._getaddrinfo
+        self.resolver.install(self.loop)
 
     def _finalize(self, score):
         self._score = score
 
-    def _getaddrinfo(self, host, port, *, family=0, type=0, proto=0, flags=0):
-        """
-        The default loop implementation uses loop.run_in_executor to resolve
-        addresses, which in turn uses a ThreadPoolExecutor or a
-        ProcessPoolExecutor. Neither of these executors is feasable, since
-        forking would break both of them. This is the reason we are resolving
-        hostnames synchronously.
-        """
-        @coroutine
-        def getaddrinfo():
-            return socket.getaddrinfo(host, port, family, type, proto, flags)
-        return getaddrinfo()
-
     def start(self):
         """
         Starts all configured workers and runs until the workers stop or
@@ -200,16 +588,28 @@ class ConfiguredServeModule(ConfiguredModule):
 
 class _ServerInstance:
 
+    #: Number of seconds to wait for pending tasks of the loop after the
+    #: controller was killed. Remaining tasks will be cancelled.
+    pending_tasks_timeout = 5
+
     def __init__(self, conf):
         self.conf = conf
         self.loop = conf.loop
         self.controller = fork(self.loop, ServiceController, self.conf)
+        self.__states = {}
+        self.__abandoned = set()
 
     def run_until_stopped(self):
         if self.conf.autoreload:
             self.controller.on('restart', self.restart)
+        self.controller.on('recycle', self.restart)
         self.reload = None
         self.controller.on('state-change', self.quit_if_stopped)
+        self.controller.on('abandoned', self.__service_abandoned)
+        self.controller.on('exit', self.__controller_exited)
+        self.controller.on('unresponsive', self.__controller_unresponsive)
+        if self.conf.heartbeat:
+            self.controller.start_heartbeat(*self.conf.heartbeat)
         # self.loop.set_debug(True)
         self.loop.add_signal_handler(signal.SIGINT, self.signal_handler_stop)
         self.__start_1()
@@ -241,34 +641,110 @@ class _ServerInstance:
 
     @coroutine
     def stop(self):
+        """
+        Stops all services and terminates the controller process, escalating
+        to ``SIGTERM`` after the ``shutdown.grace`` period and to ``SIGKILL``
+        at the ``shutdown.timeout``.
+        """
         if self.__stopping:
             return
         self.__stopping = True
+        current_task = self.__current_asyncio_task()
+        self.controller.off('state-change', self.quit_if_stopped)
+        self.controller.stop_heartbeat()
+        started = self.loop.time()
+        try:
+            stopped = yield from self.__stop_services(
+                started, started + self.conf.shutdown_grace)
+        except ConnectionError:
+            # the controller process is gone
+            stopped = True
+        deadline = started + self.conf.shutdown_timeout
+        if stopped:
+            try:
+                yield from asyncio.wait_for(
+                    self.controller.kill(), self.__remaining(deadline))
+            except asyncio.TimeoutError:
+                log.error('Controller process %d did not exit, killing it'
+                          % self.controller.childpid)
+                yield from self.__kill(signal.SIGKILL, None)
+        else:
+            yield from self.__kill(signal.SIGTERM, deadline)
+        yield from self.wait_on_pending_tasks([current_task])
+        self.cleanup()
+
+    @coroutine
+    def __stop_services(self, started, grace_deadline):
+        """
+        Stops all services and waits until they have stopped or the
+        *grace_deadline* has passed. Returns whether all services stopped.
+        """
         event = self.__create_asyncio_event()
+        states = {}
+        stopped_at = {}
 
-        def signal_if_all_stopped(states):
-            if not self.all_services_stopped(states):
-                return
-            self.controller.off('state-change', signal_if_all_stopped)
-            task = self.loop.create_task(self.controller.kill())
-            task.add_done_callback(wait_on_pending_tasks)
+        def track(new_states):
+            new_states = dict(new_states)
+            states.update(new_states)
+            now = self.loop.time()
+            for name, state in new_states.items():
+                if state in (Service.State.STOPPED, Service.State.EXCEPTION):
+                    stopped_at.setdefault(name, now)
+                else:
+                    stopped_at.pop(name, None)
+            if self.all_services_stopped(states):
+                event.set()
 
-        def wait_on_pending_tasks(future):
-            coro = self.wait_on_pending_tasks([current_task])
-            task = self.loop.create_task(coro)
-            task.add_done_callback(signal_done)
+        self.controller.on('state-change', track)
+        try:
+            track((yield from asyncio.wait_for(
+                self.controller.service_states(),
+                self.__remaining(grace_deadline))))
+            if not event.is_set():
+                yield from asyncio.wait_for(
+                    self.controller.stop(), self.__remaining(grace_deadline))
+                yield from asyncio.wait_for(
+                    event.wait(), self.__remaining(grace_deadline))
+        except asyncio.TimeoutError:
+            stragglers = ['%s (%s)' % (name, state.value)
+                          for name, state in states.items()
+                          if name not in stopped_at]
+            log.error('Shutdown grace period of %.1fs exceeded, still '
+                      'waiting for: %s' % (
+                          self.conf.shutdown_grace,
+                          ', '.join(stragglers) or 'the controller process'))
+            return False
+        finally:
+            self.controller.off('state-change', track)
+        if stopped_at:
+            slowest = max(stopped_at, key=stopped_at.get)
+            log.info('Services stopped in %.2fs, slowest: %s' %
+                     (stopped_at[slowest] - started, slowest))
+        return True
 
-        def signal_done(future):
-            event.set()
+    @coroutine
+    def __kill(self, signum, deadline):
+        """
+        Sends *signum* to the controller process and waits for it to exit.
+        Escalates to ``SIGKILL``, if it is still running at the *deadline*.
+        """
+        pid = self.controller.childpid
+        if not pid:
+            return
+        log.warning('Sending %s to controller process %d' %
+                    (signal.Signals(signum).name, pid))
+        self.controller.send_signal(signum)
+        try:
+            yield from self.controller.wait_exited(
+                None if deadline is None else self.__remaining(deadline))
+        except asyncio.TimeoutError:
+            log.error('Controller process %d did not terminate within the '
+                      'shutdown timeout, killing it' % pid)
+            self.controller.send_signal(signal.SIGKILL)
+            yield from self.controller.wait_exited()
 
-        current_task = self.__current_asyncio_task()
-        states = yield from self.controller.service_states()
-        if not self.all_services_stopped(states):
-            self.controller.off('state-change', self.quit_if_stopped)
-            self.controller.on('state-change', signal_if_all_stopped)
-            yield from self.controller.stop()
-            yield from event.wait()
-        self.cleanup()
+    def __remaining(self, deadline):
+        return max(0, deadline - self.loop.time())
 
     def cleanup(self):
         self.controller.cleanup()
@@ -281,11 +757,35 @@ class _ServerInstance:
                    for state in states)
 
     def quit_if_stopped(self, states):
+        self.__states = states
         if not self.all_services_stopped(states):
             return
-        self.controller.off('state-change', self.quit_if_stopped)
+        if self.conf.restart_policy and any(
+                state == Service.State.EXCEPTION and
+                name not in self.__abandoned
+                for name, state in states.items()):
+            # these services are about to be restarted
+            return
         self.loop.create_task(self.stop())
 
+    def __controller_exited(self, exitcode):
+        if self.__stopping:
+            return
+        log.error('Controller process exited unexpectedly with code %s, '
+                  'restarting' % exitcode)
+        self.restart()
+
+    def __controller_unresponsive(self, seconds):
+        if self.__stopping:
+            return
+        log.error('Controller process %d did not answer for %.1fs, killing it'
+                  % (self.controller.childpid, seconds))
+        self.controller.send_signal(signal.SIGKILL)
+
+    def __service_abandoned(self, name):
+        self.__abandoned.add(name)
+        self.quit_if_stopped(self.__states)
+
     def restart(self):
         if self.reload is None:
             self.reload = True
@@ -293,40 +793,13 @@ class _ServerInstance:
 
     @coroutine
     def wait_on_pending_tasks(self, ignored_tasks=None):
-        event = self.__create_asyncio_event()
-        if ignored_tasks is None:
-            ignored_tasks = []
-        ignored_tasks.append(self.__current_asyncio_task())
-
-        def check_pending(future=None):
-            if future:
-                # collect the task exception, otherwise the asyncio library
-                # will complain
-                future.exception()
-            pending_tasks = [t for t in self.__all_asyncio_task()
-                             if not t.done()]
-            if len(pending_tasks) <= len(ignored_tasks):
-                event.set()
-                return
-            task = pending_tasks.pop()
-            while task in ignored_tasks:
-                task = pending_tasks.pop()
-            task.add_done_callback(check_pending)
-
-        check_pending()
-        yield from event.wait()
-
-    def __all_asyncio_task(self):
-        if hasattr(asyncio, 'all_tasks'):
-            return asyncio.all_tasks(loop=self.loop)
-        else:
-            return asyncio.Task.all_tasks(loop=self.loop)
+        from ._tasks import finish_tasks
+        yield from finish_tasks(self.loop, self.pending_tasks_timeout,
+                                ignored_tasks or ())
 
     def __current_asyncio_task(self):
-        if hasattr(asyncio, 'current_task'):
-            return asyncio.current_task(loop=self.loop)
-        else:
-            return asyncio.Task.current_task(loop=self.loop)
+        from ._tasks import current_task
+        return current_task(self.loop)
 
     def __create_asyncio_event(self):
         if sys.version_info.major == 3 and sys.version_info.minor < 10:
@@ -339,28 +812,105 @@ class _ServerInstance:
 class ServiceController(Backgrounded):
 
     def __init__(self, conf):
+        from ._startup import Timeline, PrepareQueue
         self.conf = conf
         self._services = None
         self._changedetector = None
+        self._recycler = None
+        self._supervisor = None
+        self._target = None
+        self._timeline = Timeline()
+        self._prepare_queue = PrepareQueue(
+            conf.prepare_concurrency, self._timeline)
+        signal.signal(signal.SIGTERM, self._terminated)
 
     def start(self):
         if not self._services:
             self._init_services()
-        self._call_on_subservices('start')
+        self._target = 'start'
+        for service in self._ordered_services():
+            if service.state == Service.State.STOPPED:
+                self._prepare_queue.submit(service, 'start')
+            else:
+                service.start()
 
     def pause(self):
+        """
+        Pauses all services, preparing stopped services according to their
+        priority and the configured ``prepare_concurrency``. Returns a
+        coroutine, that finishes as soon as all services are prepared.
+        """
         if not self._services:
             self._init_services()
-        self._call_on_subservices('pause')
+        self._target = 'pause'
+        for service in self._ordered_services():
+            if service.state == Service.State.STOPPED:
+                self._prepare_queue.submit(service, 'pause')
+            else:
+                service.pause()
+        return self._prepare_queue.wait()
 
     def stop(self):
         if not self._services:
             return
+        self._target = None
+        if self._supervisor:
+            self._supervisor.stop()
+            self._supervisor = None
         if self._changedetector:
             self._changedetector.stop(wait=False)
             self._changedetector = None
+        if self._recycler:
+            self._recycler.stop()
+            self._recycler = None
+        self._prepare_queue.cancel()
         self._call_on_subservices('stop')
 
+    def _terminated(self, signum, frame):
+        """
+        Handles the ``SIGTERM`` of the server process, which is sent when the
+        services did not stop within the ``shutdown.grace`` period. Reports
+        the stragglers, terminates all process groups and exits.
+        """
+        stragglers = [
+            name for name, service in (self._services or {}).items()
+            if service.state not in (Service.State.STOPPED,
+                                     Service.State.EXCEPTION)]
+        if stragglers:
+            frames = sys._current_frames()
+            stacks = []
+            for thread in threading.enumerate():
+                if thread is threading.main_thread() or \
+                        thread.ident not in frames:
+                    continue
+                stacks.append('Thread %s:\n%s' % (thread.name, ''.join(
+                    traceback.format_stack(frames[thread.ident]))))
+            self.conf.log.error(
+                'Terminated while stopping %s\n%s' %
+                (', '.join(stragglers), '\n'.join(stacks)))
+        process = sys.modules.get('score.serve.worker.process')
+        if process:
+            for group in process.ProcessGroup.running_groups():
+                try:
+                    os.kill(group.pid, signal.SIGTERM)
+                except (ProcessLookupError, TypeError):
+                    pass
+        os._exit(1)
+
+    def recycle(self):
+        """
+        Asks the parent process to replace this controller with a fresh fork.
+        """
+        self.trigger('recycle')
+
+    def requests_handled(self):
+        """
+        Returns the number of requests handled by the services running in this
+        process.
+        """
+        return sum(service.worker.requests_handled
+                   for service in self._services.values())
+
     def service_states(self):
         if not self._services:
             return []
@@ -369,6 +919,20 @@ class ServiceController(Backgrounded):
             result[name] = service.state
         return result
 
+    def timeline(self):
+        """
+        Returns the timeline of all transitions in the Trace Event Format.
+        """
+        return self._timeline.chrome_trace()
+
+    def service_info(self):
+        if not self._services:
+            return {}
+        result = OrderedDict()
+        for name, service in self._services.items():
+            result[name] = service.info()
+        return result
+
     @property
     @contextmanager
     def _acquire_service_locks(self):
@@ -384,15 +948,31 @@ class ServiceController(Backgrounded):
 
     def _init_services(self):
         if self.conf.autoreload:
-            self._changedetector = ChangeDetector()
+            from ._changedetect import ChangeDetector
+            self._changedetector = ChangeDetector(
+                backend=self.conf.autoreload_backend,
+                loop=self.conf.reactor.loop if self.conf.reactor else None)
             self._changedetector.observe(self.conf.conf)
             self._changedetector.add_callback(self.restart)
+        started = time.perf_counter()
         try:
             self._collect_services()
+            self._timeline.add('controller', 'init', started,
+                               time.perf_counter())
             for service in self._services.values():
                 service.register_state_change_listener(
                     self._service_state_changed)
+            if self.conf.recycle_policy:
+                from ._recycle import Recycler
+                self._recycler = Recycler(
+                    self, self.conf.recycle_policy, self.conf.recycle_interval)
+                self._recycler.start()
+            if self.conf.restart_policy:
+                from ._supervisor import Supervisor
+                self._supervisor = Supervisor(self, self.conf.restart_policy)
         except Exception as e:
+            self._timeline.add('controller', 'init', started,
+                               time.perf_counter(), 'exception')
             self.conf.log.exception(e)
             if self._changedetector:
                 self._services.clear()
@@ -404,23 +984,195 @@ class ServiceController(Backgrounded):
             raise
 
     def _service_state_changed(self, service, old, new):
+        from ._startup import phases
+        if old in phases:
+            self._timeline.finished(
+                service.name, phases[old],
+                'exception' if new == Service.State.EXCEPTION else 'ok')
+        if new in phases:
+            self._timeline.started(service.name, phases[new])
+        if old == Service.State.PREPARING:
+            self._prepare_queue.left_preparing(service)
+        if old in phases and self.conf.timeline_file and \
+                self._timeline.settled:
+            try:
+                self._timeline.write(self.conf.timeline_file)
+            except OSError as e:
+                self.conf.log.warning('Could not write timeline: %s' % e)
+        if old == Service.State.EXCEPTION:
+            # the service was reset for a restart, which reports its next
+            # state soon enough. The parent would consider an application,
+            # whose services are all stopped, as finished.
+            return
         states = {service.name: service.state
                   for service in self._services.values()}
         self.trigger('state-change', states)
         if new == Service.State.EXCEPTION:
             self.conf.log.exception(service.exception)
+            supervisor = self._supervisor
+            if supervisor:
+                supervisor.failed(service)
+
+    def _restart_service(self, service):
+        """
+        Resets the failed *service* and brings it into the state of all other
+        services. Called by the :class:`Supervisor
+        <score.serve._supervisor.Supervisor>`.
+        """
+        target = self._target
+        if target is None:
+            return
+        worker = None
+        if isinstance(service.exception, TransitionTimeout):
+            # the old worker is still stuck in its transition
+            worker = self._recreate_worker(service)
+        service.reset(worker)
+        self._prepare_queue.submit(service, target)
+
+    def _abandon_service(self, service):
+        """
+        Called by the :class:`Supervisor <score.serve._supervisor.Supervisor>`
+        when it gives up restarting a *service*.
+        """
+        self.trigger('abandoned', service.name)
+
+    def _recreate_worker(self, service):
+        """
+        Requests a new worker for the given *service* from its module. Returns
+        the new worker or `None`, if the worker of a :class:`ProcessWorker
+        <score.serve.ProcessWorker>` was replaced instead.
+        """
+        from .worker import ProcessWorker
+        for descriptor in self.conf.modules:
+            for name, worker in self._iter_workers(self._score, descriptor):
+                if name == service.name:
+                    break
+            else:
+                continue
+            break
+        else:
+            raise RuntimeError(
+                'Could not recreate worker of %s' % service.name)
+        if isinstance(worker, ProcessWorker):
+            worker = worker.worker
+        self._configure_worker(name, worker)
+        if isinstance(service.worker, ProcessWorker):
+            # the new worker is used, as soon as the process is forked again
+            service.worker.worker = worker
+            return None
+        return worker
 
     def _collect_services(self):
         self._services = OrderedDict()
-        score = init_from_file(self.conf.conf)
+        score = self._score = self._init_score()
         changedetector = self._changedetector
         if changedetector:
             for file in parse_list(score.conf['score.init']['_files']):
                 changedetector.observe(file)
+        from .worker import ProcessWorker, ProcessGroup
+        groups = {}
         for desc in self.conf.modules:
             for name, worker in self._iter_workers(score, desc):
+                self._configure_worker(name, worker)
+                members = self._process_group(name)
+                if members is not None:
+                    if members not in groups:
+                        groups[members] = ProcessGroup(' + '.join(members))
+                    group = groups[members]
+                    if group.placement is None:
+                        group.placement = self._placement(name)
+                    worker = ProcessWorker(worker, group)
                 self._services[name] = Service(name, worker)
 
+    def _init_score(self):
+        """
+        Parses the configuration file and returns the initialized score,
+        logging the time spent in each of the two steps.
+        """
+        from score.init import init
+        started = time.perf_counter()
+        confdict = parse_config_file(self.conf.conf, return_configparser=True)
+        parsed = time.perf_counter()
+        score = init(confdict)
+        log.info('Configuration parsed in %.3fs, modules initialized in %.3fs'
+                 % (parsed - started, time.perf_counter() - parsed))
+        return score
+
+    def _process_group(self, name):
+        """
+        Returns the configured process group of the service called *name*, or
+        `None`, if it should run in the controller process.
+        """
+        for members in self.conf.process_groups:
+            for member in members:
+                if _matches(name, member):
+                    return members
+        if self._placement(name) is not None:
+            return (name,)
+        return None
+
+    def _ordered_services(self):
+        """
+        Returns all services, those with higher priorities first.
+        """
+        def priority(service):
+            for selector, value in self.conf.priorities.items():
+                if _matches(service.name, selector):
+                    return -value
+            return 0
+        return sorted(self._services.values(), key=priority)
+
+    def _placement(self, name):
+        for selector, placement in self.conf.placements.items():
+            if _matches(name, selector):
+                return placement
+        return None
+
+    def _configure_worker(self, name, worker):
+        """
+        Applies the configuration of the service called *name* to its
+        *worker*, before the service is created.
+        """
+        from .worker import (
+            AsyncioWorker, ShardedAsyncioWorker, ProcessWorker,
+            SocketServerWorker)
+        if self.conf.reactor:
+            # a process group hosts a reactor of its own
+            hosted = (worker.worker if isinstance(worker, ProcessWorker)
+                      else worker)
+            if isinstance(hosted, (AsyncioWorker, SocketServerWorker)):
+                modes = self.conf.reactor_modes
+                for selector, mode in modes.items():
+                    if selector is not None and _matches(name, selector):
+                        break
+                else:
+                    mode = None
+                    if hosted.reactor is None:
+                        mode = modes.get(None)
+                if mode is not None:
+                    hosted.reactor = (
+                        self.conf.reactor if mode == 'shared' else None)
+        if isinstance(worker, (AsyncioWorker, ShardedAsyncioWorker)):
+            if worker.resolver is None:
+                worker.resolver = self.conf.resolver
+            factories = self.conf.loop_factories
+            if name in factories:
+                worker.loop_factory = factories[name]
+            elif worker.loop_factory is None and None in factories:
+                worker.loop_factory = factories[None]
+        timeouts = self.conf.transition_timeouts
+        if timeouts:
+            if isinstance(worker, ProcessWorker):
+                # the wrapped worker enforces the timeouts
+                worker = worker.worker
+            resolved = dict(timeouts.get(None, {}))
+            resolved.update(getattr(worker, 'transition_timeouts', {}))
+            for selector, values in timeouts.items():
+                if selector is not None and _matches(name, selector):
+                    resolved.update(values)
+                    break
+            worker.transition_timeouts = resolved
+
     def _iter_workers(self, score, descriptor):
         if '/' in descriptor:
             module, names = tuple(map(str.strip, descriptor.split('/', 1)))
@@ -460,3 +1212,11 @@ class ServiceController(Backgrounded):
     def _call_on_subservices(self, func, *args):
         for service in self._services.values():
             getattr(service, func)(*args)
+
+
+def _matches(name, selector):
+    """
+    Whether the service called *name* is selected by given configured
+    *selector*, which is either a service name or a module alias.
+    """
+    return name == selector or name.startswith(selector + '/')
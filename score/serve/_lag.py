@@ -0,0 +1,188 @@
+# Copyright © 2015-2018 STRG.AT GmbH, Vienna, Austria
+# Copyright © 2020-2023 Necdet Can Ateşman, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in
+# the file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district
+# the Licensee has his registered seat, an establishment or assets.
+
+
+
+import collections
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+
+from ._stats import Histogram
+
+
+class LagProbe:
+    """
+    Measures how well an event *loop* keeps up with its schedule.
+
+    A timer is scheduled every *interval* seconds and the delay between its
+    planned and its actual execution is recorded in :attr:`lag`. A shared
+    background thread additionally checks all probes and captures the stack
+    of a loop's thread, as soon as a single callback has been blocking it for
+    longer than *threshold* seconds. The total duration of such callbacks is
+    recorded in :attr:`slow_callbacks`, the last few stacks are kept in
+    :attr:`samples`.
+
+    Apart from the timer itself, the probe costs nothing as long as the
+    threshold is never exceeded.
+    """
+
+    #: Number of stack samples to keep.
+    max_samples = 10
+
+    def __init__(self, loop, interval=0.1, threshold=0.1):
+        self.loop = loop
+        self.interval = interval
+        self.threshold = threshold
+        self.lag = Histogram()
+        self.slow_callbacks = Histogram()
+        self.samples = collections.deque(maxlen=self.max_samples)
+        self._thread_id = None
+        self._handle = None
+        self._expected = None
+        self._pending_sample = None
+
+    def start(self):
+        """
+        Starts measuring. Must be called from within the running loop.
+        """
+        self._thread_id = threading.get_ident()
+        self._expected = time.monotonic() + self.interval
+        self._handle = self.loop.call_later(self.interval, self._tick)
+        if self.threshold is not None:
+            _sampler().add(self)
+
+    def stop(self):
+        """
+        Stops measuring. Must be called from within the running loop.
+        """
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+        self._expected = None
+        _sampler().discard(self)
+
+    def snapshot(self):
+        """
+        Returns a JSON-serializable `dict` of the current measurements.
+        """
+        return {
+            'lag': self.lag.snapshot(),
+            'slow_callbacks': self.slow_callbacks.snapshot(),
+            'samples': list(self.samples),
+        }
+
+    def _tick(self):
+        now = time.monotonic()
+        delay = max(0.0, now - self._expected)
+        self.lag.record(delay)
+        self._expected = now + self.interval
+        sample = self._pending_sample
+        if sample is not None:
+            self._pending_sample = None
+            sample['duration'] = delay
+            self.slow_callbacks.record(delay)
+        self._handle = self.loop.call_later(self.interval, self._tick)
+
+    def _check(self, now, frames):
+        # called by the sampler thread
+        expected = self._expected
+        if expected is None or self._pending_sample is not None:
+            return
+        if now - expected < self.threshold:
+            return
+        frame = frames.get(self._thread_id)
+        if frame is None:
+            return
+        sample = {
+            'time': time.time(),
+            'duration': None,
+            'stack': traceback.format_stack(frame),
+        }
+        self._pending_sample = sample
+        self.samples.append(sample)
+
+
+class _Sampler:
+    """
+    A daemon thread periodically checking all registered :class:`LagProbe`
+    objects of the current process.
+    """
+
+    def __init__(self):
+        self.probes = weakref.WeakSet()
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def add(self, probe):
+        with self.condition:
+            self.probes.add(probe)
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self._run, name='LagSampler')
+                self.thread.daemon = True
+                self.thread.start()
+            self.condition.notify()
+
+    def discard(self, probe):
+        with self.condition:
+            self.probes.discard(probe)
+
+    def _run(self):
+        with self.condition:
+            while True:
+                probes = list(self.probes)
+                if not probes:
+                    self.condition.wait()
+                    continue
+                self.condition.wait(
+                    min(probe.threshold for probe in probes) / 2)
+                probes = list(self.probes)
+                now = time.monotonic()
+                if not any(probe._expected is not None and
+                           now - probe._expected >= probe.threshold
+                           for probe in probes):
+                    continue
+                frames = sys._current_frames()
+                for probe in probes:
+                    probe._check(now, frames)
+                del frames
+
+
+_sampler_instance = None
+_sampler_lock = threading.Lock()
+
+
+def _sampler():
+    global _sampler_instance
+    with _sampler_lock:
+        if _sampler_instance is None or _sampler_instance[0] != os.getpid():
+            _sampler_instance = (os.getpid(), _Sampler())
+        return _sampler_instance[1]
@@ -0,0 +1,199 @@
+# Copyright © 2015-2018 STRG.AT GmbH, Vienna, Austria
+# Copyright © 2020-2023 Necdet Can Ateşman, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in
+# the file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district
+# the Licensee has his registered seat, an establishment or assets.
+
+
+
+import ctypes
+import os
+import platform
+
+
+# (ioprio_set, ioprio_get) syscall numbers
+_ioprio_syscalls = {
+    'x86_64': (251, 252),
+    'i386': (289, 290),
+    'i686': (289, 290),
+    'aarch64': (30, 31),
+    'armv7l': (314, 315),
+    'ppc64le': (273, 274),
+}
+
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_SHIFT = 13
+
+_ioprio_classes = {
+    'none': 0,
+    'realtime': 1,
+    'best-effort': 2,
+    'idle': 3,
+}
+
+_policies = {
+    'other': 'SCHED_OTHER',
+    'batch': 'SCHED_BATCH',
+    'idle': 'SCHED_IDLE',
+}
+
+
+class Placement:
+    """
+    Scheduling settings of a process: the set of *cpus* it may run on, its
+    *nice* level, its I/O scheduling class *ionice* as a tuple (class, level)
+    and its scheduling *policy* (``other``, ``batch`` or ``idle``). Settings
+    with the value `None` remain untouched.
+    """
+
+    def __init__(self, cpus=None, nice=None, ionice=None, policy=None):
+        self.cpus = cpus
+        self.nice = nice
+        self.ionice = ionice
+        self.policy = policy
+
+    @classmethod
+    def parse(cls, *, cpus=None, nice=None, ionice=None, policy=None):
+        """
+        Creates a Placement from configuration strings. The *cpus* are a
+        comma-separated list of CPU numbers and ranges (``0-3,8``), the
+        *ionice* value is a class name optionally followed by a level
+        (``best-effort:7``). Raises a `ValueError` for invalid values.
+        """
+        if cpus is not None:
+            cpus = _parse_cpus(cpus)
+        if nice is not None:
+            nice = int(nice)
+        if ionice is not None:
+            ionice = _parse_ionice(ionice)
+        if policy is not None:
+            policy = policy.strip()
+            if policy not in _policies:
+                raise ValueError('Invalid scheduling policy "%s"' % policy)
+        return cls(cpus, nice, ionice, policy)
+
+    def apply(self):
+        """
+        Applies these settings to the current process. Since some of them
+        only affect the calling thread on linux, this should happen before
+        any other threads are started, i.e. right after forking.
+        """
+        if self.policy is not None:
+            os.sched_setscheduler(
+                0, getattr(os, _policies[self.policy]), os.sched_param(0))
+        if self.cpus is not None:
+            os.sched_setaffinity(0, self.cpus)
+        if self.nice is not None:
+            os.setpriority(os.PRIO_PROCESS, 0, self.nice)
+        if self.ionice is not None:
+            klass, level = self.ionice
+            _ioprio_set(_ioprio_classes[klass] << _IOPRIO_CLASS_SHIFT | level)
+
+    def __repr__(self):
+        return '<Placement cpus=%r nice=%r ionice=%r policy=%r>' % (
+            self.cpus, self.nice, self.ionice, self.policy)
+
+
+def current():
+    """
+    Returns a JSON-serializable `dict` describing the effective placement of
+    the calling process.
+    """
+    result = {}
+    try:
+        result['cpus'] = sorted(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        pass
+    try:
+        result['nice'] = os.getpriority(os.PRIO_PROCESS, 0)
+    except (AttributeError, OSError):
+        pass
+    try:
+        policy = os.sched_getscheduler(0)
+        for name, constant in _policies.items():
+            if getattr(os, constant, None) == policy:
+                result['policy'] = name
+    except (AttributeError, OSError):
+        pass
+    try:
+        value = _ioprio_get()
+    except OSError:
+        pass
+    else:
+        klass = value >> _IOPRIO_CLASS_SHIFT
+        level = value & ((1 << _IOPRIO_CLASS_SHIFT) - 1)
+        for name, number in _ioprio_classes.items():
+            if number == klass:
+                result['ionice'] = [name, level]
+    return result
+
+
+def _parse_cpus(value):
+    cpus = set()
+    for part in str(value).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = map(int, part.split('-', 1))
+            if start > end:
+                raise ValueError('Invalid CPU range "%s"' % part)
+            cpus.update(range(start, end + 1))
+        else:
+            cpus.add(int(part))
+    if not cpus:
+        raise ValueError('Empty CPU list "%s"' % value)
+    return cpus
+
+
+def _parse_ionice(value):
+    klass, _, level = value.strip().partition(':')
+    klass = klass.strip()
+    if klass not in _ioprio_classes:
+        raise ValueError('Invalid I/O scheduling class "%s"' % klass)
+    level = int(level) if level.strip() else (4 if klass != 'idle' else 0)
+    if not 0 <= level <= 7:
+        raise ValueError('Invalid I/O scheduling level %d' % level)
+    return (klass, level)
+
+
+def _syscall(index, *args):
+    try:
+        number = _ioprio_syscalls[platform.machine()][index]
+    except KeyError:
+        raise OSError('ioprio syscalls unknown on %s' % platform.machine())
+    libc = ctypes.CDLL(None, use_errno=True)
+    result = libc.syscall(number, *args)
+    if result < 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+    return result
+
+
+def _ioprio_set(value):
+    _syscall(0, _IOPRIO_WHO_PROCESS, 0, value)
+
+
+def _ioprio_get():
+    return _syscall(1, _IOPRIO_WHO_PROCESS, 0)
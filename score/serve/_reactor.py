@@ -0,0 +1,185 @@
+# Copyright © 2015-2018 STRG.AT GmbH, Vienna, Austria
+# Copyright © 2020-2023 Necdet Can Ateşman, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in
+# the file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district
+# the Licensee has his registered seat, an establishment or assets.
+
+
+import asyncio
+import concurrent.futures
+import contextvars
+import logging
+import os
+import threading
+import weakref
+
+from ._lag import LagProbe
+
+
+log = logging.getLogger(__name__)
+
+# the worker, on whose behalf the current task is running
+_owner = contextvars.ContextVar('score.serve.reactor.owner', default=None)
+
+
+class Reactor:
+    """
+    A single event loop shared by several workers of a process. Without it,
+    every :class:`AsyncioWorker <score.serve.AsyncioWorker>` runs a loop in
+    a thread of its own, as does the accept loop of every
+    :class:`SocketServerWorker <score.serve.SocketServerWorker>`. With it,
+    the number of threads no longer depends on the number of services.
+
+    The loop is created by *loop_factory* (defaulting to
+    :func:`asyncio.new_event_loop`) as soon as it is first needed, and runs
+    in a daemon thread called ``Reactor``. Requests of socket servers, that
+    do not have a pool of their own, are handled by a pool of at most
+    *threads* threads, that is shared by all of them as well.
+
+    The loop and the pool are created anew after a fork, so every process
+    group gets a reactor of its own.
+    """
+
+    def __init__(self, loop_factory=None, resolver=None, threads=16, *,
+                 lag_interval=0.1, slow_callback_threshold=0.1):
+        self.loop_factory = loop_factory
+        self.resolver = resolver
+        self.threads = threads
+        self.lag_interval = lag_interval
+        self.slow_callback_threshold = slow_callback_threshold
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._executor = None
+        self._tasks = weakref.WeakKeyDictionary()
+        self.lag_probe = None
+
+    @property
+    def loop(self):
+        """
+        The running event loop of this process.
+        """
+        if self._pid != os.getpid():
+            # the thread did not survive a fork
+            self._reset()
+        with self._lock:
+            if self._loop is None:
+                loop = (self.loop_factory or asyncio.new_event_loop)()
+                if self.resolver:
+                    self.resolver.install(loop)
+                loop.set_task_factory(self._create_task)
+                started = threading.Event()
+                self._thread = threading.Thread(
+                    target=self._run, args=(loop, started), name='Reactor',
+                    daemon=True)
+                self._thread.start()
+                started.wait()
+                self._loop = loop
+            return self._loop
+
+    def in_loop(self):
+        """
+        Whether the current thread is the one running the loop.
+        """
+        return self._thread is threading.current_thread()
+
+    def call(self, func, *args):
+        """
+        Calls *func* with given *args* inside the loop and returns its result,
+        blocking the calling thread until then.
+        """
+        loop = self.loop
+        if self.in_loop():
+            return func(*args)
+        future = concurrent.futures.Future()
+
+        def call():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(func(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+        loop.call_soon_threadsafe(call)
+        return future.result()
+
+    def submit(self, func, *args):
+        """
+        Executes *func* with given *args* in the thread pool shared by all
+        users of this reactor and returns a :class:`concurrent.futures.Future`.
+        """
+        if self._pid != os.getpid():
+            self._reset()
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    self.threads, thread_name_prefix='Reactor')
+        return self._executor.submit(func, *args)
+
+    def run_coroutine(self, coro, owner):
+        """
+        Schedules the :term:`coroutine` *coro* in the loop and returns a
+        :class:`concurrent.futures.Future`. The task, and all tasks it
+        creates, are accounted to given *owner*, see :meth:`tasks`.
+        """
+        loop = self.loop
+        token = _owner.set(owner)
+        try:
+            # call_soon_threadsafe() captures the current context, which is
+            # inherited by the task and, in turn, by all tasks it creates
+            return asyncio.run_coroutine_threadsafe(coro, loop)
+        finally:
+            _owner.reset(token)
+
+    def tasks(self, owner):
+        """
+        Returns all pending tasks of given *owner*. Must be called from within
+        the loop.
+        """
+        return [task for task in self._tasks.get(owner, ())
+                if not task.done()]
+
+    def _create_task(self, loop, coro, **kwargs):
+        task = asyncio.Task(coro, loop=loop, **kwargs)
+        owner = _owner.get()
+        if owner is not None:
+            try:
+                self._tasks[owner].add(task)
+            except KeyError:
+                self._tasks[owner] = weakref.WeakSet((task,))
+        return task
+
+    def _run(self, loop, started):
+        asyncio.set_event_loop(loop)
+        if self.lag_interval is not None:
+            self.lag_probe = LagProbe(
+                loop, self.lag_interval, self.slow_callback_threshold)
+            loop.call_soon(self.lag_probe.start)
+        loop.call_soon(started.set)
+        loop.run_forever()
@@ -0,0 +1,165 @@
+# Copyright © 2015-2018 STRG.AT GmbH, Vienna, Austria
+# Copyright © 2020-2023 Necdet Can Ateşman, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in
+# the file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district
+# the Licensee has his registered seat, an establishment or assets.
+
+
+
+import logging
+import os
+import re
+import threading
+import time
+
+
+log = logging.getLogger(__name__)
+
+_size_multipliers = {
+    '': 1,
+    'k': 2 ** 10,
+    'm': 2 ** 20,
+    'g': 2 ** 30,
+    't': 2 ** 40,
+}
+
+
+def parse_size(value):
+    """
+    Converts a memory size like ``512M`` or ``2G`` to a number of bytes.
+    """
+    if isinstance(value, int):
+        return value
+    match = re.match(r'^(\d+)\s*([kmgt]?)i?b?$', value.strip().lower())
+    if match is None:
+        raise ValueError('"%s" does not describe a valid size' % value)
+    return int(match.group(1)) * _size_multipliers[match.group(2)]
+
+
+def rss(pid=None):
+    """
+    Returns the resident set size of the process with given *pid* in bytes,
+    or `None` if it cannot be determined.
+    """
+    try:
+        with open('/proc/%d/statm' % (pid or os.getpid())) as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class RecyclePolicy:
+    """
+    Limits for the lifetime of a process: its resident memory *max_rss* in
+    bytes, the number of requests *max_requests* it handled and its age
+    *max_age* in seconds. Limits with the value `None` are not enforced.
+    """
+
+    def __init__(self, max_rss=None, max_requests=None, max_age=None):
+        self.max_rss = max_rss
+        self.max_requests = max_requests
+        self.max_age = max_age
+
+    def __bool__(self):
+        return any(limit is not None for limit in
+                   (self.max_rss, self.max_requests, self.max_age))
+
+    def check(self, pid, requests, started):
+        """
+        Returns a description of the first limit exceeded by the process with
+        given *pid*, that handled the given number of *requests* since its
+        start at the :func:`time.monotonic` value *started*. Returns `None`
+        if the process is within all limits.
+        """
+        if self.max_rss is not None:
+            size = rss(pid)
+            if size is not None and size > self.max_rss:
+                return 'rss %d > %d' % (size, self.max_rss)
+        if self.max_requests is not None and requests > self.max_requests:
+            return 'requests %d > %d' % (requests, self.max_requests)
+        if self.max_age is not None:
+            age = time.monotonic() - started
+            if age > self.max_age:
+                return 'age %.1fs > %.1fs' % (age, self.max_age)
+        return None
+
+
+class Recycler:
+    """
+    A background thread checking the processes of a
+    :class:`ServiceController <score.serve._init.ServiceController>` against
+    a :class:`RecyclePolicy` every *interval* seconds.
+
+    :class:`Process groups <score.serve.ProcessGroup>` exceeding a limit are
+    replaced by a fresh fork one at a time. If the controller process itself
+    exceeds a limit, it is asked to recycle itself via its ``recycle()``
+    method, which ends this thread.
+    """
+
+    def __init__(self, controller, policy, interval):
+        self.controller = controller
+        self.policy = policy
+        self.interval = interval
+        self.started = time.monotonic()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='Recycler')
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        from .worker import ProcessGroup
+        while not self._stopped.wait(self.interval):
+            for group in ProcessGroup.running_groups():
+                if self._stopped.is_set():
+                    return
+                try:
+                    self._check_group(group)
+                except Exception as e:
+                    log.exception(e)
+            reason = self.policy.check(
+                os.getpid(), self.controller.requests_handled(), self.started)
+            if reason and not self._stopped.is_set():
+                log.info('Recycling controller (pid %d): %s' %
+                         (os.getpid(), reason))
+                self._stopped.set()
+                self.controller.recycle()
+
+    def _check_group(self, group):
+        stats = group.recycle_stats()
+        if stats is None:
+            return
+        pid, requests, started = stats
+        reason = self.policy.check(pid, requests, started)
+        if not reason:
+            return
+        log.info('Recycling process group %s (pid %d): %s' %
+                 (group.name, pid, reason))
+        if group.recycle():
+            log.info('Recycled process group %s (pid %d -> %d)' %
+                     (group.name, pid, group.pid))
@@ -0,0 +1,183 @@
+# Copyright © 2015-2018 STRG.AT GmbH, Vienna, Austria
+# Copyright © 2020-2023 Necdet Can Ateşman, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in
+# the file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district
+# the Licensee has his registered seat, an establishment or assets.
+
+
+
+import asyncio
+import collections
+import concurrent.futures
+import ipaddress
+import logging
+import os
+import socket
+import threading
+import time
+
+try:
+    from types import coroutine
+except ImportError:
+    from asyncio import coroutine
+
+
+log = logging.getLogger(__name__)
+
+
+class CachingResolver:
+    """
+    A replacement for :meth:`getaddrinfo <asyncio.loop.getaddrinfo>` of event
+    loops, that performs lookups in a thread pool and caches the results.
+
+    Successful lookups are cached for *ttl* seconds, failed lookups for
+    *negative_ttl* seconds. The cache holds at most *cache_size* entries and
+    evicts the least recently used entries first. Concurrent lookups of the
+    same address are coalesced into a single call to
+    :func:`socket.getaddrinfo`, numeric addresses are resolved immediately.
+
+    The thread pool is created lazily and re-created after a fork, so the
+    same resolver can be used before and after forking.
+    """
+
+    def __init__(self, *, ttl=300, negative_ttl=10, cache_size=1024,
+                 max_workers=4):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.cache_size = cache_size
+        self.max_workers = max_workers
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._cache = collections.OrderedDict()
+        self._pending = {}
+        self._executor = None
+
+    def install(self, loop):
+        """
+        Replaces the :meth:`getaddrinfo <asyncio.loop.getaddrinfo>` method of
+        given *loop* with this resolver.
+        """
+        def getaddrinfo(host, port, *, family=0, type=0, proto=0, flags=0):
+            return self.getaddrinfo(
+                loop, host, port, family=family, type=type, proto=proto,
+                flags=flags)
+        try:
+            loop.getaddrinfo = getaddrinfo
+        except AttributeError:
+            log.debug('Cannot install resolver on %r' % loop)
+
+    def clear(self):
+        """
+        Removes all entries from the cache.
+        """
+        with self._lock:
+            self._cache.clear()
+
+    @coroutine
+    def getaddrinfo(self, loop, host, port, *, family=0, type=0, proto=0,
+                    flags=0):
+        """
+        Resolves given address inside the event *loop*. The parameters and
+        the return value are the same as those of :func:`socket.getaddrinfo`.
+        """
+        if _is_numeric(host):
+            return socket.getaddrinfo(
+                host, port, family, type, proto, flags | socket.AI_NUMERICHOST)
+        key = (host, port, family, type, proto, flags)
+        future = self._lookup(key)
+        if not future.done():
+            future = asyncio.wrap_future(future, loop=loop)
+            yield from future
+        return future.result()
+
+    def _lookup(self, key):
+        if self._pid != os.getpid():
+            self._reset()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                expires, future = entry
+                if expires > time.monotonic():
+                    self._cache.move_to_end(key)
+                    return future
+                del self._cache[key]
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    self.max_workers)
+            future = self._executor.submit(socket.getaddrinfo, *key)
+            self._pending[key] = future
+        future.add_done_callback(lambda future: self._resolved(key, future))
+        return future
+
+    def _resolved(self, key, future):
+        exception = future.exception()
+        if exception is None:
+            ttl = self.ttl
+        elif isinstance(exception, socket.gaierror) and \
+                exception.errno != socket.EAI_AGAIN:
+            ttl = self.negative_ttl
+        else:
+            ttl = 0
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+            if not ttl or not self.cache_size:
+                return
+            self._cache[key] = (time.monotonic() + ttl, future)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+def _is_numeric(host):
+    if host is None:
+        return True
+    if isinstance(host, bytes):
+        host = host.decode('idna')
+    try:
+        ipaddress.ip_address(host.split('%', 1)[0])
+    except ValueError:
+        return False
+    return True
+
+
+_default_resolver = None
+
+
+def default_resolver():
+    """
+    Returns the :class:`CachingResolver` used for event loops, that were not
+    configured otherwise.
+    """
+    global _default_resolver
+    if _default_resolver is None:
+        _default_resolver = CachingResolver()
+    return _default_resolver
+
@@ -0,0 +1,295 @@
+# Copyright © 2015-2018 STRG.AT GmbH, Vienna, Austria
+# Copyright © 2020-2023 Necdet Can Ateşman, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in
+# the file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district
+# the Licensee has his registered seat, an establishment or assets.
+
+
+import asyncio
+import json
+import os
+import threading
+import time
+
+from .service import Service
+
+try:
+    from types import coroutine
+except ImportError:
+    from asyncio import coroutine
+
+
+#: The phase of the lifecycle each intermediate state belongs to.
+phases = {
+    Service.State.PREPARING: 'prepare',
+    Service.State.STARTING: 'start',
+    Service.State.PAUSING: 'pause',
+    Service.State.STOPPING: 'stop',
+}
+
+
+class Timeline:
+    """
+    Records when each phase of each service was queued, started and
+    finished. Timestamps are seconds relative to the creation of the
+    timeline.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.created = time.time()
+        self.spans = []
+        self.__open = {}
+        self.__queued = {}
+        self.__lock = threading.Lock()
+
+    def now(self):
+        return time.perf_counter() - self.origin
+
+    def queued(self, name, phase):
+        """
+        Notes, that the *phase* of the service called *name* was requested,
+        but might not start immediately.
+        """
+        with self.__lock:
+            self.__queued.setdefault((name, phase), self.now())
+
+    def unqueue(self, name, phase):
+        """
+        Forgets a *phase* noted via :meth:`queued`, that will not start.
+        """
+        with self.__lock:
+            self.__queued.pop((name, phase), None)
+
+    def started(self, name, phase):
+        with self.__lock:
+            now = self.now()
+            queued = self.__queued.pop((name, phase), now)
+            self.__open[(name, phase)] = {
+                'service': name,
+                'phase': phase,
+                'queued': queued,
+                'started': now,
+                'finished': None,
+                'result': None,
+            }
+
+    def finished(self, name, phase, result='ok'):
+        with self.__lock:
+            span = self.__open.pop((name, phase), None)
+            if span is None:
+                return
+            span['finished'] = self.now()
+            span['result'] = result
+            self.spans.append(span)
+
+    def add(self, name, phase, started, finished, result='ok'):
+        """
+        Adds a span, that was measured elsewhere, using timestamps of
+        :func:`time.perf_counter`.
+        """
+        with self.__lock:
+            self.spans.append({
+                'service': name,
+                'phase': phase,
+                'queued': started - self.origin,
+                'started': started - self.origin,
+                'finished': finished - self.origin,
+                'result': result,
+            })
+
+    @property
+    def settled(self):
+        """
+        Whether no phase is currently queued or in progress.
+        """
+        with self.__lock:
+            return not self.__open and not self.__queued
+
+    def chrome_trace(self):
+        """
+        Returns the timeline in the Trace Event Format understood by
+        ``chrome://tracing`` and Perfetto. Every service is displayed as a
+        thread of its own, waiting times show up as separate ``queued``
+        slices.
+        """
+        with self.__lock:
+            spans = list(self.spans)
+            spans.extend(dict(span, finished=self.now(), result='running')
+                         for span in self.__open.values())
+        pid = os.getpid()
+        tids = {}
+        events = []
+        for span in sorted(spans, key=lambda span: span['queued']):
+            name = span['service']
+            if name not in tids:
+                tids[name] = len(tids) + 1
+                events.append({
+                    'name': 'thread_name', 'ph': 'M', 'pid': pid,
+                    'tid': tids[name], 'args': {'name': name},
+                })
+            if span['started'] > span['queued']:
+                events.append({
+                    'name': '%s (queued)' % span['phase'], 'cat': 'queue',
+                    'ph': 'X', 'pid': pid, 'tid': tids[name],
+                    'ts': span['queued'] * 1e6,
+                    'dur': (span['started'] - span['queued']) * 1e6,
+                })
+            events.append({
+                'name': span['phase'], 'cat': 'lifecycle', 'ph': 'X',
+                'pid': pid, 'tid': tids[name],
+                'ts': span['started'] * 1e6,
+                'dur': (span['finished'] - span['started']) * 1e6,
+                'args': {'result': span['result']},
+            })
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'created': self.created},
+        }
+
+    def write(self, file):
+        """
+        Writes the :meth:`chrome_trace` to the given *file* path.
+        """
+        tmpfile = '%s.%d.tmp' % (file, os.getpid())
+        with open(tmpfile, 'w') as fp:
+            json.dump(self.chrome_trace(), fp)
+        os.replace(tmpfile, file)
+
+
+class PrepareQueue:
+    """
+    Prepares services in the order they were submitted, while keeping at
+    most *concurrency* of them in the ``PREPARING`` state at the same time.
+    A *concurrency* of `None` prepares all services at once.
+
+    The owner must call :meth:`left_preparing` whenever a service leaves
+    the ``PREPARING`` state.
+    """
+
+    def __init__(self, concurrency=None, timeline=None):
+        self.concurrency = concurrency
+        self.timeline = timeline
+        self.__queue = []
+        self.__active = set()
+        self.__waiters = []
+        self.__thread = None
+        self.__condition = threading.Condition()
+
+    def submit(self, service, method='prepare'):
+        """
+        Queues a call to the given *method* of the *service*, which must be
+        a method leading through the ``PREPARING`` state, i.e. ``prepare``,
+        ``pause`` or ``start``.
+        """
+        if self.timeline:
+            self.timeline.queued(service.name, 'prepare')
+        with self.__condition:
+            if self.retarget(service, method):
+                return
+            self.__queue.append([service, method])
+            if self.__thread is None:
+                self.__thread = threading.Thread(
+                    target=self.__run, name='PrepareQueue')
+                self.__thread.daemon = True
+                self.__thread.start()
+            self.__condition.notify_all()
+
+    def retarget(self, service, method):
+        """
+        Changes the method to call on a *service*, that is still waiting in
+        the queue. Returns `False`, if the service is not queued.
+        """
+        with self.__condition:
+            for entry in self.__queue:
+                if entry[0] is service:
+                    entry[1] = method
+                    return True
+        return False
+
+    def cancel(self):
+        """
+        Removes all services from the queue, that were not prepared, yet.
+        """
+        with self.__condition:
+            queue, self.__queue = self.__queue, []
+            if self.timeline:
+                for service, _ in queue:
+                    self.timeline.unqueue(service.name, 'prepare')
+            self.__condition.notify_all()
+            self.__resolve_if_idle()
+
+    def left_preparing(self, service):
+        with self.__condition:
+            self.__active.discard(service)
+            self.__condition.notify_all()
+            self.__resolve_if_idle()
+
+    @coroutine
+    def wait(self):
+        """
+        Waits until all submitted services have left the ``PREPARING``
+        state.
+        """
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        with self.__condition:
+            if self.__idle():
+                return
+            self.__waiters.append((loop, future))
+        yield from future
+
+    def __idle(self):
+        return not self.__queue and not self.__active
+
+    def __resolve_if_idle(self):
+        if not self.__idle():
+            return
+        waiters, self.__waiters = self.__waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                while self.__queue and self.concurrency and \
+                        len(self.__active) >= self.concurrency:
+                    self.__condition.wait()
+                if not self.__queue:
+                    self.__thread = None
+                    self.__resolve_if_idle()
+                    return
+                service, method = self.__queue.pop(0)
+                self.__active.add(service)
+            try:
+                getattr(service, method)()
+            finally:
+                if service.state != Service.State.PREPARING:
+                    self.left_preparing(service)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
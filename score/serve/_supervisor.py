@@ -0,0 +1,132 @@
+# Copyright © 2015-2018 STRG.AT GmbH, Vienna, Austria
+# Copyright © 2020-2023 Necdet Can Ateşman, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in
+# the file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district
+# the Licensee has his registered seat, an establishment or assets.
+
+import collections
+import logging
+import random
+import threading
+import time
+
+
+log = logging.getLogger(__name__)
+
+
+class RestartPolicy:
+    """
+    Describes how failed services are restarted. The first restart happens
+    after *delay* seconds and every further one waits twice as long as the
+    previous, up to *max_delay* seconds. Each delay is randomized to between
+    half and all of its value, so that services failing together do not
+    restart in lockstep. A service, that needs more than *budget* restarts
+    within *window* seconds, is considered to be in a crash loop and is no
+    longer restarted.
+    """
+
+    def __init__(self, delay=0.1, max_delay=30, budget=10, window=300):
+        self.delay = delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.window = window
+
+    def backoff(self, restarts):
+        """
+        Returns the delay before the next restart of a service, that was
+        restarted the given number of times within the current window.
+        """
+        delay = min(self.max_delay, self.delay * 2 ** restarts)
+        return random.uniform(delay / 2, delay)
+
+
+class Supervisor:
+    """
+    Restarts the failed services of a :class:`ServiceController
+    <score.serve._init.ServiceController>` according to a
+    :class:`RestartPolicy`. The controller reports failures via
+    :meth:`failed` and performs the actual restart in its
+    ``_restart_service()`` method. Services exceeding the restart budget are
+    reported to the controller's ``_abandon_service()`` instead.
+    """
+
+    def __init__(self, controller, policy):
+        self.controller = controller
+        self.policy = policy
+        self._lock = threading.Lock()
+        self._restarts = collections.defaultdict(collections.deque)
+        self._timers = {}
+        self._stopped = False
+
+    def failed(self, service):
+        """
+        Schedules a restart of given *service*, which just entered the
+        ``EXCEPTION`` state.
+        """
+        with self._lock:
+            if self._stopped or service.name in self._timers:
+                return
+            now = time.monotonic()
+            restarts = self._restarts[service.name]
+            while restarts and restarts[0] < now - self.policy.window:
+                restarts.popleft()
+            if len(restarts) >= self.policy.budget:
+                abandon = True
+            else:
+                abandon = False
+                delay = self.policy.backoff(len(restarts))
+                restarts.append(now)
+                timer = threading.Timer(delay, self._restart, (service,))
+                timer.daemon = True
+                self._timers[service.name] = timer
+                timer.start()
+        if abandon:
+            log.error('Service %s failed %d times within %gs, giving up' %
+                      (service.name, self.policy.budget + 1,
+                       self.policy.window))
+            self.controller._abandon_service(service)
+        else:
+            log.warning('Restarting service %s in %.3fs (restart %d of %d)' %
+                        (service.name, delay, len(restarts),
+                         self.policy.budget))
+
+    def stop(self):
+        """
+        Cancels all pending restarts.
+        """
+        with self._lock:
+            self._stopped = True
+            timers, self._timers = self._timers, {}
+        for timer in timers.values():
+            timer.cancel()
+
+    def _restart(self, service):
+        with self._lock:
+            if self._timers.pop(service.name, None) is None:
+                return
+        try:
+            self.controller._restart_service(service)
+        except Exception as e:
+            log.exception(e)
+            self.failed(service)
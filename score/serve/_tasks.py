@@ -0,0 +1,116 @@
+# Copyright © 2015-2018 STRG.AT GmbH, Vienna, Austria
+# Copyright © 2020-2023 Necdet Can Ateşman, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in
+# the file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district
+# the Licensee has his registered seat, an establishment or assets.
+
+
+import asyncio
+import logging
+
+try:
+    from types import coroutine
+except ImportError:
+    from asyncio import coroutine
+
+
+log = logging.getLogger('score.serve')
+
+
+def all_tasks(loop):
+    if hasattr(asyncio, 'all_tasks'):
+        return asyncio.all_tasks(loop=loop)
+    else:
+        return asyncio.Task.all_tasks(loop=loop)
+
+
+def current_task(loop):
+    if hasattr(asyncio, 'current_task'):
+        return asyncio.current_task(loop=loop)
+    else:
+        return asyncio.Task.current_task(loop=loop)
+
+
+@coroutine
+def finish_tasks(loop, timeout, ignored_tasks=(), cancel_timeout=1, *,
+                 tasks=None):
+    """
+    Waits until all tasks of given *loop* have finished, but at most *timeout*
+    seconds (or indefinitely, if *timeout* is `None`). Tasks created while
+    waiting are awaited as well. All tasks still pending at the deadline are
+    cancelled and awaited for another *cancel_timeout* seconds.
+
+    The current task and all *ignored_tasks* are excluded. A callable
+    returning the *tasks* to wait for can be passed, if only some of the
+    loop's tasks are of interest.
+
+    Returns the `list` of tasks, that had to be cancelled.
+    """
+    ignored = set(ignored_tasks)
+    ignored.add(current_task(loop))
+
+    def pending_tasks():
+        candidates = all_tasks(loop) if tasks is None else tasks()
+        return [t for t in candidates if not t.done() and t not in ignored]
+
+    deadline = None if timeout is None else loop.time() + timeout
+    while True:
+        pending = pending_tasks()
+        if not pending:
+            return []
+        if deadline is None:
+            remaining = None
+        else:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+        done, _ = yield from asyncio.wait(pending, timeout=remaining)
+        _retrieve_exceptions(done)
+    for task in pending:
+        task.cancel()
+    done, still_pending = yield from asyncio.wait(
+        pending, timeout=cancel_timeout)
+    _retrieve_exceptions(done)
+    log.warning('Cancelled %d pending task(s) after %ss: %s' % (
+        len(pending), timeout, ', '.join(map(_describe, pending))))
+    if still_pending:
+        log.warning('%d task(s) did not react to cancellation: %s' % (
+            len(still_pending), ', '.join(map(_describe, still_pending))))
+    return pending
+
+
+def _retrieve_exceptions(tasks):
+    # collect the task exceptions, otherwise the asyncio library will
+    # complain about exceptions that were never retrieved
+    for task in tasks:
+        if not task.cancelled():
+            task.exception()
+
+
+def _describe(task):
+    coro = task.get_coro() if hasattr(task, 'get_coro') else None
+    name = getattr(coro, '__qualname__', None) or repr(coro)
+    if hasattr(task, 'get_name'):
+        return '%s (%s)' % (task.get_name(), name)
+    return name
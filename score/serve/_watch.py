@@ -0,0 +1,644 @@
+# Copyright © 2015-2018 STRG.AT GmbH, Vienna, Austria
+# Copyright © 2020-2023 Necdet Can Ateşman, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in
+# the file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district
+# the Licensee has his registered seat, an establishment or assets.
+
+
+"""
+File system watching backends shared by the
+:class:`ChangeDetector <score.serve._changedetect.ChangeDetector>` and the
+:class:`FileWatcherWorker <score.serve.worker.FileWatcherWorker>`.
+
+All backends deliver lists of :class:`WatchEvent` tuples to a single callback.
+The callback is invoked from a thread owned by the backend, or from the event
+loop passed to a backend capable of watching its events from a loop.
+"""
+
+import abc
+import collections
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+
+
+log = logging.getLogger('score.serve.watch')
+
+
+CREATED = 'created'
+MODIFIED = 'modified'
+DELETED = 'deleted'
+
+WatchEvent = collections.namedtuple('WatchEvent', ('kind', 'path', 'is_dir'))
+
+
+class WatchBackend(metaclass=abc.ABCMeta):
+    """
+    Base class for file system watching backends.
+
+    The *callback* will receive a list of :class:`WatchEvent` objects, whenever
+    a change was detected in one of the scheduled paths. Backends reading
+    their events from a file descriptor use the given event *loop* for
+    watching it instead of starting a thread, if one is given.
+    """
+
+    def __init__(self, callback, *, name=None, loop=None):
+        self.callback = callback
+        self.name = name or type(self).__name__
+        self.loop = loop
+        self.thread = None
+        self.running = False
+        self._lock = threading.RLock()
+        self._handles = set()
+
+    def schedule(self, path, recursive=True):
+        """
+        Starts watching given directory *path* and returns an opaque handle,
+        that can be passed to :meth:`unschedule`.
+        """
+        handle = _Handle(os.path.abspath(path), recursive)
+        with self._lock:
+            self._handles.add(handle)
+            if self.running:
+                self._schedule(handle)
+        return handle
+
+    def unschedule(self, handle):
+        """
+        Stops watching the directory registered with given *handle*.
+        """
+        with self._lock:
+            self._handles.discard(handle)
+            if self.running:
+                self._unschedule(handle)
+
+    def start(self):
+        with self._lock:
+            self.running = True
+            self._start()
+            for handle in self._handles:
+                self._schedule(handle)
+
+    def stop(self):
+        """
+        Stops delivering events. This function may be called from within the
+        callback.
+        """
+        with self._lock:
+            if not self.running:
+                return
+            self.running = False
+            self._stop()
+
+    def join(self):
+        if self.thread and threading.current_thread() != self.thread:
+            self.thread.join()
+
+    def _start(self):
+        self.thread = threading.Thread(target=self._run, name=self.name)
+        self.thread.daemon = True
+        self.thread.start()
+
+    @abc.abstractmethod
+    def _stop(self):
+        pass
+
+    @abc.abstractmethod
+    def _run(self):
+        pass
+
+    @abc.abstractmethod
+    def _schedule(self, handle):
+        pass
+
+    @abc.abstractmethod
+    def _unschedule(self, handle):
+        pass
+
+    def _deliver(self, events):
+        if not events or not self.running:
+            return
+        try:
+            self.callback(events)
+        except Exception:
+            log.exception('Error in %s callback' % self.name)
+
+
+class _Handle:
+
+    def __init__(self, path, recursive):
+        self.path = path
+        self.recursive = recursive
+        self.data = None
+
+    def __repr__(self):
+        return '<watch %s%s>' % (self.path, '/**' if self.recursive else '')
+
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+
+
+_libc = None
+
+
+def _load_libc():
+    global _libc
+    if _libc is None:
+        name = ctypes.util.find_library('c') or 'libc.so.6'
+        libc = ctypes.CDLL(name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('libc does not provide inotify')
+        _libc = libc
+    return _libc
+
+
+class _InotifyWatch:
+
+    __slots__ = ('wd', 'path', 'handles')
+
+    def __init__(self, wd, path):
+        self.wd = wd
+        self.path = path
+        self.handles = set()
+
+
+class InotifyBackend(WatchBackend):
+    """
+    Talks to the linux inotify API directly. All pending events are read from
+    the kernel with a single system call and delivered as one batch. If the
+    event queue of the kernel overflowed, every file below the watched paths
+    is reported as modified, since the lost events cannot be recovered.
+    """
+
+    mask = (IN_MODIFY | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+            IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR |
+            IN_DONT_FOLLOW)
+
+    #: Maximum number of bytes to read from the inotify descriptor at once.
+    buffer_size = 256 * 1024
+
+    _header = struct.Struct('iIII')
+
+    @classmethod
+    def available(cls):
+        if not sys.platform.startswith('linux'):
+            return False
+        try:
+            _load_libc()
+        except OSError:
+            return False
+        return True
+
+    def __init__(self, callback, *, name=None, loop=None):
+        super().__init__(callback, name=name, loop=loop)
+        self._fd = None
+        self._wakeup = None
+        self._watches = {}
+        self._paths = {}
+
+    def _start(self):
+        libc = _load_libc()
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._fd = fd
+        self._watches = {}
+        self._paths = {}
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(
+                self.loop.add_reader, fd, self._read, fd)
+            return
+        self._wakeup = os.pipe()
+        super()._start()
+
+    def _stop(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._close, self._fd)
+        else:
+            os.write(self._wakeup[1], b'\0')
+
+    def _run(self):
+        fd, wakeup = self._fd, self._wakeup
+        poller = select.poll()
+        poller.register(fd, select.POLLIN)
+        poller.register(wakeup[0], select.POLLIN)
+        try:
+            while self.running:
+                ready = [r[0] for r in poller.poll()]
+                if wakeup[0] in ready:
+                    break
+                self._read(fd)
+        finally:
+            os.close(wakeup[0])
+            os.close(wakeup[1])
+            self._close(fd)
+
+    def _read(self, fd):
+        try:
+            data = os.read(fd, self.buffer_size)
+        except (BlockingIOError, InterruptedError):
+            return
+        with self._lock:
+            events = self._parse(data)
+        self._deliver(events)
+
+    def _close(self, fd):
+        if self.loop is not None:
+            self.loop.remove_reader(fd)
+        with self._lock:
+            os.close(fd)
+            if self._fd == fd:
+                # not restarted in the meantime
+                self._watches = {}
+                self._paths = {}
+                self._fd = None
+
+    def _parse(self, data):
+        events = []
+        header = self._header
+        offset = 0
+        end = len(data)
+        while offset < end:
+            wd, mask, cookie, length = header.unpack_from(data, offset)
+            offset += header.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                log.warning('inotify queue overflow, rescanning all paths')
+                events.extend(self._rescan())
+                continue
+            watch = self._watches.get(wd)
+            if watch is None:
+                continue
+            if mask & IN_IGNORED:
+                self._forget(watch)
+                continue
+            is_dir = bool(mask & IN_ISDIR)
+            if name:
+                path = os.path.join(watch.path, os.fsdecode(name))
+            else:
+                path = watch.path
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                events.append(WatchEvent(CREATED, path, is_dir))
+                if is_dir:
+                    self._watch_new_dir(watch, path, events)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                events.append(WatchEvent(DELETED, path, is_dir))
+            elif mask & (IN_MODIFY | IN_ATTRIB):
+                events.append(WatchEvent(MODIFIED, path, is_dir))
+            elif mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                events.append(WatchEvent(DELETED, path, True))
+        return events
+
+    def _rescan(self):
+        events = []
+        for handle in self._handles:
+            for root, dirs, files in os.walk(handle.path):
+                events.append(WatchEvent(MODIFIED, root, True))
+                for file in files:
+                    events.append(WatchEvent(MODIFIED,
+                                             os.path.join(root, file), False))
+                if not handle.recursive:
+                    break
+        return events
+
+    def _watch_new_dir(self, parent, path, events):
+        handles = [h for h in parent.handles if h.recursive]
+        if not handles:
+            return
+        for handle in handles:
+            self._add_tree(handle, path)
+        # anything created before the watch was in place would go unnoticed
+        for root, dirs, files in os.walk(path):
+            for dir in dirs:
+                events.append(WatchEvent(CREATED, os.path.join(root, dir),
+                                         True))
+            for file in files:
+                events.append(WatchEvent(CREATED, os.path.join(root, file),
+                                         False))
+
+    def _schedule(self, handle):
+        handle.data = set()
+        if handle.recursive:
+            self._add_tree(handle, handle.path)
+        else:
+            self._add(handle, handle.path)
+
+    def _add_tree(self, handle, path):
+        self._add(handle, path)
+        for root, dirs, files in os.walk(path):
+            for dir in dirs:
+                self._add(handle, os.path.join(root, dir))
+
+    def _add(self, handle, path):
+        watch = self._paths.get(path)
+        if watch is None:
+            wd = _libc.inotify_add_watch(
+                self._fd, os.fsencode(path), self.mask)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                    return
+                if err == errno.ENOSPC:
+                    raise OSError(err, 'inotify watch limit reached, see '
+                                  '/proc/sys/fs/inotify/max_user_watches')
+                raise OSError(err, os.strerror(err), path)
+            watch = self._watches.get(wd)
+            if watch is None:
+                watch = _InotifyWatch(wd, path)
+                self._watches[wd] = watch
+            self._paths[path] = watch
+        watch.handles.add(handle)
+        handle.data.add(watch)
+
+    def _unschedule(self, handle):
+        for watch in handle.data or ():
+            watch.handles.discard(handle)
+            if not watch.handles and watch.wd in self._watches:
+                _libc.inotify_rm_watch(self._fd, watch.wd)
+                self._forget(watch)
+        handle.data = None
+
+    def _forget(self, watch):
+        self._watches.pop(watch.wd, None)
+        if self._paths.get(watch.path) is watch:
+            del self._paths[watch.path]
+        for handle in watch.handles:
+            if handle.data:
+                handle.data.discard(watch)
+
+
+class WatchdogBackend(WatchBackend):
+    """
+    Delegates to the :mod:`watchdog` library, which supports all major
+    platforms.
+    """
+
+    @classmethod
+    def available(cls):
+        try:
+            import watchdog.observers  # NOQA
+        except ImportError:
+            return False
+        return True
+
+    def _start(self):
+        import watchdog.events
+        backend = self
+
+        class Handler(watchdog.events.FileSystemEventHandler):
+
+            def on_any_event(self, event):
+                backend._deliver(_convert_watchdog_event(event))
+
+        self._handler = Handler()
+        self.observer = _watchdog_observer()()
+        self.observer.name = self.name
+        self.observer.daemon = True
+        self.thread = self.observer
+        self.observer.start()
+
+    def _stop(self):
+        self.observer.stop()
+
+    def _run(self):
+        pass
+
+    def _schedule(self, handle):
+        handle.data = self.observer.schedule(
+            self._handler, handle.path, recursive=handle.recursive)
+
+    def _unschedule(self, handle):
+        if handle.data is not None:
+            self.observer.unschedule(handle.data)
+            handle.data = None
+
+
+def _convert_watchdog_event(event):
+    import watchdog.events
+    is_dir = event.is_directory
+    if event.event_type == watchdog.events.EVENT_TYPE_MOVED:
+        return [WatchEvent(DELETED, event.src_path, is_dir),
+                WatchEvent(CREATED, event.dest_path, is_dir)]
+    if event.event_type == watchdog.events.EVENT_TYPE_CREATED:
+        return [WatchEvent(CREATED, event.src_path, is_dir)]
+    if event.event_type == watchdog.events.EVENT_TYPE_DELETED:
+        return [WatchEvent(DELETED, event.src_path, is_dir)]
+    return [WatchEvent(MODIFIED, event.src_path, is_dir)]
+
+
+_Observer = None
+
+
+def _watchdog_observer():
+    global _Observer
+    if _Observer is not None:
+        return _Observer
+    import watchdog.observers
+    Observer = watchdog.observers.Observer
+    if Observer.__name__ == 'InotifyObserver':
+        import watchdog.observers.api
+        import watchdog.observers.inotify
+        import watchdog.utils
+
+        # The inotify original observer has a small delay for pairing
+        # IN_MOVED_FROM and IN_MOVE_TO events. Since we do not care whether
+        # something was moved *into* or *out of* our watches, we will override
+        # this behaviour to achieve the fastest possible reload times.
+
+        class InotifyBuffer(watchdog.observers.inotify.InotifyBuffer):
+
+            def __init__(self, *args, **kwargs):
+                self.delay = 0
+                super().__init__(*args, **kwargs)
+
+            def close(self):
+                self.stop()
+
+        class InotifyEmitter(watchdog.observers.inotify.InotifyEmitter):
+
+            def on_thread_start(self):
+                path = watchdog.utils.unicode_paths.encode(self.watch.path)
+                self._inotify = InotifyBuffer(path, self.watch.is_recursive)
+
+        class InotifyObserver(watchdog.observers.inotify.InotifyObserver):
+
+            def __init__(self, *args, **kwargs):
+                watchdog.observers.api.BaseObserver.__init__(
+                    self, *args, emitter_class=InotifyEmitter, **kwargs)
+
+        Observer = InotifyObserver
+    _Observer = Observer
+    return _Observer
+
+
+class PollingBackend(WatchBackend):
+    """
+    Detects changes by periodically comparing file stats. Intended for
+    network file systems, which do not report changes to the local kernel.
+
+    Directory listings are cached and only re-read when the modification time
+    of the directory changes.
+    """
+
+    #: Number of seconds between two scans.
+    interval = 1.0
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def __init__(self, callback, *, name=None, loop=None, interval=None):
+        super().__init__(callback, name=name, loop=loop)
+        if interval is not None:
+            self.interval = interval
+        self._wakeup = threading.Event()
+        self._listings = {}
+        self._stats = {}
+
+    def _start(self):
+        self._wakeup.clear()
+        super()._start()
+
+    def _stop(self):
+        self._wakeup.set()
+
+    def _schedule(self, handle):
+        handle.data = None
+        self._scan(handle)
+
+    def _unschedule(self, handle):
+        handle.data = None
+
+    def _run(self):
+        while not self._wakeup.wait(self.interval):
+            with self._lock:
+                events = []
+                for handle in self._handles:
+                    events.extend(self._scan(handle))
+            self._deliver(events)
+
+    def _scan(self, handle):
+        old = handle.data
+        new = {}
+        self._scan_dir(handle.path, handle.recursive, new)
+        handle.data = new
+        if old is None:
+            # the first scan only establishes the baseline
+            return []
+        events = []
+        for path, stat in new.items():
+            previous = old.get(path)
+            if previous is None:
+                events.append(WatchEvent(CREATED, path, stat[0]))
+            elif previous != stat and not stat[0]:
+                events.append(WatchEvent(MODIFIED, path, False))
+        for path, stat in old.items():
+            if path not in new:
+                events.append(WatchEvent(DELETED, path, stat[0]))
+        return events
+
+    def _scan_dir(self, dir, recursive, result):
+        try:
+            mtime = os.stat(dir).st_mtime_ns
+        except OSError:
+            self._listings.pop(dir, None)
+            return
+        cached = self._listings.get(dir)
+        if cached and cached[0] == mtime:
+            entries = cached[1]
+        else:
+            entries = []
+            try:
+                with os.scandir(dir) as iterator:
+                    for entry in iterator:
+                        try:
+                            is_dir = entry.is_dir(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        entries.append((entry.path, is_dir))
+            except OSError:
+                return
+            self._listings[dir] = (mtime, entries)
+        for path, is_dir in entries:
+            if is_dir:
+                result[path] = (True,)
+                if recursive:
+                    self._scan_dir(path, recursive, result)
+                continue
+            try:
+                stat = os.stat(path, follow_symlinks=False)
+            except OSError:
+                continue
+            result[path] = (False, stat.st_ino, stat.st_size,
+                            stat.st_mtime_ns)
+
+
+backends = collections.OrderedDict((
+    ('inotify', InotifyBackend),
+    ('watchdog', WatchdogBackend),
+    ('polling', PollingBackend),
+))
+
+
+def create_backend(backend, callback, **kwargs):
+    """
+    Creates a :class:`WatchBackend` by name, which must be one of the keys of
+    :data:`backends`, or ``auto``. The latter will pick the first available
+    backend.
+    """
+    if backend == 'auto':
+        for cls in backends.values():
+            if cls.available():
+                break
+    else:
+        try:
+            cls = backends[backend]
+        except KeyError:
+            raise ValueError('Unknown watch backend "%s"' % backend)
+        if not cls.available():
+            raise ValueError('Watch backend "%s" is not available' % backend)
+    if cls is not PollingBackend:
+        kwargs.pop('interval', None)
+    return cls(callback, **kwargs)
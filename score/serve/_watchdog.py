@@ -0,0 +1,148 @@
+# Copyright © 2015-2018 STRG.AT GmbH, Vienna, Austria
+# Copyright © 2020-2023 Necdet Can Ateşman, Vienna, Austria
+#
+# This file is part of the The SCORE Framework.
+#
+# The SCORE Framework and all its parts are free software: you can redistribute
+# them and/or modify them under the terms of the GNU Lesser General Public
+# License version 3 as published by the Free Software Foundation which is in
+# the file named COPYING.LESSER.txt.
+#
+# The SCORE Framework and all its parts are distributed without any WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE. For more details see the GNU Lesser General Public
+# License.
+#
+# If you have not received a copy of the GNU Lesser General Public License see
+# http://www.gnu.org/licenses/.
+#
+# The License-Agreement realised between you as Licensee and STRG.AT GmbH as
+# Licenser including the issue of its valid conclusion and its pre- and
+# post-contractual effects is governed by the laws of Austria. Any disputes
+# concerning this License-Agreement including the issue of its valid conclusion
+# and its pre- and post-contractual effects are exclusively decided by the
+# competent court, in whose district STRG.AT GmbH has its registered seat, at
+# the discretion of STRG.AT GmbH also the competent court, in whose district
+# the Licensee has his registered seat, an establishment or assets.
+
+import heapq
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+
+log = logging.getLogger(__name__)
+
+
+class Watchdog:
+    """
+    Enforces the deadlines of worker transitions. A single thread sleeps
+    until the earliest deadline and fails the :class:`Service
+    <score.serve.Service>` of every transition, that did not finish in time,
+    with a :class:`TransitionTimeout <score.serve.TransitionTimeout>`.
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._condition = threading.Condition()
+        self._heap = []
+        self._cancelled = 0
+        self._counter = itertools.count()
+        self._thread = None
+
+    def watch(self, service, transition, timeout, thread=None):
+        """
+        Starts watching the *transition* of given *service*, which is being
+        executed in *thread* (defaulting to the current thread). Returns a
+        handle for :meth:`unwatch`.
+        """
+        if self._pid != os.getpid():
+            # the thread did not survive a fork
+            self._reset()
+        entry = [time.monotonic() + timeout, next(self._counter), service,
+                 transition, timeout, thread or threading.current_thread(),
+                 service._generation]
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='Watchdog', daemon=True)
+                self._thread.start()
+            heapq.heappush(self._heap, entry)
+            if self._heap[0] is entry:
+                self._condition.notify()
+        return entry
+
+    def unwatch(self, entry):
+        """
+        Stops watching a transition, that finished in time. Returns `False`,
+        if the watchdog already failed the transition, in which case its
+        outcome must be discarded.
+        """
+        with self._condition:
+            if entry[2] is None:
+                return False
+            entry[2] = None
+            if entry[0] is None:
+                # the entry expired, but was not handled yet
+                return True
+            self._cancelled += 1
+            if self._cancelled > len(self._heap) // 2:
+                self._heap = [e for e in self._heap if e[2] is not None]
+                heapq.heapify(self._heap)
+                self._cancelled = 0
+        return True
+
+    def _run(self):
+        while True:
+            with self._condition:
+                entry = self._next_expired()
+            self._expired(entry)
+
+    def _next_expired(self):
+        while True:
+            while self._heap and self._heap[0][2] is None:
+                heapq.heappop(self._heap)
+                self._cancelled -= 1
+            if not self._heap:
+                self._condition.wait()
+                continue
+            remaining = self._heap[0][0] - time.monotonic()
+            if remaining > 0:
+                self._condition.wait(remaining)
+                continue
+            entry = heapq.heappop(self._heap)
+            # the entry stays registered until it is handled
+            entry[0] = None
+            return entry
+
+    def _expired(self, entry):
+        with self._condition:
+            service, transition, timeout, thread, generation = entry[2:]
+            if service is None:
+                # the transition finished in the meantime
+                return
+            entry[2] = None
+            with service.state_lock:
+                if service.state == service.State.EXCEPTION or \
+                        service._generation != generation:
+                    # the service failed or was reset in the meantime
+                    return
+        frame = sys._current_frames().get(thread.ident)
+        stack = ''.join(traceback.format_stack(frame)) if frame else ''
+        from .service import TransitionTimeout
+        exception = TransitionTimeout(service.name, transition, timeout, stack)
+        log.error('%s, stack of the transition:\n%s' % (exception, stack))
+        # the worker's cleanup() may block, too
+        threading.Thread(target=service.set_exception, args=(exception,),
+                         name='TransitionTimeout', daemon=True).start()
+
+
+#: The watchdog shared by all services of the current process.
+watchdog = Watchdog()
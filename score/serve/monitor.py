@@ -65,6 +65,10 @@ class ServiceMonitorProtocol(asyncio.Protocol):
                 self._conf.loop.create_task(self.server.controller.pause())
             elif command == b'stop':
                 self._conf.loop.create_task(self.server.stop())
+            elif command == b'info':
+                self._conf.loop.create_task(self._send_service_info_async())
+            elif command == b'timeline':
+                self._conf.loop.create_task(self._send_timeline_async())
             else:
                 warnings.warn('Received invalid command: ' + command)
 
@@ -106,5 +110,23 @@ class ServiceMonitorProtocol(asyncio.Protocol):
         services = yield from self.server.controller.service_states()
         self._state_change(services)
 
+    @coroutine
+    def _send_service_info_async(self):
+        if self.server is None:
+            return
+        info = yield from self.server.controller.service_info()
+        if not self.transport:
+            return
+        self._send(json.dumps({'info': info}))
+
+    @coroutine
+    def _send_timeline_async(self):
+        if self.server is None:
+            return
+        timeline = yield from self.server.controller.timeline()
+        if not self.transport:
+            return
+        self._send(json.dumps({'timeline': timeline}))
+
     def _send(self, data):
         self.transport.write(data.encode('UTF-8') + b'\n')
@@ -62,6 +62,28 @@ intermediate_states = {
 }
 
 
+class TransitionTimeout(Exception):
+    """
+    The exception of a :class:`Service`, whose worker did not finish a
+    *transition* (the name of the worker method, like ``prepare``) within
+    its :attr:`timeout <score.serve.Worker.transition_timeouts>`. The *stack*
+    contains the formatted stack of the thread, that was stuck in the
+    transition.
+    """
+
+    def __init__(self, service, transition, timeout, stack):
+        super().__init__('%s() of service %s did not finish within %gs' % (
+            transition, service, timeout))
+        self.service = service
+        self.transition = transition
+        self.timeout = timeout
+        self.stack = stack
+
+    def __reduce__(self):
+        return (type(self),
+                (self.service, self.transition, self.timeout, self.stack))
+
+
 class Service:
     """
     A wrapper around workers, that you can use to control your workers without
@@ -81,6 +103,7 @@ class Service:
         self._next_state = None
         self._state = STOPPED
         self._transition = None
+        self._generation = 0
         self.state_timestamp = time.time()
         worker.service = self
 
@@ -109,6 +132,50 @@ class Service:
         """
         self._transition_to(STOPPED)
 
+    def reset(self, worker=None):
+        """
+        Moves a service from the ``EXCEPTION`` state back to ``STOPPED``, so
+        that it can be started again. The failed worker is replaced with the
+        given *worker*, which is necessary if it cannot be reused, for
+        example because one of its transitions is still stuck. Does nothing,
+        if the service is in another state.
+        """
+        with self.state_lock:
+            if self._state != EXCEPTION:
+                return
+            if worker is not None:
+                self.worker = worker
+                worker.service = self
+            # transitions of the failed incarnation may still be running
+            self._generation += 1
+            self.exception = None
+            self._transition = None
+            self._target_state = None
+            self._next_state = None
+            self._state = STOPPED
+            self.state_timestamp = time.time()
+        self._state_changed(EXCEPTION, STOPPED)
+
+    def info(self):
+        """
+        Returns a JSON-serializable `dict` containing the current state, the
+        time the service entered that state and the :meth:`information
+        provided by the worker <score.serve.Worker.info>`.
+        """
+        info = {
+            'state': self._state.value,
+            'since': self.state_timestamp,
+        }
+        if self.exception is not None:
+            info['exception'] = repr(self.exception)
+            if isinstance(self.exception, TransitionTimeout):
+                info['stack'] = self.exception.stack
+        try:
+            info.update(self.worker.info())
+        except Exception as e:
+            log.exception(e)
+        return info
+
     def register_state_change_listener(self, callback):
         """
         Registers a `callable` that will be invoked whenever the state of the
@@ -181,15 +248,36 @@ class Service:
         log.debug('_execute_transition(%s, %s)' % (str(transition),
                                                    callback.__name__))
         state_timestamp = self.state_timestamp
+        generation = self._generation
+        timeouts = getattr(self.worker, 'transition_timeouts', None) or {}
+        timeout = timeouts.get(callback.__name__)
+        watch = None
+        if timeout is not None:
+            from ._watchdog import watchdog
+            watch = watchdog.watch(self, callback.__name__, timeout)
+        timed_out = False
         try:
-            callback()
+            try:
+                callback()
+            finally:
+                if watch is not None:
+                    timed_out = not watchdog.unwatch(watch)
+            if timed_out:
+                # the watchdog fails the service
+                return
             with self.state_lock:
+                if generation != self._generation:
+                    return
                 if self._transition == transition:
                     self._transition = None
                 if state_timestamp >= self.state_timestamp:
                     self.state = transition[1]
         except Exception as exception:
-            self.set_exception(exception)
+            if generation == self._generation:
+                self.set_exception(exception)
+            else:
+                log.debug('ignoring exception of a reset service: %r' %
+                          exception)
 
     def set_exception(self, exception):
         with self.state_lock:
@@ -206,9 +294,9 @@ class Service:
         log.debug('changed state: %s -> %s' % (old, new))
         if new == EXCEPTION:
             log.exception(self.exception)
-        for callback in self.state_listeners:
+        for callback in list(self.state_listeners):
             callback(self, old, new)
-        for callback in self.worker.state_listeners:
+        for callback in list(self.worker.state_listeners):
             callback(self, old, new)
         with self.state_lock:
             if self._next_state:
@@ -1,8 +1,42 @@
-from .worker import Worker, transitions
-from .socketserver import SocketServerWorker
-from .simple import SimpleWorker
-from .asyncio import AsyncioWorker
-from .watcher import FileWatcherWorker
+import importlib
+import sys
 
 __all__ = ('Worker', 'transitions', 'SocketServerWorker', 'SimpleWorker',
-           'AsyncioWorker', 'FileWatcherWorker')
+           'AsyncioWorker', 'ShardedAsyncioWorker', 'FileWatcherWorker',
+           'PeriodicWorker', 'ProcessWorker', 'ProcessGroup')
+
+# The worker implementations are imported on first access, so that only
+# the workers actually in use (and their dependencies) are loaded.
+_lazy_members = {
+    'Worker': '.worker',
+    'transitions': '.worker',
+    'SocketServerWorker': '.socketserver',
+    'SimpleWorker': '.simple',
+    'AsyncioWorker': '.asyncio',
+    'ShardedAsyncioWorker': '.asyncio',
+    'FileWatcherWorker': '.watcher',
+    'PeriodicWorker': '.periodic',
+    'ProcessWorker': '.process',
+    'ProcessGroup': '.process',
+}
+
+
+def __getattr__(name):
+    try:
+        module = _lazy_members[name]
+    except KeyError:
+        raise AttributeError(
+            'module %r has no attribute %r' % (__name__, name)) from None
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_members))
+
+
+if sys.version_info < (3, 7):
+    # module-level __getattr__ is not supported
+    for _name in _lazy_members:
+        __getattr__(_name)
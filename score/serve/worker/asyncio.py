@@ -1,7 +1,13 @@
 import abc
 import threading
 import asyncio
+import logging
+import os
 from .worker import Worker
+from .._tasks import finish_tasks, _describe
+from .._lag import LagProbe
+from .._resolver import default_resolver
+from .process import ProcessWorker, ProcessGroup
 import concurrent.futures
 
 try:
@@ -40,6 +46,9 @@ except ImportError:
     from asyncio import coroutine
 
 
+log = logging.getLogger(__name__)
+
+
 class AsyncioWorker(Worker):
     """
     A specialized worker for :mod:`asyncio` servers.
@@ -50,6 +59,11 @@ class AsyncioWorker(Worker):
     called inside a running event loop (which can be accessed as ``self.loop``)
     and can be regular functions or :term:`coroutines <coroutine>`.
 
+    Every connection accepted by a server created via :meth:`create_server`
+    counts towards :attr:`requests_handled
+    <score.serve.Worker.requests_handled>`. Implementations accepting
+    requests by other means should increment it themselves.
+
     Example implementation:
 
     .. code-block:: python
@@ -57,7 +71,7 @@ class AsyncioWorker(Worker):
         class EchoServer(AsyncioWorker):
 
             async def _start(self):
-                self.server = yield from self.loop.create_server(myserver)
+                self.server = await self.create_server(myserver)
 
             def _pause(self):
                 self.server.close()
@@ -65,37 +79,90 @@ class AsyncioWorker(Worker):
 
     loop = None
 
+    #: A callable returning the event loop to use. The default value `None`
+    #: uses :func:`asyncio.new_event_loop`. Can be overridden per service via
+    #: the ``loop`` configuration of :func:`score.serve.init`.
+    loop_factory = None
+
+    #: The :class:`score.serve._resolver.CachingResolver` performing DNS
+    #: lookups of this worker's loop in a thread pool. Defaults to a resolver
+    #: shared by all workers of the process.
+    resolver = None
+
+    #: Number of seconds to wait for pending tasks, when the worker is
+    #: stopped. Tasks still running afterwards will be cancelled. A value of
+    #: `None` waits indefinitely.
+    stop_timeout = 10
+
+    #: Descriptions of the tasks, that had to be cancelled during the last
+    #: stop.
+    cancelled_tasks = ()
+
+    #: Interval in seconds of the timer measuring the scheduling delay of
+    #: this worker's loop. A value of `None` disables the measurement.
+    lag_interval = 0.1
+
+    #: Number of seconds a single callback may block the loop, before its
+    #: stack is captured and its duration recorded as a slow callback. A
+    #: value of `None` disables sampling.
+    slow_callback_threshold = 0.1
+
+    #: The :class:`score.serve._lag.LagProbe` of the running loop.
+    lag_probe = None
+
+    #: The index of this worker, if it is a shard of a
+    #: :class:`ShardedAsyncioWorker`.
+    shard_index = 0
+
+    #: The total number of shards, if this worker is a shard of a
+    #: :class:`ShardedAsyncioWorker`.
+    shard_count = 1
+
+    #: The :class:`score.serve._reactor.Reactor` hosting this worker. The
+    #: worker runs on the loop shared by all workers of the reactor, instead
+    #: of starting a loop of its own, if this value is set. Its
+    #: :attr:`loop_factory` is ignored in that case and stopping the worker
+    #: only waits for the tasks it created itself.
+    reactor = None
+
+    def create_server(self, protocol_factory, host=None, port=None, **kwargs):
+        """
+        Calls :meth:`create_server <asyncio.loop.create_server>` on this
+        worker's loop. The socket option ``SO_REUSEPORT`` is enabled
+        automatically, if this worker is one of several shards, allowing all
+        shards to listen on the same port.
+
+        Every connection accepted by the server is counted in
+        :attr:`requests_handled <score.serve.Worker.requests_handled>`.
+        """
+        if self.shard_count > 1:
+            kwargs.setdefault('reuse_port', True)
+
+        def counting_factory():
+            self.requests_handled += 1
+            return protocol_factory()
+
+        return self.loop.create_server(counting_factory, host, port, **kwargs)
+
     def prepare(self):
+        if self.reactor is not None:
+            self.loop = self.reactor.loop
+            self.lag_probe = self.reactor.lag_probe
+            self.__wait(self.__schedule(self.__prepare()))
+            return
         if self.loop is None:
-            self.loop = asyncio.new_event_loop()
+            self.loop = (self.loop_factory or asyncio.new_event_loop)()
+            (self.resolver or default_resolver()).install(self.loop)
         event = threading.Event()
         threading.Thread(target=self.__start_loop, args=(event,)).start()
         event.wait()
-        event.clear()
-        future = run_coroutine_threadsafe(self.__prepare(), self.loop)
-        future.add_done_callback(lambda future: event.set())
-        event.wait()
-        exception = future.exception()
-        if exception:
-            raise exception
+        self.__wait(self.__schedule(self.__prepare()))
 
     def start(self):
-        event = threading.Event()
-        future = run_coroutine_threadsafe(self.__start(), self.loop)
-        future.add_done_callback(lambda future: event.set())
-        event.wait()
-        exception = future.exception()
-        if exception:
-            raise exception
+        self.__wait(self.__schedule(self.__start()))
 
     def pause(self):
-        event = threading.Event()
-        future = run_coroutine_threadsafe(self.__pause(), self.loop)
-        future.add_done_callback(lambda future: event.set())
-        event.wait()
-        exception = future.exception()
-        if exception:
-            raise exception
+        self.__wait(self.__schedule(self.__pause()))
 
     def stop(self):
 
@@ -103,7 +170,7 @@ class AsyncioWorker(Worker):
             self.loop.call_soon_threadsafe(self.__stop_loop, event)
 
         event = threading.Event()
-        future = run_coroutine_threadsafe(self.__stop(), self.loop)
+        future = self.__schedule(self.__stop())
         future.add_done_callback(stop_loop)
         event.wait()
         exception = future.exception()
@@ -111,18 +178,26 @@ class AsyncioWorker(Worker):
             raise exception
 
     def cleanup(self, exception):
-        if not self.loop.is_running():
+        if self.loop is None or not self.loop.is_running():
             return
 
         def stop_loop(future):
             self.loop.call_soon_threadsafe(self.__stop_loop, event)
 
         event = threading.Event()
-        future = run_coroutine_threadsafe(
-            self.__cleanup(exception), self.loop)
+        future = self.__schedule(self.__cleanup(exception))
         future.add_done_callback(stop_loop)
         event.wait()
 
+    def info(self):
+        info = {
+            'cancelled_tasks': list(self.cancelled_tasks),
+            'requests_handled': self.requests_handled,
+        }
+        if self.lag_probe:
+            info.update(self.lag_probe.snapshot())
+        return info
+
     def _prepare(self):
         """
         Equivalent of :meth:`Worker.prepare`.
@@ -166,8 +241,25 @@ class AsyncioWorker(Worker):
         """
         pass
 
+    def __schedule(self, coro):
+        if self.reactor is not None:
+            return self.reactor.run_coroutine(coro, self)
+        return run_coroutine_threadsafe(coro, self.loop)
+
+    def __wait(self, future):
+        event = threading.Event()
+        future.add_done_callback(lambda future: event.set())
+        event.wait()
+        exception = future.exception()
+        if exception:
+            raise exception
+
     def __start_loop(self, event):
         event.set()
+        if self.lag_interval is not None:
+            self.lag_probe = LagProbe(
+                self.loop, self.lag_interval, self.slow_callback_threshold)
+            self.loop.call_soon(self.lag_probe.start)
         self.loop.run_forever()
 
     @coroutine
@@ -204,19 +296,151 @@ class AsyncioWorker(Worker):
         if not self.loop.is_running():
             event.set()
             return
+        reactor = self.reactor
+
+        def stop(future):
+            if not future.cancelled() and not future.exception():
+                self.cancelled_tasks = [
+                    _describe(task) for task in future.result()]
+            if reactor is None:
+                # the loop of a reactor keeps running for its other workers
+                if self.lag_probe:
+                    self.lag_probe.stop()
+                self.loop.stop()
+            event.set()
 
-        def stop(future=None):
-            if hasattr(asyncio, 'all_tasks'):
-                all_tasks = asyncio.all_tasks(loop=self.loop)
-            else:
-                all_tasks = asyncio.Task.all_tasks(loop=self.loop)
-            pending_tasks = [t for t in all_tasks
-                             if not t.done()]
-            if pending_tasks:
-                task = pending_tasks.pop()
-                task.add_done_callback(stop)
+        if reactor is None:
+            tasks = None
+        else:
+            def tasks():
+                return reactor.tasks(self)
+        task = self.loop.create_task(
+            finish_tasks(self.loop, self.stop_timeout, tasks=tasks))
+        task.add_done_callback(stop)
+
+
+class ShardedAsyncioWorker(Worker):
+    """
+    Runs several instances of an :class:`AsyncioWorker`, each on its own event
+    loop, to make use of more than one CPU core.
+
+    The *factory* must be a callable returning a new :class:`AsyncioWorker`
+    on every invocation and will be called once for each of the *shards*,
+    which defaults to the number of CPUs. Every shard has its own
+    ``shard_index`` and runs its own transitions. All transitions of this
+    worker are passed to all shards in parallel and only finish when all
+    shards have finished.
+
+    The *mode* determines how shards are executed: ``thread`` runs each loop
+    in a thread of the current process, while ``process`` runs each shard in
+    a forked process, which also circumvents the global interpreter lock.
+    Shard processes are :class:`recycled <score.serve.ProcessGroup>` one at
+    a time by starting the new process before stopping the old one. Their
+    requests count towards ``recycle.max_requests`` of their own process,
+    not towards :attr:`requests_handled
+    <score.serve.Worker.requests_handled>` of this worker.
+
+    Shards should create their listening sockets via
+    :meth:`AsyncioWorker.create_server`, which enables ``SO_REUSEPORT``,
+    allowing all shards to bind the same address:
+
+    .. code-block:: python
+
+        class EchoServer(AsyncioWorker):
+
+            async def _start(self):
+                self.server = await self.create_server(
+                    EchoProtocol, 'localhost', 8080)
+
+            def _pause(self):
+                self.server.close()
+
+        worker = ShardedAsyncioWorker(EchoServer, shards=4, mode='process')
+    """
+
+    #: The ``loop_factory`` passed to all shards, that do not define one of
+    #: their own.
+    loop_factory = None
+
+    #: The ``resolver`` passed to all shards, that do not define one of their
+    #: own.
+    resolver = None
+
+    def __init__(self, factory, shards=None, *, mode='thread'):
+        if mode not in ('thread', 'process'):
+            raise ValueError('Invalid mode "%s"' % mode)
+        self.factory = factory
+        self.shard_count = shards or os.cpu_count() or 1
+        self.mode = mode
+        self.shards = []
+
+    def prepare(self):
+        self.shards = []
+        for index in range(self.shard_count):
+            worker = self.factory()
+            worker.shard_index = index
+            worker.shard_count = self.shard_count
+            if worker.loop_factory is None:
+                worker.loop_factory = self.loop_factory
+            if worker.resolver is None:
+                worker.resolver = self.resolver
+            if self.mode == 'process':
+                name = '%s#%d' % (self.service.name, index)
+                group = ProcessGroup(name, handover=True)
+                shard = ProcessWorker(worker, group, name=name)
             else:
-                self.loop.stop()
-                event.set()
+                shard = worker
+            shard.service = self.service
+            self.shards.append(shard)
+        self._fan_out('prepare')
+
+    def start(self):
+        self._fan_out('start')
 
-        stop()
+    def pause(self):
+        self._fan_out('pause')
+
+    def stop(self):
+        self._fan_out('stop')
+
+    def cleanup(self, exception):
+        try:
+            self._fan_out('cleanup', exception)
+        except Exception as e:
+            log.exception(e)
+
+    @property
+    def requests_handled(self):
+        # shard processes are recycled by their own process groups
+        if self.mode == 'process':
+            return 0
+        return sum(shard.requests_handled for shard in self.shards)
+
+    def info(self):
+        shards = []
+        for shard in self.shards:
+            try:
+                shards.append(shard.info())
+            except Exception as e:
+                shards.append({'exception': repr(e)})
+        return {'mode': self.mode, 'shards': shards}
+
+    def _fan_out(self, funcname, *args):
+        errors = []
+
+        def call(shard):
+            try:
+                getattr(shard, funcname)(*args)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call, args=(shard,))
+                   for shard in self.shards]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            for error in errors[1:]:
+                log.error('Additional shard failure: %r' % error)
+            raise errors[0]
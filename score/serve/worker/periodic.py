@@ -0,0 +1,466 @@
+import concurrent.futures
+import datetime
+import logging
+import math
+import random
+import threading
+import time
+
+from .worker import Worker
+
+
+log = logging.getLogger(__name__)
+
+
+class _TimerWheel:
+    """
+    A hierarchical timer wheel with *levels* levels of 64 slots each. A slot
+    on the lowest level covers a single tick, a slot on every further level
+    covers 64 times the range of a slot on the level below. Entries are moved
+    to lower levels ("cascaded") when the wheel reaches their slot.
+
+    Entries too far in the future for the highest level are parked in its
+    furthest slot and re-inserted whenever that slot is cascaded.
+    """
+
+    bits = 6
+    size = 1 << bits
+    mask = size - 1
+
+    def __init__(self, levels=4):
+        self.levels = [[set() for _ in range(self.size)]
+                       for _ in range(levels)]
+        self.current = 0
+        self.count = 0
+
+    def insert(self, entry):
+        """
+        Adds an *entry* with a ``tick`` attribute to the wheel. Returns
+        `False` if the entry is already due, in which case it is not added.
+        """
+        if entry.tick <= self.current:
+            return False
+        for level in range(len(self.levels)):
+            shift = self.bits * level
+            delta = (entry.tick >> shift) - (self.current >> shift)
+            if delta < self.size:
+                break
+        else:
+            delta = self.mask
+        index = ((self.current >> shift) + delta) & self.mask
+        self.levels[level][index].add(entry)
+        entry.slot = self.levels[level][index]
+        self.count += 1
+        return True
+
+    def remove(self, entry):
+        if entry.slot is not None:
+            entry.slot.discard(entry)
+            entry.slot = None
+            self.count -= 1
+
+    def next_tick(self):
+        """
+        Returns the next tick, where the wheel needs to be advanced, or
+        `None` if the wheel is empty.
+        """
+        if not self.count:
+            return None
+        result = None
+        for level, slots in enumerate(self.levels):
+            shift = self.bits * level
+            base = self.current >> shift
+            for delta in range(1, self.size):
+                if slots[(base + delta) & self.mask]:
+                    tick = (base + delta) << shift
+                    if result is None or tick < result:
+                        result = tick
+                    break
+            upper = self.bits * (level + 1)
+            if result is not None and \
+                    result <= ((self.current >> upper) + 1) << upper:
+                # slots of higher levels cannot start earlier than this
+                break
+        return result
+
+    def advance(self, tick):
+        """
+        Moves the wheel to the given *tick*, which must not be greater than
+        the value returned by :meth:`next_tick`, and returns all entries
+        that are due.
+        """
+        self.current = tick
+        due = []
+        for level in reversed(range(1, len(self.levels))):
+            shift = self.bits * level
+            if tick & ((1 << shift) - 1):
+                continue
+            slot = self.levels[level][(tick >> shift) & self.mask]
+            entries = list(slot)
+            slot.clear()
+            self.count -= len(entries)
+            for entry in entries:
+                entry.slot = None
+                if not self.insert(entry):
+                    due.append(entry)
+        slot = self.levels[0][tick & self.mask]
+        entries = list(slot)
+        slot.clear()
+        self.count -= len(entries)
+        for entry in entries:
+            entry.slot = None
+        return due + entries
+
+
+class _CronSchedule:
+    """
+    A schedule in the classic five-field crontab format "minute hour
+    day-of-month month day-of-week". Every field may contain ``*``, numbers,
+    ranges (``1-5``), steps (``*/15``, ``0-30/10``) and comma-separated lists
+    thereof. Day-of-week 0 and 7 both denote sunday.
+    """
+
+    ranges = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError('Invalid cron expression "%s"' % expression)
+        parsed = [self._parse(field, *bounds)
+                  for field, bounds in zip(fields, self.ranges)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        if 7 in weekdays:
+            weekdays = (weekdays - {7}) | {0}
+        self.weekdays = weekdays
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+        self.expression = expression
+
+    def _parse(self, field, low, high):
+        values = set()
+        for part in field.split(','):
+            step = 1
+            if '/' in part:
+                part, step = part.split('/', 1)
+                step = int(step)
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start, end = map(int, part.split('-', 1))
+            else:
+                start = end = int(part)
+                if step != 1:
+                    end = high
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError('Invalid cron field "%s"' % field)
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, date):
+        day = date.day in self.days
+        weekday = (date.isoweekday() % 7) in self.weekdays
+        if self.any_day:
+            return weekday
+        if self.any_weekday:
+            return day
+        return day or weekday
+
+    def next(self, after):
+        """
+        Returns the first :class:`datetime.datetime` matching this schedule,
+        that is later than *after*.
+        """
+        time = after.replace(second=0, microsecond=0) + \
+            datetime.timedelta(minutes=1)
+        limit = time + datetime.timedelta(days=366 * 5)
+        while time < limit:
+            if time.month not in self.months:
+                year, month = divmod(time.month, 12)
+                time = time.replace(year=time.year + year, month=month + 1,
+                                    day=1, hour=0, minute=0)
+            elif not self._day_matches(time):
+                time = time.replace(hour=0, minute=0) + \
+                    datetime.timedelta(days=1)
+            elif time.hour not in self.hours:
+                time = time.replace(minute=0) + datetime.timedelta(hours=1)
+            elif time.minute not in self.minutes:
+                time += datetime.timedelta(minutes=1)
+            else:
+                return time
+        raise ValueError(
+            'Cron expression "%s" never matches' % self.expression)
+
+
+class Job:
+    """
+    A job scheduled by a :class:`PeriodicWorker`. Instances are created via
+    :meth:`PeriodicWorker.add_job`.
+    """
+
+    def __init__(self, func, name, interval, cron, jitter, overrun):
+        if (interval is None) == (cron is None):
+            raise ValueError('Exactly one of interval and cron is required')
+        if overrun not in ('skip', 'queue', 'concurrent'):
+            raise ValueError('Invalid overrun policy "%s"' % overrun)
+        if interval is not None and not 0 < interval < math.inf:
+            raise ValueError('Invalid interval %r' % interval)
+        if not 0 <= jitter < math.inf:
+            raise ValueError('Invalid jitter %r' % jitter)
+        self.func = func
+        self.name = name
+        self.interval = interval
+        self.cron = _CronSchedule(cron) if cron is not None else None
+        if self.cron is not None:
+            # raises a ValueError, if the expression never matches
+            self.cron.next(datetime.datetime.now())
+        self.jitter = jitter
+        self.overrun = overrun
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+        self.running = 0
+        self.queued = 0
+        self.last_duration = None
+        self.last_exception = None
+        self.scheduled = None
+        self.tick = None
+        self.slot = None
+
+    def _next_run(self, now):
+        """
+        Returns the :func:`time.monotonic` value of the next run after *now*,
+        skipping runs that were missed.
+        """
+        if self.cron is not None:
+            wallclock = datetime.datetime.now()
+            next_run = self.cron.next(wallclock)
+            return now + (next_run - wallclock).total_seconds()
+        if self.scheduled is None:
+            return now + self.interval
+        missed = max(0, math.floor((now - self.scheduled) / self.interval))
+        return self.scheduled + (missed + 1) * self.interval
+
+    def info(self):
+        return {
+            'runs': self.runs,
+            'skipped': self.skipped,
+            'failures': self.failures,
+            'running': self.running,
+            'queued': self.queued,
+            'last_duration': self.last_duration,
+            'last_exception': (repr(self.last_exception)
+                               if self.last_exception else None),
+        }
+
+
+class PeriodicWorker(Worker):
+    """
+    A worker running many periodic jobs on a single scheduler thread. Jobs
+    are kept in a hierarchical timer wheel and executed in a thread pool of
+    at most ``max_workers`` threads:
+
+    .. code-block:: python
+
+        worker = PeriodicWorker()
+        worker.add_job(send_heartbeat, interval=5, jitter=0.5)
+        worker.add_job(rotate_logs, cron='0 3 * * *', overrun='skip')
+
+    Pausing the worker suspends the scheduler without forgetting the
+    schedule and waits for running jobs to finish. Jobs that became due while
+    the worker was paused will run once when it is started again.
+    """
+
+    #: Maximum number of jobs to execute at the same time.
+    max_workers = 8
+
+    #: Duration of a single tick of the timer wheel in seconds. Jobs are
+    #: executed with this precision.
+    resolution = 0.01
+
+    def __init__(self):
+        self.jobs = []
+        self.__condition = threading.Condition()
+        self.__wheel = None
+        self.__origin = None
+        self.__thread = None
+        self.__running = False
+        self.__executor = None
+
+    def add_job(self, func, *, interval=None, cron=None, jitter=0,
+                overrun='skip', name=None):
+        """
+        Schedules the callable *func* to be invoked every *interval* seconds
+        or according to a *cron* expression in crontab format, like
+        ``*/5 * * * *``. Each run will be delayed by a random number of
+        seconds up to *jitter*.
+
+        The *overrun* policy determines what happens, if a job is still
+        running when its next run is due: ``skip`` drops the new run,
+        ``queue`` executes it as soon as the current run finishes and
+        ``concurrent`` executes it immediately.
+
+        Returns a :class:`Job` object that can be passed to
+        :meth:`remove_job`. Raises a :class:`ValueError` if the job cannot be
+        scheduled, for example because its *cron* expression never matches.
+        """
+        if name is None:
+            name = getattr(func, '__qualname__', repr(func))
+        job = Job(func, name, interval, cron, jitter, overrun)
+        with self.__condition:
+            if self.__wheel is not None:
+                self.__schedule(job, time.monotonic())
+                self.__condition.notify()
+            self.jobs.append(job)
+        return job
+
+    def remove_job(self, job):
+        """
+        Removes a :class:`Job` previously added via :meth:`add_job`.
+        """
+        with self.__condition:
+            self.jobs.remove(job)
+            if self.__wheel is not None:
+                self.__wheel.remove(job)
+
+    def prepare(self):
+        with self.__condition:
+            self.__wheel = _TimerWheel()
+            self.__origin = time.monotonic()
+            now = time.monotonic()
+            for job in self.jobs:
+                job.scheduled = None
+                self.__schedule(job, now)
+        self.__executor = concurrent.futures.ThreadPoolExecutor(
+            self.max_workers)
+
+    def start(self):
+        with self.__condition:
+            self.__running = True
+            for job in self.jobs:
+                if job.queued and not job.running:
+                    job.queued -= 1
+                    self.__submit(job)
+        self.__thread = threading.Thread(target=self.__loop)
+        self.__thread.start()
+
+    def pause(self):
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify()
+        if self.__thread:
+            self.__thread.join()
+            self.__thread = None
+        with self.__condition:
+            while any(job.running for job in self.jobs):
+                self.__condition.wait()
+
+    def stop(self):
+        self.pause()
+        executor, self.__executor = self.__executor, None
+        if executor:
+            executor.shutdown(wait=True)
+        with self.__condition:
+            self.__wheel = None
+            for job in self.jobs:
+                job.slot = None
+
+    def cleanup(self, exception):
+        with self.__condition:
+            self.__running = False
+            self.__wheel = None
+            for job in self.jobs:
+                job.slot = None
+            self.__condition.notify()
+        executor, self.__executor = self.__executor, None
+        if executor:
+            executor.shutdown(wait=False)
+
+    def info(self):
+        with self.__condition:
+            now = time.monotonic()
+            jobs = {}
+            for job in self.jobs:
+                info = job.info()
+                if job.slot is not None:
+                    info['next_run_in'] = max(
+                        0, self.__time_of(job.tick) - now)
+                jobs[job.name] = info
+            return {'jobs': jobs}
+
+    def __tick_of(self, moment):
+        return math.ceil((moment - self.__origin) / self.resolution)
+
+    def __time_of(self, tick):
+        return self.__origin + tick * self.resolution
+
+    def __schedule(self, job, now):
+        wheel = self.__wheel
+        if not wheel.count:
+            wheel.current = max(wheel.current, self.__tick_of(now) - 1)
+        job.scheduled = job._next_run(now)
+        deadline = job.scheduled
+        if job.jitter:
+            deadline += random.uniform(0, job.jitter)
+        job.tick = max(self.__tick_of(deadline), wheel.current + 1)
+        wheel.insert(job)
+
+    def __loop(self):
+        try:
+            self.__run_scheduler()
+        except Exception as e:
+            self.service.set_exception(e)
+
+    def __run_scheduler(self):
+        with self.__condition:
+            while self.__running and self.__wheel is not None:
+                wheel = self.__wheel
+                now = time.monotonic()
+                tick = wheel.next_tick()
+                if tick is None:
+                    self.__condition.wait()
+                    continue
+                if tick > self.__tick_of(now):
+                    self.__condition.wait(self.__time_of(tick) - now)
+                    continue
+                for job in wheel.advance(tick):
+                    self.__schedule(job, now)
+                    self.__fire(job)
+
+    def __fire(self, job):
+        if job.running and job.overrun == 'skip':
+            job.skipped += 1
+        elif job.running and job.overrun == 'queue':
+            job.queued += 1
+        else:
+            self.__submit(job)
+
+    def __submit(self, job):
+        executor = self.__executor
+        if executor is None:
+            return
+        job.running += 1
+        try:
+            executor.submit(self.__execute, job)
+        except RuntimeError:
+            # the executor was shut down
+            job.running -= 1
+
+    def __execute(self, job):
+        start = time.monotonic()
+        exception = None
+        try:
+            job.func()
+        except Exception as e:
+            exception = e
+            log.exception('Periodic job %s failed' % job.name)
+        with self.__condition:
+            job.running -= 1
+            job.runs += 1
+            job.last_duration = time.monotonic() - start
+            if exception is not None:
+                job.failures += 1
+                job.last_exception = exception
+            if job.queued and self.__running and job in self.jobs:
+                job.queued -= 1
+                self.__submit(job)
+            self.__condition.notify_all()
@@ -0,0 +1,301 @@
+import functools
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from .worker import Worker
+from ..service import Service
+
+
+log = logging.getLogger(__name__)
+
+
+class ProcessGroup:
+    """
+    A forked process hosting the workers of one or more
+    :class:`ProcessWorker` objects.
+
+    The process is forked, as soon as the first member is prepared, and
+    receives the workers of all members at that point. It is terminated again,
+    when the last member stops. An optional
+    :class:`score.serve._placement.Placement` is applied to the process right
+    after forking.
+
+    The process can be replaced by a fresh fork via :meth:`recycle`. Groups
+    with *handover* enabled start their members in the new process before
+    stopping them in the old one, which keeps capacity up, but requires the
+    workers to tolerate running twice for a moment, e.g. by listening with
+    ``SO_REUSEPORT``.
+    """
+
+    _instances = weakref.WeakSet()
+
+    def __init__(self, name=None, *, placement=None, handover=False):
+        self.name = name
+        self.placement = placement
+        self.handover = handover
+        self.members = []
+        self.gateway = None
+        self.loop = None
+        self.pid = None
+        self.started = None
+        self.__owner = None
+        self.__condition = threading.Condition()
+        self.__active = set()
+        self.__transitions = 0
+        self.__recycling = False
+        ProcessGroup._instances.add(self)
+
+    @classmethod
+    def running_groups(cls):
+        """
+        Returns all groups with a running process forked by the current
+        process.
+        """
+        pid = os.getpid()
+        return [group for group in list(cls._instances)
+                if group.gateway is not None and group.__owner == pid]
+
+    def transition(self, member, state):
+        """
+        Transitions the worker of given *member* inside the process to given
+        *state*, forking the process first, if necessary.
+        """
+        with self.__condition:
+            while self.__recycling:
+                self.__condition.wait()
+            # a member, that failed earlier, must be reset inside the process
+            # kept running by the other members
+            reset = self.gateway is not None and \
+                member.name not in self.__active
+            if self.gateway is None:
+                self.gateway, self.pid = self.__fork()
+            self.__active.add(member.name)
+            self.__transitions += 1
+            gateway = self.gateway
+        try:
+            if reset:
+                self.__call(gateway.reset, member.name)
+            self.__transition(gateway, member, state)
+        finally:
+            with self.__condition:
+                self.__transitions -= 1
+                self.__condition.notify_all()
+        if state == Service.State.STOPPED:
+            self.release(member)
+
+    def release(self, member, *, graceful=True):
+        """
+        Notifies the group, that given *member* no longer needs the process.
+        The process is terminated, if no other members are active. A
+        *graceful* termination allows the process to exit on its own, while
+        the alternative sends it a ``SIGTERM``.
+        """
+        with self.__condition:
+            self.__active.discard(member.name)
+            if self.__active or self.gateway is None or self.__recycling:
+                return
+            gateway, self.gateway = self.gateway, None
+            pid, self.pid = self.pid, None
+        self.__terminate(gateway, pid, graceful)
+
+    def recycle(self):
+        """
+        Replaces the process with a fresh fork, moving all active members
+        into the new process in their current state. Returns `False`, if the
+        group is not running or currently busy with transitions.
+        """
+        with self.__condition:
+            if self.gateway is None or self.__transitions or \
+                    self.__recycling:
+                return False
+            self.__recycling = True
+            old_gateway, old_pid = self.gateway, self.pid
+            members = [member for member in self.members
+                       if member.name in self.__active]
+        new_gateway = new_pid = None
+        try:
+            states = [(member, member.service.state) for member in members]
+            if not self.handover:
+                self.__retire(old_gateway, old_pid, members)
+                old_gateway = None
+            new_gateway, new_pid = self.__fork()
+            for member, state in states:
+                self.__transition(new_gateway, member, Service.State.PAUSED)
+                if state == Service.State.RUNNING:
+                    self.__transition(new_gateway, member, state)
+            if self.handover:
+                self.__retire(old_gateway, old_pid, members)
+                old_gateway = None
+        except Exception as e:
+            log.exception(e)
+            if old_gateway is not None:
+                self.__terminate(old_gateway, old_pid, False)
+            if new_gateway is not None:
+                self.__terminate(new_gateway, new_pid, False)
+                new_gateway = new_pid = None
+            for member in members:
+                member.service.set_exception(e)
+        finally:
+            with self.__condition:
+                self.__recycling = False
+                self.gateway, self.pid = new_gateway, new_pid
+                active = bool(self.__active)
+                self.__condition.notify_all()
+        if new_gateway is not None and not active:
+            with self.__condition:
+                self.gateway = self.pid = None
+            self.__terminate(new_gateway, new_pid, True)
+        return new_gateway is not None
+
+    def recycle_stats(self):
+        """
+        Returns a tuple (pid, requests, started) describing the running
+        process, or `None` if there is none.
+        """
+        gateway, pid, started = self.gateway, self.pid, self.started
+        if gateway is None:
+            return None
+        requests = 0
+        for member in self.members:
+            try:
+                requests += self.__call(gateway.requests_handled, member.name)
+            except Exception:
+                continue
+        return pid, requests, started
+
+    def info(self, member):
+        gateway = self.gateway
+        if gateway is None:
+            return {}
+        return self.__call(gateway.info, member.name)
+
+    def __call(self, func, *args):
+        from .._forked import call_in_loop
+        return call_in_loop(self.loop, func, *args)
+
+    def __transition(self, gateway, member, state):
+        self.__call(gateway.transition, member.name, state.value)
+
+    def __retire(self, gateway, pid, members):
+        for member in members:
+            self.__transition(gateway, member, Service.State.STOPPED)
+        self.__terminate(gateway, pid, True)
+
+    def __terminate(self, gateway, pid, graceful):
+        if graceful:
+            try:
+                self.__call(gateway.kill)
+            except Exception as e:
+                log.exception(e)
+        self.__call(gateway.cleanup)
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+
+    def __fork(self):
+        from .._forked import fork, gateway_loop, WorkerHost
+        self.loop = gateway_loop()
+        workers = OrderedDict(
+            (member.name, member.worker) for member in self.members)
+        gateway = self.__call(functools.partial(
+            fork, self.loop, WorkerHost, workers, placement=self.placement))
+        gateway.on('state-change', self.__state_changed)
+        gateway.on('exit', functools.partial(self.__exited, gateway))
+        self.started = time.monotonic()
+        self.__owner = os.getpid()
+        return gateway, gateway.childpid
+
+    def __exited(self, gateway, exitcode):
+        with self.__condition:
+            if self.gateway is not gateway or self.__recycling:
+                # the process was terminated on purpose
+                return
+            self.gateway = self.pid = None
+            members = [member for member in self.members
+                       if member.name in self.__active]
+            self.__active.clear()
+        from .._forked import ChildDiedError
+        exception = ChildDiedError(
+            'Process of group %s exited with code %s' % (self.name, exitcode))
+        log.error(exception)
+        for member in members:
+            threading.Thread(
+                target=member.service.set_exception, args=(exception,),
+                daemon=True).start()
+
+    def __state_changed(self, name, old, new, exception):
+        if exception is None:
+            return
+        for member in self.members:
+            if member.name == name:
+                # cleaning up the member needs the loop we are running in
+                threading.Thread(
+                    target=member.service.set_exception, args=(exception,),
+                    daemon=True).start()
+
+
+class ProcessWorker(Worker):
+    """
+    Runs the transitions of another *worker* in a forked process, which
+    isolates CPU-bound workers from all others and circumvents the global
+    interpreter lock.
+
+    Each ProcessWorker forks a process of its own, unless a
+    :class:`ProcessGroup` is provided as *group*, in which case the workers of
+    all members of that group share a single process. The worker is known
+    under the *name* of its service inside that process, unless another
+    *name* is provided.
+
+    Services can also be moved into processes via the ``process_groups``
+    configuration of :func:`score.serve.init` without changing their code.
+    """
+
+    def __init__(self, worker, group=None, *, name=None):
+        self.worker = worker
+        self.group = group if group is not None else ProcessGroup()
+        self.group.members.append(self)
+        self._name = name
+
+    @property
+    def name(self):
+        return self._name or self.service.name
+
+    @property
+    def transition_timeouts(self):
+        # The forked process enforces the timeouts of the wrapped worker and
+        # reports the stack of its stuck thread. The controller only steps in
+        # a second later, in case the whole process is stuck.
+        return {name: timeout + 1 for name, timeout
+                in self.worker.transition_timeouts.items()
+                if timeout is not None}
+
+    def prepare(self):
+        self.group.transition(self, Service.State.PAUSED)
+
+    def start(self):
+        self.group.transition(self, Service.State.RUNNING)
+
+    def pause(self):
+        self.group.transition(self, Service.State.PAUSED)
+
+    def stop(self):
+        self.group.transition(self, Service.State.STOPPED)
+
+    def cleanup(self, exception):
+        try:
+            self.group.release(self, graceful=False)
+        except Exception as e:
+            log.exception(e)
+
+    def info(self):
+        info = self.group.info(self)
+        for key in ('state', 'since', 'exception'):
+            info.pop(key, None)
+        if self.group.name:
+            info['group'] = self.group.name
+        return info
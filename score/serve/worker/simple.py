@@ -1,4 +1,5 @@
 import abc
+import pickle
 import threading
 
 from .worker import Worker
@@ -15,45 +16,170 @@ class SimpleWorker(Worker):
 
         class Spammer(SimpleWorker):
 
-            def loop():
+            def loop(self):
                 while self.running:
                     print('spam!')
                     time.sleep(1)
+
+    Loops, that need to sleep between iterations, should use :meth:`wait`
+    instead, which returns immediately, when the worker is paused:
+
+    .. code-block:: python
+
+        class Spammer(SimpleWorker):
+
+            def loop(self):
+                while not self.wait(1):
+                    print('spam!')
     """
 
+    #: Number of loops to run in parallel.
+    concurrency = 1
+
+    #: Whether the loops should run in threads of the current process
+    #: (``thread``) or in forked processes (``process``).
+    concurrency_mode = 'thread'
+
     def prepare(self):
-        self.__lock = threading.Lock()
-        self.__thread = None
+        if self.concurrency_mode not in ('thread', 'process'):
+            raise ValueError(
+                'Invalid concurrency_mode "%s"' % self.concurrency_mode)
+        self.__stop_event = threading.Event()
+        self.__stop_event.set()
+        self.__runners = []
 
     def start(self):
-        self.__thread = threading.Thread(target=self.__loop).start()
+        self.__stop_event.clear()
+        if self.concurrency_mode == 'process':
+            import multiprocessing
+            context = multiprocessing.get_context('fork')
+
+            def create_runner():
+                return _LoopProcess(self, context)
+        else:
+
+            def create_runner():
+                return threading.Thread(target=self.__loop)
+        for _ in range(self.concurrency):
+            runner = create_runner()
+            runner.start()
+            self.__runners.append(runner)
 
     def pause(self):
-        with self.__lock:
-            self.__running = False
-        if self.__thread:
-            self.__thread.join()
-            self.__thread = None
+        self.__stop_event.set()
+        runners, self.__runners = self.__runners, []
+        for runner in runners:
+            runner.join()
 
     def stop(self):
         self.pause()
 
+    def cleanup(self, exception):
+        self.__stop_event.set()
+        for runner in self.__runners:
+            if isinstance(runner, _LoopProcess):
+                runner.stop()
+
+    @property
+    def running(self):
+        """
+        Whether the loop should keep running.
+        """
+        return not self.__stop_event.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Blocks until this worker is paused or until the optional *timeout*
+        expires. Returns `True` if the loop should terminate.
+        """
+        return self.__stop_event.wait(timeout)
+
     def __loop(self):
-        with self.__lock:
-            self.__running = True
         try:
             self.loop()
         except Exception as e:
             self.service.set_exception(e)
 
-    def cleanup(self, exception):
-        pass
+    def _run_in_process(self, stop_pipe, pipe):
+        self.__stop_event = threading.Event()
 
-    @property
-    def running(self):
-        with self.__lock:
-            return self.__running
+        def forward_stop():
+            try:
+                stop_pipe.recv_bytes()
+            except (EOFError, OSError):
+                pass
+            self.__stop_event.set()
+
+        thread = threading.Thread(target=forward_stop)
+        thread.daemon = True
+        thread.start()
+        try:
+            self.loop()
+        except Exception as e:
+            try:
+                pipe.send_bytes(pickle.dumps(e))
+            except Exception:
+                pipe.send_bytes(pickle.dumps(RuntimeError(repr(e))))
+            raise
 
     @abc.abstractmethod
     def loop(self):
         pass
+
+
+class _LoopProcess:
+    """
+    Runs the loop of a :class:`SimpleWorker` in a forked process. A reaper
+    thread waits for the process to terminate and passes exceptions raised in
+    the child to the worker's service.
+    """
+
+    def __init__(self, worker, context):
+        self.worker = worker
+        reader, writer = context.Pipe(duplex=False)
+        self.pipe = reader
+        # not a multiprocessing.Event: setting one blocks forever, if a
+        # process died while waiting for it
+        self._stop_reader, self._stop_writer = context.Pipe(duplex=False)
+        self.process = context.Process(
+            target=worker._run_in_process, args=(self._stop_reader, writer))
+        self.process.daemon = True
+        self.reaper = threading.Thread(target=self._reap)
+        self._writer = writer
+
+    def start(self):
+        self.process.start()
+        self._writer.close()
+        self._stop_reader.close()
+        self.reaper.start()
+
+    def stop(self):
+        try:
+            self._stop_writer.send_bytes(b'')
+        except OSError:
+            # the process is gone, or was stopped already
+            pass
+        finally:
+            self._stop_writer.close()
+
+    def join(self):
+        self.stop()
+        self.reaper.join()
+
+    def _reap(self):
+        self.process.join()
+        exception = None
+        try:
+            if self.pipe.poll():
+                exception = pickle.loads(self.pipe.recv_bytes())
+        except EOFError:
+            pass
+        except Exception as e:
+            exception = e
+        if exception is None and self.process.exitcode:
+            exception = RuntimeError(
+                'Loop process %d exited with code %d' %
+                (self.process.pid, self.process.exitcode))
+        self.pipe.close()
+        if exception is not None:
+            self.worker.service.set_exception(exception)
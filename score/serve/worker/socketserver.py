@@ -1,12 +1,124 @@
 import abc
+import errno
 import functools
-import select
+import logging
+import queue
+import selectors
 import socket
 import socketserver
+import struct
 import threading
+import time
 
 from .worker import Worker, transitions
 from ..service import Service
+from .._stats import Histogram
+
+
+log = logging.getLogger(__name__)
+
+# accept() failures, that leave the connection pending in the backlog
+_resource_errors = (errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM)
+
+
+class _RequestPool:
+    """
+    A fixed number of threads handling requests from a bounded queue.
+    """
+
+    def __init__(self, worker, server, size, queue_depth):
+        self.worker = worker
+        self.server = server
+        self.queue = queue.Queue(queue_depth)
+        # abandoned requests must not keep the process alive
+        self.threads = [threading.Thread(target=self._run, daemon=True)
+                        for _ in range(size)]
+        for thread in self.threads:
+            thread.start()
+
+    def full(self):
+        return self.queue.full()
+
+    def submit(self, request, client_address):
+        try:
+            self.queue.put_nowait(
+                (request, client_address, time.perf_counter()))
+        except queue.Full:
+            return False
+        return True
+
+    def shutdown(self, timeout=None):
+        """
+        Stops all threads once the queued requests are handled, waiting at
+        most *timeout* seconds for them. Threads still running afterwards are
+        abandoned.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining():
+            if deadline is None:
+                return None
+            return max(0, deadline - time.monotonic())
+
+        for _ in self.threads:
+            try:
+                self.queue.put(None, timeout=remaining())
+            except queue.Full:
+                break
+        current = threading.current_thread()
+        for thread in self.threads:
+            if thread != current:
+                thread.join(remaining())
+        stuck = [thread for thread in self.threads
+                 if thread != current and thread.is_alive()]
+        if stuck:
+            log.warning('Abandoning %d request thread(s), that did not '
+                        'terminate within %ss' % (len(stuck), timeout))
+
+    def _run(self):
+        server = self.server
+        stats = self.worker.request_stats
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            self.worker._request_slot_freed()
+            request, client_address, queued = item
+            started = time.perf_counter()
+            stats['queue_wait'].record(started - queued)
+            try:
+                server.finish_request(request, client_address)
+            except Exception:
+                server.handle_error(request, client_address)
+            finally:
+                server.shutdown_request(request)
+                stats['service_time'].record(time.perf_counter() - started)
+
+
+def _idle(request):
+    """
+    Whether given *request* is a connection without pending input, i.e. one
+    that is either waiting for the next request, or that has already read its
+    current request completely.
+    """
+    if not isinstance(request, socket.socket):
+        return False
+    try:
+        return not request.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT)
+    except BlockingIOError:
+        return True
+    except OSError:
+        return False
+
+
+def _shutdown_socket(request, how):
+    if not isinstance(request, socket.socket):
+        return
+    try:
+        request.shutdown(how)
+    except OSError as e:
+        if e.errno != errno.ENOTCONN:
+            log.debug('Could not shut down %r: %s' % (request, e))
 
 
 class SocketServerWorker(Worker):
@@ -17,6 +129,14 @@ class SocketServerWorker(Worker):
     function must return a :class:`socketserver.BaseServer` instance. The Worker
     will then perform the equivalent of calling its
     :meth:`serve_forever <socketserver.BaseServer.serve_forever>` method.
+
+    Requests can optionally be handled by a bounded pool of threads (see
+    :attr:`pool_size`), in which case the worker will shed load according to
+    the configured :attr:`shed_policy`, when the pool cannot keep up. Timings
+    of requests are collected in the `dict` ``request_stats``, which contains
+    :class:`histograms <score.serve._stats.Histogram>` of the time spent in
+    the queue (``queue_wait``) and the time spent handling each request
+    (``service_time``), as well as the number of ``shed`` requests.
     """
 
     final_states = (
@@ -25,27 +145,104 @@ class SocketServerWorker(Worker):
     running_states = (
         Service.State.STARTING, Service.State.RUNNING)
 
+    #: Maximum number of connections to accept per wakeup of the loop. The
+    #: loop keeps accepting until no further connection is pending or this
+    #: limit is reached.
+    accept_batch = 64
+
+    #: Number of seconds to stop accepting connections, after accepting one
+    #: failed for lack of resources, like file descriptors. The pending
+    #: connection keeps the listening socket readable, which would otherwise
+    #: keep the loop busy.
+    accept_backoff = 0.1
+
+    #: Number of threads handling requests. If this value is `None`, requests
+    #: are passed to the server's own
+    #: :meth:`process_request <socketserver.BaseServer.process_request>`,
+    #: which either handles them synchronously or spawns a thread per request,
+    #: depending on the server's mixins.
+    pool_size = None
+
+    #: Maximum number of accepted requests waiting for a free thread of the
+    #: pool configured via :attr:`pool_size`.
+    queue_depth = 128
+
+    #: What to do with new connections while the queue is full:
+    #:
+    #: - ``reject`` passes the request to :meth:`_reject_request`, which
+    #:   closes the connection by default, but can be overridden to send an
+    #:   error response.
+    #: - ``delay`` stops accepting connections until a slot in the queue
+    #:   becomes available, leaving them in the listen backlog of the kernel.
+    #: - ``close`` aborts the connection immediately with a TCP reset.
+    shed_policy = 'reject'
+
+    #: Maximum number of seconds to wait for running requests when pausing or
+    #: stopping the worker. Connections, that are not in the middle of a
+    #: request, are always shut down for reading at the beginning of this
+    #: phase, which will terminate handlers waiting for a further request on
+    #: a keep-alive connection. Requests still running at the end of this
+    #: period will be forcibly shut down. The default value `None` waits
+    #: indefinitely.
+    drain_timeout = None
+
+    #: Number of seconds to wait for handlers to finish, after their
+    #: connections were forcibly shut down at the end of the
+    #: :attr:`drain_timeout`. Requests still running afterwards are abandoned.
+    #: The threads of the :attr:`pool_size` get the same amount of time to
+    #: terminate, when the worker stops.
+    drain_kill_timeout = 1
+
+    #: The :class:`score.serve._reactor.Reactor` hosting this worker. If this
+    #: value is set, the listening socket is watched by the loop of the
+    #: reactor instead of a thread of this worker, and requests are handled
+    #: by the thread pool of the reactor, unless a :attr:`pool_size` is
+    #: configured.
+    reactor = None
+
     def __init__(self):
         self.__server = None
-        self.__num_running = 0
+        self.__pool = None
+        self.__intr_pair = None
+        self.__listening = False
+        self.__delayed = False
+        self.__backoff_until = None
+        self.__drain_deadline = None
+        self.__requests = {}
         self.__request_lock = threading.Condition()
+        self.request_stats = {
+            'queue_wait': Histogram(),
+            'service_time': Histogram(),
+            'shed': 0,
+        }
 
     def prepare(self):
-        self.__intr_pair = socket.socketpair()
+        if self.shed_policy not in ('reject', 'delay', 'close'):
+            raise ValueError('Invalid shed_policy "%s"' % self.shed_policy)
+        if self.reactor is None:
+            self.__intr_pair = socket.socketpair()
         server = self._mkserver()
         assert isinstance(server, socketserver.BaseServer)
         self.__server = server
         original_shutdown = server.shutdown_request
+        service_time = self.request_stats['service_time']
 
         @functools.wraps(server.shutdown_request)
-        def shutdown_request(*args, **kwargs):
-            original_shutdown(*args, **kwargs)
-            with self.__request_lock:
-                self.__num_running -= 1
-                self.__request_lock.notify()
+        def shutdown_request(request, *args, **kwargs):
+            original_shutdown(request, *args, **kwargs)
+            accepted = self.__forget_request(request)
+            if accepted is not None and not self.__pool:
+                service_time.record(time.perf_counter() - accepted)
 
         server.shutdown_request = shutdown_request
-        threading.Thread(target=self._loop).start()
+        if self.pool_size:
+            self.__pool = _RequestPool(
+                self, server, self.pool_size, self.queue_depth)
+        if self.reactor is None:
+            threading.Thread(target=self._loop).start()
+        else:
+            server.socket.setblocking(False)
+            self.__listening = False
 
     def start(self):
         self._interrupt_loop()
@@ -54,11 +251,41 @@ class SocketServerWorker(Worker):
     @transitions(Service.State.RUNNING)
     def stop(self):
         self._interrupt_loop()
+        if self.reactor is not None:
+            # there is no loop thread of our own to close the server
+            self.reactor.call(self.__update_reader)
+            self.__shutdown_pool()
+            server, self.__server = self.__server, None
+            if server:
+                server.server_close()
 
     def pause(self):
         self._interrupt_loop()
 
+    @property
+    def requests_handled(self):
+        return self.request_stats['service_time'].count
+
+    def info(self):
+        with self.__request_lock:
+            info = {
+                'requests': len(self.__requests),
+                'requests_handled': self.requests_handled,
+                'draining': self.__drain_deadline is not None,
+                'shed': self.request_stats['shed'],
+            }
+            if self.__drain_deadline not in (None, float('inf')):
+                # JSON has no representation of an infinite deadline
+                info['drain_remaining_seconds'] = max(
+                    0, self.__drain_deadline - time.monotonic())
+        info['queue_wait'] = self.request_stats['queue_wait'].snapshot()
+        info['service_time'] = self.request_stats['service_time'].snapshot()
+        return info
+
     def cleanup(self, exception):
+        if self.reactor is not None and self.__server:
+            self.reactor.call(self.__update_reader)
+        self.__shutdown_pool()
         if self.__server:
             try:
                 self.__server.server_close()
@@ -66,50 +293,235 @@ class SocketServerWorker(Worker):
             except:
                 pass
 
+    def __shutdown_pool(self):
+        pool, self.__pool = self.__pool, None
+        if pool:
+            pool.shutdown(self.drain_kill_timeout)
+
     def _loop(self):
         if not self.__intr_pair:
             return
-        while self.state not in self.final_states:
-            try:
+        server_socket = self.__server.socket
+        server_socket.setblocking(False)
+        interrupt = self.__intr_pair[0]
+        selector = selectors.DefaultSelector()
+        selector.register(interrupt, selectors.EVENT_READ)
+        listening = False
+        try:
+            while self.state not in self.final_states:
                 with self.__request_lock:
-                    if self.state in self.running_states:
-                        sockets = (self.__server.socket, self.__intr_pair[0],)
+                    backoff = self.__backoff_remaining()
+                    should_listen = (self.state in self.running_states and
+                                     backoff is None and
+                                     not self.__delaying())
+                if should_listen != listening:
+                    if should_listen:
+                        selector.register(server_socket, selectors.EVENT_READ)
                     else:
-                        sockets = (self.__intr_pair[0],)
-                r, w, e = select.select(sockets, [], [])
-                if self.__intr_pair[0] in r:
-                    self.__intr_pair[0].recv(2**10)
+                        selector.unregister(server_socket)
+                    listening = should_listen
+                try:
+                    events = selector.select(backoff)
+                except InterruptedError:
                     continue
-            except InterruptedError:
-                continue
-            if self.__server.socket in r:
-                self._process_request()
+                accept = False
+                for key, mask in events:
+                    if key.fileobj is interrupt:
+                        interrupt.recv(2**10)
+                    else:
+                        accept = True
+                if accept:
+                    self._accept_requests()
+        finally:
+            selector.close()
+        self.__shutdown_pool()
         self.__server.server_close()
         self.__server = None
 
-    def _process_request(self):
+    def __update_reader(self):
+        """
+        Registers or unregisters the listening socket with the loop of the
+        :attr:`reactor`, the equivalent of an iteration of :meth:`_loop`.
+        Must be called from within that loop.
+        """
         server = self.__server
+        if server is None:
+            return
+        with self.__request_lock:
+            backoff = self.__backoff_remaining()
+            should_listen = (self.state in self.running_states and
+                             backoff is None and
+                             not self.__delaying())
+        if backoff is not None:
+            self.reactor.loop.call_later(backoff, self.__update_reader)
+        if should_listen == self.__listening:
+            return
+        if should_listen:
+            self.reactor.loop.add_reader(server.socket, self.__accept)
+        else:
+            self.reactor.loop.remove_reader(server.socket)
+        self.__listening = should_listen
+
+    def __accept(self):
+        self._accept_requests()
+        # the pool may have filled up in the meantime
+        self.__update_reader()
+
+    def __wake_loop(self):
+        if self.reactor is None:
+            self.__intr_pair[1].send(b'0')
+        else:
+            self.reactor.loop.call_soon_threadsafe(self.__update_reader)
+
+    def __forget_request(self, request):
         with self.__request_lock:
-            if self.state in self.final_states:
-                # we're stopping, abort operation
+            accepted = self.__requests.pop(request, None)
+            self.__request_lock.notify()
+        return accepted
+
+    def __backoff_remaining(self):
+        if self.__backoff_until is None:
+            return None
+        remaining = self.__backoff_until - time.monotonic()
+        if remaining <= 0:
+            self.__backoff_until = None
+            return None
+        return remaining
+
+    def __delaying(self):
+        if self.shed_policy != 'delay' or not self.__pool:
+            return False
+        self.__delayed = self.__pool.full()
+        return self.__delayed
+
+    def _request_slot_freed(self):
+        with self.__request_lock:
+            if not self.__delayed:
+                return
+            self.__delayed = False
+            self.__wake_loop()
+
+    def _accept_requests(self):
+        for _ in range(self.accept_batch):
+            try:
+                if not self._process_request():
+                    return
+            except (BlockingIOError, InterruptedError):
+                # no further pending connections
+                return
+            except ConnectionAbortedError:
+                # the client went away before we could accept it
+                continue
+            except OSError as e:
+                if e.errno in _resource_errors:
+                    log.warning('Could not accept connection, pausing for '
+                                '%ss: %s' % (self.accept_backoff, e))
+                else:
+                    log.exception(e)
+                with self.__request_lock:
+                    self.__backoff_until = (
+                        time.monotonic() + self.accept_backoff)
                 return
+
+    def _process_request(self):
+        server = self.__server
+        pool = self.__pool
+        with self.__request_lock:
+            if self.state not in self.running_states:
+                # we're pausing or stopping, abort operation
+                return False
+            if self.__delaying():
+                # leave further connections in the backlog
+                return False
             request, client_address = server.get_request()
-            self.__num_running += 1
+            self.__requests[request] = time.perf_counter()
         if not server.verify_request(request, client_address):
-            return
+            server.shutdown_request(request)
+            return True
+        if pool:
+            if not pool.submit(request, client_address):
+                self._shed_request(request, client_address)
+            return True
+        if self.reactor is not None:
+            # never handle requests inside the loop of the reactor
+            self.reactor.submit(self.__process_request, server, request,
+                                client_address)
+            return True
+        self.__process_request(server, request, client_address)
+        return True
+
+    def __process_request(self, server, request, client_address):
         try:
             server.process_request(request, client_address)
         except:
             server.handle_error(request, client_address)
             server.shutdown_request(request)
 
+    def _shed_request(self, request, client_address):
+        with self.__request_lock:
+            self.request_stats['shed'] += 1
+        if self.shed_policy == 'close' and isinstance(request, socket.socket):
+            # SO_LINGER with a timeout of zero makes close() send a RST
+            request.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER,
+                               struct.pack('ii', 1, 0))
+            self.__server.close_request(request)
+            self.__forget_request(request)
+        else:
+            self._reject_request(request, client_address)
+
+    def _reject_request(self, request, client_address):
+        """
+        Called for every request, that could not be queued because the pool
+        was saturated. The default implementation just closes the connection,
+        subclasses may override this function to send an error response before
+        calling this implementation.
+        """
+        self.__server.shutdown_request(request)
+
     def _interrupt_loop(self):
         with self.__request_lock:
-            if not self.__intr_pair:
+            if not self.__intr_pair and not self.__server:
+                # not prepared, or already stopped on a reactor
                 return
-            self.__intr_pair[1].send(b'0')
-            while self.__num_running:
+            self.__wake_loop()
+            if not self.__requests:
+                return
+            if self.drain_timeout is None:
+                self.__drain_deadline = float('inf')
+            else:
+                self.__drain_deadline = time.monotonic() + self.drain_timeout
+            try:
+                self.__drain()
+            finally:
+                self.__drain_deadline = None
+
+    def __drain(self):
+        for request in list(self.__requests):
+            if _idle(request):
+                _shutdown_socket(request, socket.SHUT_RD)
+        if self.__wait_for_requests(self.__drain_deadline):
+            return
+        log.warning('Forcibly shutting down %d request(s) after %ss' % (
+            len(self.__requests), self.drain_timeout))
+        for request in list(self.__requests):
+            _shutdown_socket(request, socket.SHUT_RDWR)
+        deadline = time.monotonic() + self.drain_kill_timeout
+        if self.__wait_for_requests(deadline):
+            return
+        log.warning('Abandoning %d request(s), that did not terminate' %
+                    len(self.__requests))
+        self.__requests.clear()
+
+    def __wait_for_requests(self, deadline):
+        while self.__requests:
+            if deadline == float('inf'):
                 self.__request_lock.wait()
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self.__request_lock.wait(remaining)
+        return True
 
     @abc.abstractmethod
     def _mkserver(self):
@@ -1,63 +1,156 @@
 from .worker import Worker
-import watchdog.observers
-import watchdog.events
-import watchdog.utils
 import os
 import warnings
 import threading
+import time
+import concurrent.futures
+from .._watch import create_backend
 
 
-Observer = watchdog.observers.Observer
+class _PathTrie:
+    """
+    A trie of path components for answering the question "is this path located
+    inside any of the inserted directories?" in time proportional to the depth
+    of the path, regardless of the number of inserted directories.
+    """
+
+    def __init__(self):
+        self.root = {}
+        self.paths = set()
+
+    def __iter__(self):
+        return iter(self.paths)
 
-if Observer.__name__ == 'InotifyObserver':
-    import watchdog.observers.inotify
+    def add(self, path):
+        self.paths.add(path)
+        node = self.root
+        for part in self._split(path):
+            node = node.setdefault(part, {})
+        node[None] = True
 
-    # The inotify original observer has a small delay for pairing IN_MOVED_FROM
-    # and IN_MOVE_TO events. Since we do not care whether something was moved
-    # *into* or *out of* our watches, we will override this behaviour to achieve
-    # the fastest possible reload times.
+    def __contains__(self, path):
+        node = self.root
+        if None in node:
+            return True
+        for part in self._split(path):
+            try:
+                node = node[part]
+            except KeyError:
+                return False
+            if None in node:
+                return True
+        return False
 
-    class InotifyBuffer(watchdog.observers.inotify.InotifyBuffer):
+    def _split(self, path):
+        return [part for part in path.split(os.sep) if part]
 
-        def __init__(self, *args, **kwargs):
-            self.delay = 0
-            super().__init__(*args, **kwargs)
 
-        def close(self):
-            self.stop()
+def _stat_entry(stat):
+    if stat.st_mode & 0o170000 == 0o040000:
+        # directories are only tracked for their existence
+        return (stat.st_ino, 0, 0)
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
 
-    class InotifyEmitter(watchdog.observers.inotify.InotifyEmitter):
 
-        def on_thread_start(self):
-            path = watchdog.utils.unicode_paths.encode(self.watch.path)
-            self._inotify = InotifyBuffer(path, self.watch.is_recursive)
+def _scan_dir(dir):
+    entries = {}
+    subdirs = []
+    try:
+        iterator = os.scandir(dir)
+    except OSError:
+        return entries, subdirs
+    with iterator:
+        for entry in iterator:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                    entries[entry.path] = (entry.inode(), 0, 0)
+                else:
+                    stat = entry.stat(follow_symlinks=False)
+                    entries[entry.path] = _stat_entry(stat)
+            except OSError:
+                continue
+    return entries, subdirs
 
-    class InotifyObserver(watchdog.observers.inotify.InotifyObserver):
 
-        def __init__(self, *args, **kwargs):
-            watchdog.observers.api.BaseObserver.__init__(
-                self, *args, emitter_class=InotifyEmitter, **kwargs)
+def _snapshot(files, dirs, workers):
+    """
+    Creates a `dict` mapping each of the given *files* and every path inside
+    the given *dirs* to a compact (inode, size, mtime_ns) tuple. Directories
+    are scanned in parallel using up to *workers* threads.
+    """
+    snapshot = {}
+    for file in files:
+        try:
+            snapshot[file] = _stat_entry(os.stat(file))
+        except OSError:
+            continue
+    dirs = list(dirs)
+    if not dirs:
+        return snapshot
+    wait = concurrent.futures.wait
+    FIRST_COMPLETED = concurrent.futures.FIRST_COMPLETED
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        pending = {executor.submit(_scan_dir, dir) for dir in dirs}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                entries, subdirs = future.result()
+                snapshot.update(entries)
+                pending.update(executor.submit(_scan_dir, dir)
+                               for dir in subdirs)
+    return snapshot
+
 
-    Observer = InotifyObserver
+def _diff_snapshots(old, new):
+    changed = [path for path, stat in new.items() if old.get(path) != stat]
+    changed.extend(path for path in old if path not in new)
+    return changed
 
 
-class FileWatcherWorker(Worker, watchdog.events.FileSystemEventHandler):
+class FileWatcherWorker(Worker):
     """
-    The implementation of a single service.
+    A worker, that watches files and directories for changes.
 
-    The worker will be wrapped in :class:`Service` objects before being started.
+    Subclasses must :meth:`watch` some paths and will receive a call to
+    ``changed(path)`` for every change to one of these paths. The call is made
+    synchronously inside the observer thread.
+
+    Subclasses may alternatively implement :meth:`changed_batch` to receive
+    coalesced changes in a separate dispatch thread, instead.
+
+    The worker keeps a snapshot of all watched paths while it is paused and
+    reports all changes, that happened in the meantime, when it is started
+    again. These changes are always delivered before any new events.
     """
 
+    #: Number of seconds to wait for further events, before passing collected
+    #: changes to :meth:`changed_batch`.
+    batch_delay = 0.05
+
+    #: Name of the :mod:`watch backend <score.serve._watch>` to use: one of
+    #: ``inotify``, ``watchdog``, ``polling`` or ``auto``.
+    watch_backend = 'auto'
+
+    #: Number of seconds between two scans, if the ``polling`` backend is used.
+    poll_interval = 1.0
+
+    #: Number of threads scanning directories when creating or comparing the
+    #: snapshot of watched paths.
+    scan_workers = 8
+
     def watch(self, path):
         if not os.path.exists(path):
             warnings.warn('Cannot watch "%s": path does not exist' % path)
             return
+        # the backends report absolute paths
+        path = os.path.abspath(path)
         if os.path.isfile(path):
             dir = os.path.dirname(path)
-            self.target_files.append(path)
+            self.target_files.add(path)
         else:
             dir = path
-            self.target_dirs.append(path)
+            self.target_dirs.add(path)
         if dir in self.observed_dirs:
             return
         with self._observer_lock:
@@ -70,43 +163,138 @@ class FileWatcherWorker(Worker, watchdog.events.FileSystemEventHandler):
                     del self.observed_dirs[other]
             if self.observer:
                 self.observed_dirs[dir] = \
-                    self.observer.schedule(self, dir, recursive=True)
+                    self.observer.schedule(dir, recursive=True)
             else:
                 self.observed_dirs[dir] = None
 
+    def changed_batch(self, paths):
+        """
+        Receives a `frozenset` of all paths, that changed since the last
+        invocation. Implementing this method in a subclass enables batched
+        event delivery: events are then collected for :attr:`batch_delay`
+        seconds and passed to this function in a dedicated thread, allowing the
+        observer thread to keep up with the event queue.
+        """
+        for path in sorted(paths):
+            self.changed(path)
+
+    @property
+    def _batching(self):
+        return type(self).changed_batch is not FileWatcherWorker.changed_batch
+
     def prepare(self):
         self._observer_lock = threading.Lock()
+        self._batch_condition = threading.Condition()
+        self._batch = set()
+        self._dispatcher = None
+        self._catchup_lock = threading.Lock()
+        self._catchup_events = None
+        self._snapshot = None
         self.observer = None
         self.observed_dirs = {}
-        self.target_files = []
-        self.target_dirs = []
+        self.target_files = set()
+        self.target_dirs = _PathTrie()
 
     def start(self):
-        self.observer = Observer()
+        if self._batching:
+            self._dispatcher = threading.Thread(target=self._dispatch)
+            self._dispatcher.start()
+        snapshot, self._snapshot = self._snapshot, None
+        if snapshot is not None:
+            # hold back live events until we have reported everything we
+            # missed while we were paused.
+            self._catchup_events = []
+        self.observer = create_backend(
+            self.watch_backend, self._events, interval=self.poll_interval)
         for dir in self.observed_dirs:
             self.observed_dirs[dir] = \
-                self.observer.schedule(self, dir, recursive=True)
+                self.observer.schedule(dir, recursive=True)
         self.observer.start()
+        if snapshot is not None:
+            self._catch_up(snapshot)
 
     def stop(self):
         pass
 
     def pause(self):
+        # the snapshot is taken while we are still observing: a change
+        # happening in between is reported twice rather than not at all.
+        self._snapshot = self._take_snapshot()
         with self._observer_lock:
             self.observer.stop()
         self.observer.join()
         self.observer = None
+        self._stop_dispatcher()
 
     def cleanup(self, exception):
         if hasattr(self, '_observer_lock'):
             with self._observer_lock:
-                if hasattr(self, 'observer'):
+                if getattr(self, 'observer', None):
                     self.observer.stop()
                     self.observer.join()
+            self._stop_dispatcher()
+
+    def _events(self, events):
+        target_files = self.target_files
+        target_dirs = self.target_dirs
+        paths = [event.path for event in events
+                 if event.path in target_files or event.path in target_dirs]
+        if not paths:
+            return
+        if self._catchup_events is not None:
+            with self._catchup_lock:
+                if self._catchup_events is not None:
+                    self._catchup_events.extend(paths)
+                    return
+        self._emit(paths)
+
+    def _emit(self, paths):
+        if not self._dispatcher:
+            for path in paths:
+                self.changed(path)
+            return
+        with self._batch_condition:
+            self._batch.update(paths)
+            self._batch_condition.notify()
+
+    def _take_snapshot(self):
+        return _snapshot(self.target_files, self.target_dirs,
+                         self.scan_workers)
+
+    def _catch_up(self, snapshot):
+        try:
+            self._emit(_diff_snapshots(snapshot, self._take_snapshot()))
+        finally:
+            with self._catchup_lock:
+                events, self._catchup_events = self._catchup_events, None
+                self._emit(events)
 
-    def on_any_event(self, event):
-        relevant = hasattr(event, 'src_path') and (
-            event.src_path in self.target_files or
-            any(event.src_path.startswith(dir) for dir in self.target_dirs))
-        if relevant:
-            self.changed(event.src_path)
+    def _dispatch(self):
+        condition = self._batch_condition
+        while True:
+            with condition:
+                while not self._batch and self._dispatcher:
+                    condition.wait()
+                if not self._dispatcher and not self._batch:
+                    return
+            # give the observer some time to deliver related events
+            time.sleep(self.batch_delay)
+            with condition:
+                batch, self._batch = self._batch, set()
+            if not batch:
+                continue
+            try:
+                self.changed_batch(frozenset(batch))
+            except Exception as e:
+                self.service.set_exception(e)
+                return
+
+    def _stop_dispatcher(self):
+        dispatcher = getattr(self, '_dispatcher', None)
+        if not dispatcher:
+            return
+        with self._batch_condition:
+            self._dispatcher = None
+            self._batch_condition.notify()
+        if threading.current_thread() != dispatcher:
+            dispatcher.join()
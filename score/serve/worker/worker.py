@@ -116,6 +116,20 @@ class Worker(metaclass=WorkerMeta):
 
     state_listeners = set()
 
+    #: Number of requests handled by this worker so far. Workers processing
+    #: requests should keep this value up to date, since it is used for
+    #: enforcing the ``recycle.max_requests`` configuration of
+    #: :func:`score.serve.init`.
+    requests_handled = 0
+
+    #: Maximum durations of the transitions of this worker in seconds, keyed
+    #: by the name of the transition method, like ``{'prepare': 30}``. A
+    #: service, whose worker exceeds one of these, ends up in the
+    #: ``EXCEPTION`` state with a :class:`TransitionTimeout
+    #: <score.serve.TransitionTimeout>`. These values can be overridden via
+    #: the ``timeout`` configuration of :func:`score.serve.init`.
+    transition_timeouts = {}
+
     @property
     def state(self):
         return self.service.state
@@ -152,6 +166,15 @@ class Worker(metaclass=WorkerMeta):
         exception occurred.
         """
 
+    def info(self):
+        """
+        Returns a JSON-serializable `dict` with runtime information about this
+        worker, like the number of requests currently being processed. The
+        information is made available through the
+        :class:`Service <score.serve.Service>` and the monitor.
+        """
+        return {}
+
     def register_state_change_listener(self, callback):
         """
         Registers a `callable` that will be invoked whenever the state of this